@@ -1,22 +1,50 @@
 """
-Validation script — run with:  python -m cocktail_cartography
-or directly:                   python __main__.py
+Command-line entry point — run with:  python -m cocktail_cartography <command>
+or directly:                          python __main__.py <command>
+
+  report     — the validation report: spotlight proportions, key distances,
+               the full distance matrix and neighbour lists (the default)
+  distances  — distance matrix rows for the selected recipes
+  neighbors  — top-k neighbours per recipe
+  vectors    — strategy vectors per recipe
+  validate   — recipe problems (unknown ingredients, roles, methods, ...)
+
+distances / neighbors / vectors compute one row block at a time and stream
+it to --output as .npy (written through a memory map, with the row names in
+a .names.txt beside it), CSV or JSON Lines, so no n×n matrix is held in memory or
+formatted as a whole:
+
+    python -m cocktail_cartography distances --strategy perceptual -o d.npy
+    python -m cocktail_cartography neighbors --k 10 --format jsonl > nn.jsonl
+    python -m cocktail_cartography vectors --strategy tau --tau 2 --format csv
+    python -m cocktail_cartography validate --source scraped.jsonl
 """
 
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
 import numpy as np
 
+from distance_store import cosine_features, distance_block, open_or_compute
 from loaders import INGREDIENTS, RECIPES
 from utils import (
     compute_recipe_proportions,
     ingredient_flavor_distance,
     category_distance,
     recipe_distance,
+    recipe_feature_arrays,
 )
 
 SEP = "=" * 60
+STRATEGIES = ("recipe_distance", "blend", "blend_struct", "role_slot", "perceptual", "tau",
+              "cooccurrence")
+FORMATS = ("npy", "csv", "jsonl")
 
 
-def main():
+def report(args=None):
     print(SEP)
     print("COCKTAIL CLUSTERING — VALIDATION")
     print(SEP)
@@ -76,26 +104,289 @@ def main():
     print(header)
     print("-" * len(header))
 
-    dist_matrix = np.zeros((n, n))
+    # Computed in tiles into a cached float32 store (data/cache/), read row by row
+    store = open_or_compute(
+        "recipe_distance", recipe_names, recipe_feature_arrays(recipe_names),
+        params={"alpha": 0.5, "beta": 0.5},
+    )
     for i, a in enumerate(recipe_names):
-        row = f"{a:22s} "
-        for j, b in enumerate(recipe_names):
-            d = recipe_distance(a, b)
-            dist_matrix[i, j] = d
-            row += f"{d:8.3f} "
+        row = f"{a:22s} " + "".join(f"{d:8.3f} " for d in store.row(i))
         print(row)
 
     # --- Nearest neighbors ---
     print(f"\n{SEP}\nNEAREST NEIGHBORS (top 5)\n{SEP}")
-    for i, name in enumerate(recipe_names):
-        neighbors = sorted(
-            [(recipe_names[j], dist_matrix[i, j]) for j in range(n) if i != j],
-            key=lambda x: x[1],
-        )
+    for name in recipe_names:
         print(f"\n  {name}:")
-        for nbr, d in neighbors[:5]:
+        for nbr, d in store.nearest(name, 5):
             print(f"    {d:.4f}  {nbr}")
 
 
+# ---------------------------------------------------------------------------
+# Selection and batched computation
+# ---------------------------------------------------------------------------
+
+def selected_recipes(args, parser: argparse.ArgumentParser) -> list[str]:
+    """--recipes / --recipes-file in the given order, or every recipe."""
+    names = list(args.recipes or [])
+    if args.recipes_file:
+        with open(args.recipes_file) as f:
+            names += [line.strip() for line in f if line.strip()]
+    if not names:
+        return list(RECIPES)
+    unknown = [n for n in names if n not in RECIPES]
+    if unknown:
+        parser.error(f"unknown recipes: {', '.join(unknown[:10])}")
+    return names
+
+
+def strategy_matrix(strategy: str, names: list[str], alpha: float, tau: float) -> np.ndarray:
+    """(n, dims) vectors of `names` under `strategy`, computed in one batch."""
+    if strategy == "cooccurrence":
+        from cooccurrence import cooccurrence_vectors
+        return cooccurrence_vectors(names)
+    from vectorize import compile_recipes, flavor_matrix, strategy_vectors
+    compiled = compile_recipes(names)
+    return strategy_vectors(compiled, flavor_matrix(compiled["ingredients"]), strategy,
+                            alpha=alpha, tau=tau)
+
+
+def distance_inputs(args, names: list[str]) -> tuple[str, dict, dict]:
+    """(kind, features, params) for distance_store.distance_block."""
+    if args.strategy == "recipe_distance":
+        return ("recipe_distance", recipe_feature_arrays(names),
+                {"alpha": args.alpha, "beta": args.beta})
+    return "cosine", cosine_features(strategy_matrix(args.strategy, names, args.alpha, args.tau)), {}
+
+
+def row_blocks(n: int, block: int):
+    for i0 in range(0, n, block):
+        yield i0, min(i0 + block, n)
+
+
+# ---------------------------------------------------------------------------
+# Streamed output
+# ---------------------------------------------------------------------------
+
+def _rounded(block: np.ndarray, decimals: int) -> list:
+    """Rows as lists of Python floats; float32 is widened first so 0.02 prints as 0.02."""
+    return np.round(block.astype(np.float64), decimals).tolist()
+
+
+def _text_output(path: str):
+    return sys.stdout if path == "-" else open(path, "w", newline="")
+
+
+def write_rows(fmt: str, output: str, names: list[str], columns: list[str], field: str,
+               shape: tuple[int, int], blocks, decimals: int = 6) -> None:
+    """
+    Stream (i0, block) row blocks of an (n, m) matrix. npy is written through
+    a memory map with names in <output>.names.txt; csv has a name column and
+    `columns` as header; jsonl is {"name": ..., field: [...]} per row.
+    """
+    if fmt == "npy":
+        out = np.lib.format.open_memmap(output, mode="w+", dtype=np.float32, shape=shape)
+        for i0, block in blocks:
+            out[i0:i0 + len(block)] = block
+        out.flush()
+        Path(output).with_suffix(".names.txt").write_text("\n".join(names) + "\n")
+        return
+    f = _text_output(output)
+    try:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["name", *columns])
+            for i0, block in blocks:
+                writer.writerows([name, *row] for name, row in
+                                 zip(names[i0:], _rounded(block, decimals)))
+        else:
+            for i0, block in blocks:
+                f.writelines(json.dumps({"name": name, field: row}) + "\n" for name, row in
+                             zip(names[i0:], _rounded(block, decimals)))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+# ---------------------------------------------------------------------------
+# Subcommands
+# ---------------------------------------------------------------------------
+
+def distances(args, parser):
+    if args.format == "npy" and args.output == "-":
+        parser.error("npy output needs --output PATH")
+    names = selected_recipes(args, parser)
+    kind, features, params = distance_inputs(args, names)
+    n = len(names)
+
+    def blocks():
+        for i0, i1 in row_blocks(n, args.block):
+            block = distance_block(kind, features, params, i0, i1, 0, n)
+            block[np.arange(i1 - i0), np.arange(i0, i1)] = 0.0
+            yield i0, block
+
+    write_rows(args.format, args.output, names, names, "distances", (n, n), blocks(), args.decimals)
+    print(f"{n}×{n} {args.strategy} distances → {args.output}", file=sys.stderr)
+
+
+def neighbors(args, parser):
+    names = selected_recipes(args, parser)
+    kind, features, params = distance_inputs(args, names)
+    n, k = len(names), min(args.k, len(names) - 1)
+    if k < 1:
+        parser.error("neighbors needs --k ≥ 1 and at least two recipes")
+    if args.format == "npy" and args.output == "-":
+        parser.error("npy output needs --output PATH")
+
+    def blocks():
+        for i0, i1 in row_blocks(n, args.block):
+            block = distance_block(kind, features, params, i0, i1, 0, n)
+            block[np.arange(i1 - i0), np.arange(i0, i1)] = np.inf
+            top = np.argpartition(block, k - 1, axis=1)[:, :k]
+            dist = np.take_along_axis(block, top, axis=1)
+            order = np.lexsort((top, dist), axis=1)
+            yield i0, np.take_along_axis(top, order, axis=1), np.take_along_axis(dist, order, axis=1)
+
+    if args.format == "npy":
+        indices = np.lib.format.open_memmap(args.output, mode="w+", dtype=np.int32, shape=(n, k))
+        dists = np.lib.format.open_memmap(Path(args.output).with_suffix(".distances.npy"),
+                                          mode="w+", dtype=np.float32, shape=(n, k))
+        for i0, top, dist in blocks():
+            indices[i0:i0 + len(top)], dists[i0:i0 + len(top)] = top, dist
+        indices.flush()
+        dists.flush()
+        Path(args.output).with_suffix(".names.txt").write_text("\n".join(names) + "\n")
+    else:
+        f = _text_output(args.output)
+        try:
+            writer = csv.writer(f) if args.format == "csv" else None
+            if writer:
+                writer.writerow(["name", "rank", "neighbor", "distance"])
+            for i0, top, dist in blocks():
+                for name, idx, d in zip(names[i0:], top.tolist(),
+                                        _rounded(dist, args.decimals)):
+                    if writer:
+                        writer.writerows([name, r + 1, names[j], x]
+                                         for r, (j, x) in enumerate(zip(idx, d)))
+                    else:
+                        f.write(json.dumps({"name": name, "neighbors": [
+                            {"name": names[j], "distance": x} for j, x in zip(idx, d)]}) + "\n")
+        finally:
+            if f is not sys.stdout:
+                f.close()
+    print(f"{k} {args.strategy} neighbours × {n} recipes → {args.output}", file=sys.stderr)
+
+
+def vectors(args, parser):
+    if args.strategy == "recipe_distance":
+        parser.error("recipe_distance has no vectors; pick a vector strategy")
+    if args.format == "npy" and args.output == "-":
+        parser.error("npy output needs --output PATH")
+    names = selected_recipes(args, parser)
+    matrix = strategy_matrix(args.strategy, names, args.alpha, args.tau)
+    if args.strategy == "cooccurrence":
+        columns = [f"c{d}" for d in range(matrix.shape[1])]
+    else:
+        from explain import dimension_labels
+        columns = dimension_labels(args.strategy)
+    blocks = ((i0, matrix[i0:i1]) for i0, i1 in row_blocks(len(names), args.block))
+    write_rows(args.format, args.output, names, columns, "vector", matrix.shape, blocks,
+               args.decimals)
+    print(f"{matrix.shape[0]}×{matrix.shape[1]} {args.strategy} vectors → {args.output}",
+          file=sys.stderr)
+
+
+def validate(args, parser):
+    from ingest import RecipeStream, validate_recipe
+
+    if args.source:
+        stream = RecipeStream(args.source, allow_unknown=args.allow_unknown,
+                              max_rejects=sys.maxsize)
+        for _ in stream.records():
+            pass
+        rows = [{"name": r["name"], "position": r["position"], "problems": r["problems"]}
+                for r in stream.rejects]
+        checked = stream.accepted + stream.rejected
+    else:
+        names = selected_recipes(args, parser)
+        rows = []
+        for name in names:
+            problems = validate_recipe(RECIPES[name], allow_unknown=args.allow_unknown)
+            if problems:
+                rows.append({"name": name, "problems": problems})
+        checked = len(names)
+
+    f = _text_output(args.output)
+    try:
+        if args.format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["name", "problem"])
+            writer.writerows([row["name"], p] for row in rows for p in row["problems"])
+        else:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    print(f"{len(rows)} of {checked} recipes have problems", file=sys.stderr)
+    return 1 if rows else 0
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cocktail_cartography",
+                                     description="Cocktail cartography command line.")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("report", help="print the validation report (default)")
+
+    def selection(p):
+        p.add_argument("--recipes", nargs="+", metavar="NAME", help="recipes to include (default all)")
+        p.add_argument("--recipes-file", help="file with one recipe name per line")
+        p.add_argument("-o", "--output", default="-", help="output path (default stdout)")
+
+    def computed(p, formats=FORMATS, strategies=STRATEGIES, default="recipe_distance"):
+        selection(p)
+        p.add_argument("--strategy", choices=strategies, default=default)
+        p.add_argument("--format", choices=formats,
+                       help="default from the --output suffix (.npy, .csv), else jsonl")
+        p.add_argument("--alpha", type=float, default=0.5,
+                       help="recipe_distance flavor weight / blend_struct α")
+        p.add_argument("--beta", type=float, default=0.5, help="recipe_distance structure weight")
+        p.add_argument("--tau", type=float, default=1.0, help="τ for the tau strategy")
+        p.add_argument("--block", type=int, default=1024, help="rows computed per block")
+        p.add_argument("--decimals", type=int, default=6, help="rounding for csv / jsonl")
+
+    computed(sub.add_parser("distances", help="distance matrix rows"))
+    p = sub.add_parser("neighbors", help="top-k neighbours per recipe")
+    computed(p)
+    p.add_argument("--k", type=int, default=5)
+    computed(sub.add_parser("vectors", help="strategy vectors"), default="blend")
+
+    p = sub.add_parser("validate", help="recipe problems; exit status 1 if any")
+    selection(p)
+    p.add_argument("--source", help="validate a JSON / JSON Lines file instead of the catalog")
+    p.add_argument("--allow-unknown", action="store_true",
+                   help="accept ingredients missing from the ingredient table")
+    p.add_argument("--format", choices=("csv", "jsonl"),
+                   help="default from the --output suffix (.csv), else jsonl")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in (None, "report"):
+        report(args)
+        return 0
+    if args.format is None:
+        args.format = {".npy": "npy", ".csv": "csv"}.get(Path(args.output).suffix, "jsonl")
+    if getattr(args, "block", 1) < 1:
+        parser.error("--block must be at least 1")
+    command = {"distances": distances, "neighbors": neighbors, "vectors": vectors,
+               "validate": validate}[args.command]
+    return command(args, parser) or 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+attributes.py
+=============
+Per-recipe drink attributes (strength, volume, dilution) and flavor
+similarity queries constrained by them.
+
+recipe_attributes computes every recipe's attributes at once from the
+compiled recipe arrays (vectorize.compile_recipes). AttributeIndex keeps each
+numeric attribute sorted, so a range filter is two binary searches; only the
+recipes that pass every filter are scored for similarity:
+
+    index = AttributeIndex.build()
+    index.query("negroni", k=5, final_abv=(0.15, 0.25), served="up")
+
+  ATTRIBUTES         — numeric attribute names
+  dilution_fraction  — water added by stirring/shaking, as a fraction of volume
+  recipe_attributes  — attribute arrays for compiled recipes
+  AttributeIndex     — sorted attribute indexes + filtered top-k cosine search
+"""
+
+import numpy as np
+
+from loaders import Dataset, resolve
+from vectorize import compile_recipes, strategy_vectors
+
+ATTRIBUTES = ("volume_ml", "abv", "dilution", "final_volume_ml", "final_abv")
+CATEGORICAL = ("method", "served")
+
+# Dilution (fraction of the undiluted volume) as a quadratic in the
+# undiluted ABV, fitted by Dave Arnold for stirred and shaken drinks.
+# Built drinks are stirred briefly in the glass over ice; the stirred curve
+# is the usual estimate for them.
+DILUTION_COEFFICIENTS = {
+    "stirred": (-1.21, 1.246, 0.145),
+    "shaken":  (-1.567, 1.742, 0.203),
+    "built":   (-1.21, 1.246, 0.145),
+}
+
+
+# ---------------------------------------------------------------------------
+# Attributes
+# ---------------------------------------------------------------------------
+
+def dilution_fraction(abv: np.ndarray, methods: np.ndarray) -> np.ndarray:
+    """Water added by `methods` (one per recipe) to drinks of undiluted `abv` (fraction)."""
+    out = np.zeros_like(abv, dtype=float)
+    for method, (a, b, c) in DILUTION_COEFFICIENTS.items():
+        mask = methods == method
+        out[mask] = a * abv[mask] ** 2 + b * abv[mask] + c
+    unknown = set(np.unique(methods)) - set(DILUTION_COEFFICIENTS)
+    if unknown:
+        raise ValueError(f"Unknown method(s) {sorted(unknown)}; expected one of "
+                         f"{list(DILUTION_COEFFICIENTS)}")
+    return out
+
+
+def recipe_attributes(compiled: dict | None = None, dataset: Dataset | None = None) -> dict:
+    """
+    Attribute arrays, one entry per recipe in compiled["recipes"] order:
+      volume_ml        (R,) poured volume before dilution (dashes count DASH_ML)
+      abv              (R,) undiluted alcohol by volume, as a fraction
+      dilution         (R,) water from ice, as a fraction of volume_ml
+      final_volume_ml  (R,) volume in the glass
+      final_abv        (R,) strength in the glass
+      method, served   (R,) strings from the recipe
+      unknown_abv      (R,) ml of ingredients missing from the table (counted as 0% ABV)
+    """
+    ds = resolve(dataset)
+    compiled = compiled or ds.compiled()
+    n_table = len(compiled["ingredients"])
+    # Per-ingredient ABV with a trailing 0 for missing ingredients and padding
+    abv_table = np.array([ds.ingredients[n]["abv"] for n in compiled["ingredients"]] + [0.0])
+
+    ml, items = compiled["ml"], compiled["items"]
+    volume = ml.sum(axis=1)
+    alcohol = (ml * abv_table[items]).sum(axis=1)
+    unknown = np.where(items == n_table, ml, 0.0).sum(axis=1)
+    abv = np.divide(alcohol, volume, out=np.zeros_like(volume), where=volume > 0)
+
+    method = np.array([ds.recipes[r]["method"] for r in compiled["recipes"]])
+    served = np.array([ds.recipes[r].get("served") or "" for r in compiled["recipes"]])
+    dilution = dilution_fraction(abv, method)
+    return {
+        "volume_ml": volume,
+        "abv": abv,
+        "dilution": dilution,
+        "final_volume_ml": volume * (1.0 + dilution),
+        "final_abv": abv / (1.0 + dilution),
+        "method": method,
+        "served": served,
+        "unknown_abv": unknown,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Filtered similarity
+# ---------------------------------------------------------------------------
+
+class AttributeIndex:
+    """
+    Recipe vectors plus one sorted copy of every numeric attribute.
+
+    filter() answers each range with np.searchsorted on that attribute's
+    sorted values and intersects the surviving recipe ids, starting from the
+    narrowest range; query() scores only those candidates.
+    """
+
+    def __init__(self, recipe_names: list[str], vectors: np.ndarray, attributes: dict):
+        self.recipes = list(recipe_names)
+        self.position = {name: i for i, name in enumerate(self.recipes)}
+        self.vectors = np.asarray(vectors, dtype=float)
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.unit = np.divide(self.vectors, norms, out=np.zeros_like(self.vectors),
+                              where=norms > 0)
+        self.attributes = attributes
+        self._order = {a: np.argsort(attributes[a], kind="stable") for a in ATTRIBUTES}
+        self._sorted = {a: attributes[a][self._order[a]] for a in ATTRIBUTES}
+        self._groups = {
+            c: {v: np.flatnonzero(attributes[c] == v) for v in np.unique(attributes[c])}
+            for c in CATEGORICAL
+        }
+
+    @classmethod
+    def build(cls, strategy: str = "blend", recipe_names: list[str] | None = None,
+              dataset: Dataset | None = None, **strategy_kw) -> "AttributeIndex":
+        """Index every recipe (or `recipe_names`) with its `strategy` vector."""
+        ds = resolve(dataset)
+        if recipe_names is None:
+            compiled, vectors = ds.compiled(), ds.strategy_vectors(strategy, **strategy_kw)
+        else:
+            compiled = compile_recipes(recipe_names, dataset=ds)
+            vectors = strategy_vectors(compiled, ds.flavor_matrix(), strategy, **strategy_kw)
+        return cls(compiled["recipes"], vectors, recipe_attributes(compiled, ds))
+
+    def range(self, attribute: str, lo: float | None = None, hi: float | None = None) -> np.ndarray:
+        """Sorted ids of recipes with lo <= attribute <= hi (None = unbounded)."""
+        if attribute not in ATTRIBUTES:
+            raise ValueError(f"Unknown attribute {attribute!r}; expected one of {ATTRIBUTES}")
+        values = self._sorted[attribute]
+        start = 0 if lo is None else np.searchsorted(values, lo, side="left")
+        stop = len(values) if hi is None else np.searchsorted(values, hi, side="right")
+        return np.sort(self._order[attribute][start:stop])
+
+    def filter(self, **filters) -> np.ndarray:
+        """
+        Sorted ids of recipes matching every filter:
+          numeric attributes — (lo, hi) tuples, either end may be None
+          method, served     — a value or a collection of accepted values
+        """
+        sets = []
+        for key, want in filters.items():
+            if want is None:
+                continue
+            if key in CATEGORICAL:
+                values = [want] if isinstance(want, str) else list(want)
+                groups = self._groups[key]
+                sets.append(np.sort(np.concatenate(
+                    [groups.get(v, np.empty(0, dtype=np.int64)) for v in values])))
+            elif key in ATTRIBUTES:
+                sets.append(self.range(key, *want))
+            else:
+                raise ValueError(f"Unknown filter {key!r}; expected one of "
+                                 f"{ATTRIBUTES + CATEGORICAL}")
+        if not sets:
+            return np.arange(len(self.recipes))
+        sets.sort(key=len)
+        ids = sets[0]
+        for other in sets[1:]:
+            if len(ids) == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def query(self, target: str | np.ndarray, k: int = 5, **filters) -> list[tuple[str, float]]:
+        """
+        Top-k (recipe, cosine distance) among the recipes passing `filters`.
+        `target` is a recipe name (excluded from its own results) or a vector
+        in this index's strategy space.
+        """
+        ids = self.filter(**filters)
+        if isinstance(target, str):
+            if target not in self.position:
+                raise ValueError(f"Unknown recipe {target!r}")
+            query = self.unit[self.position[target]]
+            ids = ids[ids != self.position[target]]
+        else:
+            query = np.asarray(target, dtype=float)
+            norm = np.linalg.norm(query)
+            query = query / norm if norm > 0 else query
+        if len(ids) == 0:
+            return []
+
+        dist = 1.0 - self.unit[ids] @ query
+        k = min(k, len(ids))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+        return [(self.recipes[ids[i]], round(float(dist[i]), 4)) for i in top]
+
+    def describe(self, name: str) -> dict:
+        """Attributes of one recipe, as plain Python values."""
+        i = self.position[name]
+        return {a: self.attributes[a][i].item() for a in ATTRIBUTES + CATEGORICAL}
+
+
+if __name__ == "__main__":
+    index = AttributeIndex.build()
+    for name in ["negroni", "daiquiri", "manhattan"]:
+        attrs = index.describe(name)
+        print(f"{name}: {attrs['volume_ml']:.0f} ml at {attrs['abv']:.1%} → "
+              f"{attrs['final_volume_ml']:.0f} ml at {attrs['final_abv']:.1%} ({attrs['method']})")
+    print("\nLike a negroni, 15–25% in the glass, served up:")
+    for other, d in index.query("negroni", k=5, final_abv=(0.15, 0.25), served="up"):
+        print(f"  {other:25s} {d:.4f}")
@@ -0,0 +1,261 @@
+"""
+calibration.py
+==============
+Fit the hand-set constants of utils.recipe_distance to a file of ordered
+closeness constraints.
+
+A constraint file is JSON lines, one constraint per line:
+
+    {"anchor": "manhattan", "closer": "old_fashioned", "farther": "last_word"}
+    {"closer": ["bijou", "tipperary"], "farther": ["martinez", "manhattan"]}
+    {"pair": ["martini", "martini_olive"], "max": 0.1}
+    {"pair": ["martinez", "last_word"], "min": 0.3, "weight": 2}
+
+  anchor/closer/farther — d(anchor, closer) < d(anchor, farther)
+  closer/farther pairs  — d(closer pair) < d(farther pair)
+  pair with max/min     — absolute band on one distance
+
+Optional keys: "margin" (ordered constraints must hold by at least this
+much), "weight" (default 1) and "note" (ignored).
+
+Every distance term is computed once per constrained pair; a candidate
+parameter set is then a handful of array operations, so thousands of
+candidates are scored at once (pair_distances takes a (G, 5) batch).
+
+  PARAMS            — names of the fitted parameters
+  load_constraints  — parse a constraint file against the recipe list
+  pair_terms        — per-pair distance terms under a role grouping
+  satisfaction      — weighted fraction of satisfied constraints, per candidate
+  calibrate         — grid search, then Nelder-Mead from the best grid points
+"""
+
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import minimize
+
+from utils import (
+    METHOD_PENALTY,
+    ROLE_GROUPS,
+    SERVED_EITHER_PENALTY,
+    SERVED_PENALTY,
+    paired_flavor_distance,
+    recipe_feature_arrays,
+)
+
+PARAMS = ("alpha", "beta", "method_penalty", "either_penalty", "served_penalty")
+DEFAULTS = np.array([0.5, 0.5, METHOD_PENALTY, SERVED_EITHER_PENALTY, SERVED_PENALTY])
+BOUNDS = np.array([[0.0, 1.0], [0.0, 1.0], [0.0, 0.5], [0.0, 0.5], [0.0, 0.5]])
+
+# "merged" is the grouping recipe_distance uses; "split" keeps every role apart
+ROLE_GROUPINGS = {"merged": ROLE_GROUPS, "split": {}}
+
+
+# ---------------------------------------------------------------------------
+# Constraints
+# ---------------------------------------------------------------------------
+
+def load_constraints(path: Path, recipe_names: list[str]) -> dict:
+    """
+    Parse a constraint file into arrays over a list of unique recipe pairs:
+      pairs          — (P, 2) recipe indices of every constrained pair
+      near, far      — (O,) pair indices of ordered constraints
+      margin         — (O,) required gap d(far) - d(near)
+      band, bound    — (B,) pair index and bound of absolute constraints
+      band_sign      — (B,) +1 for "max", -1 for "min"
+      order_weight, band_weight
+      lines          — the parsed constraints, in file order
+    Raises ValueError for unknown recipes or malformed lines.
+    """
+    index = {name: i for i, name in enumerate(recipe_names)}
+    pairs: dict[tuple[int, int], int] = {}
+
+    def pair_id(a: str, b: str, line: int) -> int:
+        for name in (a, b):
+            if name not in index:
+                raise ValueError(f"{path}:{line}: unknown recipe {name!r}")
+        key = tuple(sorted((index[a], index[b])))
+        return pairs.setdefault(key, len(pairs))
+
+    near, far, margin, order_weight = [], [], [], []
+    band, bound, band_sign, band_weight = [], [], [], []
+    lines = []
+    with open(path) as f:
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            c = json.loads(text)
+            lines.append(c)
+            weight = float(c.get("weight", 1.0))
+            if "anchor" in c:
+                near.append(pair_id(c["anchor"], c["closer"], line))
+                far.append(pair_id(c["anchor"], c["farther"], line))
+            elif "closer" in c:
+                near.append(pair_id(*c["closer"], line))
+                far.append(pair_id(*c["farther"], line))
+            elif "pair" in c and ("max" in c or "min" in c):
+                band.append(pair_id(*c["pair"], line))
+                bound.append(float(c["max"] if "max" in c else c["min"]))
+                band_sign.append(1.0 if "max" in c else -1.0)
+                band_weight.append(weight)
+                continue
+            else:
+                raise ValueError(f"{path}:{line}: expected anchor/closer/farther, "
+                                 "closer/farther pairs, or pair with max/min")
+            margin.append(float(c.get("margin", 0.0)))
+            order_weight.append(weight)
+
+    return {
+        "pairs": np.array(list(pairs), dtype=np.int64).reshape(-1, 2),
+        "near": np.array(near, dtype=np.int64),
+        "far": np.array(far, dtype=np.int64),
+        "margin": np.array(margin),
+        "order_weight": np.array(order_weight),
+        "band": np.array(band, dtype=np.int64),
+        "bound": np.array(bound),
+        "band_sign": np.array(band_sign),
+        "band_weight": np.array(band_weight),
+        "lines": lines,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Vectorized distances over constrained pairs
+# ---------------------------------------------------------------------------
+
+def pair_terms(recipe_names: list[str], pairs: np.ndarray, role_groups: dict | None = None) -> dict:
+    """
+    The parameter-free pieces of recipe_distance for each pair (P,):
+    flavor cosine distance, method mismatch, served class (0 same, 1 one is
+    "either", 2 up vs on_ice) and role-proportion distance.
+    """
+    used = np.unique(pairs)
+    f = recipe_feature_arrays([recipe_names[i] for i in used], role_groups)
+    local = np.searchsorted(used, pairs)
+    a, b = local[:, 0], local[:, 1]
+
+    sa, sb = f["served"][a], f["served"][b]
+    return {
+        "flavor": paired_flavor_distance(f["flavor"][a], f["flavor"][b]),
+        "method": (f["method"][a] != f["method"][b]).astype(float),
+        "served": np.where(sa == sb, 0, np.where((sa == 2) | (sb == 2), 1, 2)),
+        "roles": np.linalg.norm(f["roles"][a] - f["roles"][b], axis=1),
+    }
+
+
+def pair_distances(terms: dict, params: np.ndarray) -> np.ndarray:
+    """recipe_distance of every pair for each parameter row; (G, 5) -> (G, P)."""
+    params = np.atleast_2d(params)
+    alpha, beta, method_pen, either_pen, served_pen = (params[:, [k]] for k in range(5))
+    served = np.where(terms["served"] == 0, 0.0,
+                      np.where(terms["served"] == 1, either_pen, served_pen))
+    structural = np.minimum(method_pen * terms["method"] + served + terms["roles"], 1.0)
+    return alpha * terms["flavor"] + beta * structural
+
+
+def _slack(constraints: dict, dist: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-constraint slack (> 0 means satisfied) and weights, (G, C) and (C,)."""
+    order = dist[:, constraints["far"]] - dist[:, constraints["near"]] - constraints["margin"]
+    band = constraints["band_sign"] * (constraints["bound"] - dist[:, constraints["band"]])
+    weights = np.concatenate([constraints["order_weight"], constraints["band_weight"]])
+    return np.concatenate([order, band], axis=1), weights
+
+
+def satisfaction(constraints: dict, terms: dict, params: np.ndarray) -> np.ndarray:
+    """Weighted fraction of satisfied constraints for each parameter row, (G,)."""
+    slack, weights = _slack(constraints, pair_distances(terms, params))
+    return ((slack > 0) * weights).sum(axis=1) / weights.sum()
+
+
+def _smooth_loss(x: np.ndarray, constraints: dict, terms: dict, temperature: float) -> float:
+    """
+    Gradient-free-friendly surrogate: 1 - weighted mean sigmoid(slack / T).
+    Out-of-bounds parameters are clipped and penalised by their distance.
+    """
+    clipped = np.clip(x, BOUNDS[:, 0], BOUNDS[:, 1])
+    slack, weights = _slack(constraints, pair_distances(terms, clipped))
+    score = (weights / (1.0 + np.exp(-slack[0] / temperature))).sum() / weights.sum()
+    return 1.0 - score + np.abs(x - clipped).sum()
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def _grid(steps: int) -> np.ndarray:
+    axes = [np.linspace(lo, hi, steps) for lo, hi in BOUNDS]
+    return np.array(list(itertools.product(*axes)))
+
+
+def _refine(args: tuple) -> tuple[np.ndarray, float, float]:
+    start, constraints, terms, temperature = args
+    result = minimize(_smooth_loss, start, args=(constraints, terms, temperature),
+                      method="Nelder-Mead", options={"xatol": 1e-4, "fatol": 1e-6, "maxiter": 2000})
+    x = np.clip(result.x, BOUNDS[:, 0], BOUNDS[:, 1])
+    return x, float(satisfaction(constraints, terms, x)[0]), float(result.fun)
+
+
+def calibrate(constraints: dict, recipe_names: list[str], grid_steps: int = 6,
+              n_starts: int = 8, temperature: float = 0.02, workers: int = 1) -> dict:
+    """
+    Search PARAMS (within BOUNDS) and each ROLE_GROUPINGS entry for the
+    highest constraint satisfaction.
+
+    For each grouping the full grid (grid_steps per parameter) is scored in
+    one batched evaluation; the `n_starts` best grid points then seed
+    Nelder-Mead runs on a sigmoid-smoothed satisfaction (sharpness
+    `temperature`), in `workers` processes. Returns the best result and the
+    current defaults' score for comparison.
+    """
+    grid = _grid(grid_steps)
+    jobs = []
+    for grouping, role_groups in ROLE_GROUPINGS.items():
+        terms = pair_terms(recipe_names, constraints["pairs"], role_groups)
+        scores = np.concatenate([satisfaction(constraints, terms, chunk)
+                                 for chunk in np.array_split(grid, max(1, len(grid) // 4096))])
+        # Best points first; ties broken towards the current defaults
+        closeness = -np.abs(grid - DEFAULTS).sum(axis=1)
+        order = np.lexsort((-closeness, -scores))[:n_starts]
+        jobs += [(grouping, (grid[i].copy(), constraints, terms, temperature)) for i in order]
+        jobs.append((grouping, (DEFAULTS.copy(), constraints, terms, temperature)))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_refine, [job for _, job in jobs]))
+    else:
+        results = [_refine(job) for _, job in jobs]
+
+    # Highest satisfaction; among equals, the widest margins (lowest smooth loss)
+    (grouping, _), (x, score, _) = min(zip(jobs, results), key=lambda r: (-r[1][1], r[1][2]))
+    best = {"grouping": grouping, "params": dict(zip(PARAMS, x.round(4).tolist())),
+            "satisfaction": round(score, 4)}
+
+    merged = pair_terms(recipe_names, constraints["pairs"], ROLE_GROUPINGS["merged"])
+    return {
+        "best": best,
+        "defaults": {
+            "grouping": "merged",
+            "params": dict(zip(PARAMS, DEFAULTS.tolist())),
+            "satisfaction": round(float(satisfaction(constraints, merged, DEFAULTS)[0]), 4),
+        },
+        "n_constraints": len(constraints["lines"]),
+        "grid_points": len(grid) * len(ROLE_GROUPINGS),
+    }
+
+
+def violations(constraints: dict, recipe_names: list[str], grouping: str,
+               params: dict) -> list[dict]:
+    """Constraints that `params` leaves unsatisfied, with their slack."""
+    terms = pair_terms(recipe_names, constraints["pairs"], ROLE_GROUPINGS[grouping])
+    x = np.array([params[p] for p in PARAMS])
+    slack, _ = _slack(constraints, pair_distances(terms, x))
+    # _slack orders ordered constraints before bands; map back to file lines
+    ordered = [c for c in constraints["lines"] if "pair" not in c]
+    bands = [c for c in constraints["lines"] if "pair" in c]
+    return [
+        {**c, "slack": round(float(s), 4)}
+        for c, s in zip(ordered + bands, slack[0]) if s < 0
+    ]
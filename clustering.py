@@ -0,0 +1,302 @@
+"""
+clustering.py
+=============
+Clustering utilities for cocktail layouts and distance matrices.
+
+  track_clusters  — KMeans across an ordered sequence of 2D frames (e.g. the
+                    τ sweep) seeded from the neighbouring frame, with label
+                    matching, so cluster ids mean the same thing in every frame.
+  linkage         — agglomerative clustering straight from a condensed
+                    distance matrix (recipe_distance or any strategy), using
+                    the nearest-neighbour chain algorithm: O(n²) time and
+                    O(n) memory on top of the matrix itself.
+  cut_tree        — flat cluster labels from a linkage matrix.
+  hierarchy_entry — linkage + flat cuts as an embeddings.json entry.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+
+
+# ---------------------------------------------------------------------------
+# Cluster tracking across frames
+# ---------------------------------------------------------------------------
+
+def _carry(points: np.ndarray, source: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Map `points` from `source`'s coordinates into `target`'s with the
+    similarity transform (rotation/reflection, scale, shift) that best fits
+    source onto target. UMAP rescales and rotates every frame, so centroids
+    are only a sensible seed once carried across.
+    """
+    mu_s, mu_t = source.mean(axis=0), target.mean(axis=0)
+    S, T = source - mu_s, target - mu_t
+    u, s, vt = np.linalg.svd(S.T @ T)
+    return (points - mu_s) @ (u @ vt) * (s.sum() / (S ** 2).sum()) + mu_t
+
+
+def _fit_chain(frames: list[np.ndarray], order: list[int], previous: int, labels: np.ndarray,
+               all_centers: np.ndarray, n_init: int, random_state: int) -> None:
+    """
+    Fit frames in `order`, each seeded from the previous frame's centroids
+    carried into its coordinates. A multi-start fit is kept instead when it
+    reaches lower inertia, so the seed never traps a frame in a worse
+    clustering.
+    """
+    n_clusters = all_centers.shape[1]
+    for t in order:
+        seed = _carry(all_centers[previous], frames[previous], frames[t])
+        km = KMeans(n_clusters=n_clusters, init=seed, n_init=1).fit(frames[t])
+        fresh = KMeans(n_clusters=n_clusters, n_init=n_init, random_state=random_state).fit(frames[t])
+        if fresh.inertia_ < km.inertia_:
+            km = fresh
+        labels[t] = km.labels_
+        all_centers[t] = km.cluster_centers_
+        previous = t
+
+
+def match_labels(reference: np.ndarray, labels: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Permutation p such that p[labels] agrees with `reference` on as many points
+    as possible (Hungarian assignment on the label contingency table).
+    """
+    overlap = np.zeros((n_clusters, n_clusters), dtype=np.int64)
+    np.add.at(overlap, (labels, reference), 1)
+    rows, cols = linear_sum_assignment(-overlap)
+    perm = np.empty(n_clusters, dtype=np.int64)
+    perm[rows] = cols
+    return perm
+
+
+def track_clusters(
+    frames: list[np.ndarray],
+    n_clusters: int = 8,
+    anchor: int | None = None,
+    n_init: int = 10,
+    random_state: int = 42,
+) -> dict:
+    """
+    Cluster every frame of an ordered sweep with persistent cluster ids.
+
+    The anchor frame (default: the middle one) gets a multi-start KMeans fit.
+    The frames below and above it form two independent chains fitted in
+    parallel: each frame is seeded from its neighbour's centroids, carried
+    into its own coordinates by a Procrustes fit, and keeps whichever of that
+    and a multi-start fit has the lower inertia. Labels are then aligned
+    outward from the anchor by optimal assignment, so a change of label
+    between adjacent frames is a real move, not a permutation.
+
+    Returns a dict with:
+      labels       — (n_frames, n_points) int array of aligned cluster ids
+      centers      — (n_frames, n_clusters, 2) centroids in aligned order
+      transitions  — (n_frames - 1, n_clusters, n_clusters) counts of
+                     label[t] -> label[t + 1]
+      migrations   — (n_frames - 1,) points that changed cluster at each step
+    """
+    n_frames = len(frames)
+    n_points = len(frames[0])
+    anchor = n_frames // 2 if anchor is None else anchor
+
+    labels = np.empty((n_frames, n_points), dtype=np.int64)
+    centers = np.empty((n_frames, n_clusters, frames[0].shape[1]))
+
+    km = KMeans(n_clusters=n_clusters, n_init=n_init, random_state=random_state)
+    labels[anchor] = km.fit_predict(frames[anchor])
+    centers[anchor] = km.cluster_centers_
+
+    # Two chains share nothing but the anchor, so they can run side by side.
+    down = list(range(anchor - 1, -1, -1))
+    up = list(range(anchor + 1, n_frames))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        jobs = [
+            pool.submit(_fit_chain, frames, order, anchor, labels, centers, n_init, random_state)
+            for order in (down, up) if order
+        ]
+        for job in jobs:
+            job.result()
+
+    # Align each frame to its already-aligned neighbour on the anchor side.
+    for order, step in ((down, 1), (up, -1)):
+        for t in order:
+            perm = match_labels(labels[t + step], labels[t], n_clusters)
+            labels[t] = perm[labels[t]]
+            aligned = np.empty_like(centers[t])
+            aligned[perm] = centers[t]
+            centers[t] = aligned
+
+    transitions = np.zeros((n_frames - 1, n_clusters, n_clusters), dtype=np.int64)
+    steps = np.repeat(np.arange(n_frames - 1), n_points)
+    np.add.at(transitions, (steps, labels[:-1].ravel(), labels[1:].ravel()), 1)
+    migrations = (labels[:-1] != labels[1:]).sum(axis=1)
+
+    return {
+        "labels": labels,
+        "centers": centers,
+        "transitions": transitions,
+        "migrations": migrations,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Hierarchical clustering (nearest-neighbour chain)
+# ---------------------------------------------------------------------------
+
+LINKAGE_METHODS = ("single", "complete", "average", "ward")
+
+
+def condensed_index(n: int, i: int, j: np.ndarray) -> np.ndarray:
+    """Positions of pairs (i, j[k]) in a condensed (upper-triangle) matrix; i != j."""
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    return lo * n - lo * (lo + 1) // 2 + hi - lo - 1
+
+
+def _lance_williams(method: str, d_xk: np.ndarray, d_yk: np.ndarray, d_xy: float,
+                    n_x: float, n_y: float, n_k: np.ndarray) -> np.ndarray:
+    """Distance from each cluster k to the merge of x and y."""
+    if method == "single":
+        return np.minimum(d_xk, d_yk)
+    if method == "complete":
+        return np.maximum(d_xk, d_yk)
+    if method == "average":
+        return (n_x * d_xk + n_y * d_yk) / (n_x + n_y)
+    # ward
+    total = n_x + n_y + n_k
+    return np.sqrt(np.maximum(
+        ((n_x + n_k) * d_xk ** 2 + (n_y + n_k) * d_yk ** 2 - n_k * d_xy ** 2) / total, 0.0
+    ))
+
+
+def _relabel(merges: np.ndarray, n: int) -> np.ndarray:
+    """Turn (slot_a, slot_b, dist) merges, sorted by dist, into a scipy linkage matrix."""
+    parent = np.arange(2 * n - 1)
+    cluster_of = np.arange(n)      # representative point slot -> current cluster id
+    sizes = np.ones(2 * n - 1)
+    Z = np.empty((n - 1, 4))
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for step, (a, b, dist) in enumerate(merges):
+        ra, rb = find(int(a)), find(int(b))
+        ca, cb = cluster_of[ra], cluster_of[rb]
+        new = n + step
+        Z[step] = (min(ca, cb), max(ca, cb), dist, sizes[ca] + sizes[cb])
+        sizes[new] = sizes[ca] + sizes[cb]
+        parent[rb] = ra
+        cluster_of[ra] = new
+    return Z
+
+
+def linkage(condensed: np.ndarray, method: str = "average", overwrite: bool = False) -> np.ndarray:
+    """
+    Agglomerative clustering of a condensed distance matrix (as produced by
+    scipy.spatial.distance.squareform) with the nearest-neighbour chain
+    algorithm. Returns a scipy-compatible (n - 1, 4) linkage matrix.
+
+    The matrix is updated in place with Lance-Williams formulas, so apart
+    from it only O(n) working memory is used; pass overwrite=True to reuse the
+    caller's array (e.g. a float32 memmap copy) instead of copying it first.
+    """
+    if method not in LINKAGE_METHODS:
+        raise ValueError(f"Unknown linkage method {method!r}; expected one of {LINKAGE_METHODS}")
+    D = condensed if overwrite else np.array(condensed, copy=True)
+    n = int(round((1 + np.sqrt(1 + 8 * len(D))) / 2))
+    if n * (n - 1) // 2 != len(D):
+        raise ValueError(f"Condensed matrix of length {len(D)} is not n*(n-1)/2")
+
+    everyone = np.arange(n)
+    active = np.ones(n, dtype=bool)
+    size = np.ones(n)
+    merges = np.empty((n - 1, 3))
+    chain: list[int] = []
+
+    def row(x):
+        r = np.full(n, np.inf)
+        others = everyone[active & (everyone != x)]
+        r[others] = D[condensed_index(n, x, others)]
+        return r
+
+    for step in range(n - 1):
+        if not chain:
+            chain.append(int(np.argmax(active)))
+        while True:
+            x = chain[-1]
+            r = row(x)
+            y = int(np.argmin(r))
+            # Prefer the previous chain element on ties, so the chain terminates
+            if len(chain) > 1 and r[chain[-2]] <= r[y]:
+                y = chain[-2]
+            if len(chain) > 1 and y == chain[-2]:
+                break
+            chain.append(y)
+
+        chain.pop()
+        chain.pop()
+        d_xy = r[y]
+        merges[step] = (x, y, d_xy)
+
+        # The merged cluster lives in slot y; slot x is retired
+        active[x] = False
+        others = everyone[active & (everyone != y)]
+        idx_y = condensed_index(n, y, others)
+        d_xk = D[condensed_index(n, x, others)]
+        D[idx_y] = _lance_williams(method, d_xk, D[idx_y], d_xy, size[x], size[y], size[others])
+        size[y] += size[x]
+
+    order = np.argsort(merges[:, 2], kind="stable")
+    return _relabel(merges[order], n)
+
+
+def cut_tree(Z: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Flat labels for `n_clusters` clusters: apply all but the last
+    n_clusters - 1 merges. Labels are numbered by first appearance.
+    """
+    n = len(Z) + 1
+    parent = np.arange(2 * n - 1)
+    steps = np.arange(n - n_clusters)
+    parent[Z[steps, 0].astype(np.int64)] = n + steps
+    parent[Z[steps, 1].astype(np.int64)] = n + steps
+    # Pointer jumping: every node ends up pointing at its root in O(log depth) passes
+    while True:
+        jumped = parent[parent]
+        if np.array_equal(jumped, parent):
+            break
+        parent = jumped
+    owner = parent[:n]
+    _, labels = np.unique(owner, return_inverse=True)
+    first_seen = {}
+    return np.array([first_seen.setdefault(l, len(first_seen)) for l in labels])
+
+
+def hierarchy_entry(names: list[str], Z: np.ndarray, method: str,
+                    cuts: tuple[int, ...] = (4, 6, 8, 12), source: str = "recipe_distance") -> dict:
+    """
+    embeddings.json-style entry for a dendrogram: the linkage rows (cluster
+    ids < n are recipes in `names` order) and flat labels for each cut.
+    """
+    return {
+        "description": (
+            f"Hierarchical clustering ({method} linkage) of {source}, computed "
+            "on the full high-dimensional distances rather than a 2D layout."
+        ),
+        "method": method,
+        "source": source,
+        "order": names,
+        "linkage": [
+            {"a": int(a), "b": int(b), "distance": round(float(d), 6), "size": int(s)}
+            for a, b, d, s in Z
+        ],
+        "cuts": {
+            str(k): dict(zip(names, cut_tree(Z, k).tolist()))
+            for k in cuts if k <= len(names)
+        },
+    }
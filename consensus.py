@@ -0,0 +1,133 @@
+"""
+consensus.py
+============
+Neighbours that hold up across strategies, by rank aggregation.
+
+Each strategy view (BLEND, ROLE-SLOT, PERCEPTUAL, every α frame, every τ)
+contributes only its top-k lists, computed with the blocked neighbors.knn
+as the view is produced, so no view's n×n matrix — let alone fifty of
+them — ever exists in full. The (views, n, k) rankings are then fused per
+recipe:
+
+  rrf    — reciprocal-rank fusion, Σ_v w_v / (rrf_k + rank)
+  borda  — Borda count, Σ_v w_v · (k - rank + 1) over the lists a candidate is in
+
+  view_rankings     — stack per-view top-k lists from an iterable of matrices
+  family_weights    — weights giving every strategy family (all α frames,
+                      all τ frames, ...) the same total say
+  fuse              — consensus top-k with fused score and agreement
+  consensus_entry   — the embeddings.json strategy entry
+"""
+
+from typing import Iterable
+
+import numpy as np
+
+from neighbors import knn
+
+FUSIONS = ("rrf", "borda")
+
+
+def view_rankings(views: Iterable[tuple[str, np.ndarray]], k: int = 10,
+                  metric: str = "cosine") -> tuple[list[str], np.ndarray]:
+    """
+    (view names, (V, n, k) neighbour indices) from (name, matrix) pairs.
+    `views` may be a generator, so only one matrix needs to be alive at a time.
+    """
+    names, rankings = [], []
+    for name, matrix in views:
+        names.append(name)
+        rankings.append(knn(matrix, k=k, metric=metric)[0])
+    if not rankings:
+        raise ValueError("No views to rank")
+    if len({r.shape for r in rankings}) > 1:
+        raise ValueError("Every view must cover the same recipes")
+    return names, np.stack(rankings)
+
+
+def family_weights(families: list[str]) -> np.ndarray:
+    """Per-view weights such that each distinct family sums to 1."""
+    _, inverse, counts = np.unique(families, return_inverse=True, return_counts=True)
+    return 1.0 / counts[inverse]
+
+
+def fuse(rankings: np.ndarray, weights: np.ndarray | None = None, method: str = "rrf",
+         k: int = 5, rrf_k: float = 60.0, block: int = 4096) -> tuple[np.ndarray, ...]:
+    """
+    Fuse (V, n, depth) rankings into a consensus top-k per row.
+
+    Returns (indices, scores, agreement), each (n, k): consensus neighbours
+    best first, their fused score, and the weighted fraction of views that
+    have them in their top-`depth`. Rows are fused `block` at a time. A row
+    with fewer than k distinct candidates (k > depth, or views that agree)
+    is padded with index -1 and NaN score / agreement.
+    """
+    if method not in FUSIONS:
+        raise ValueError(f"Unknown fusion {method!r}; expected one of {FUSIONS}")
+    n_views, n, depth = rankings.shape
+    weights = np.ones(n_views) if weights is None else np.asarray(weights, dtype=float)
+    if weights.shape != (n_views,):
+        raise ValueError(f"Expected {n_views} weights, got {weights.shape}")
+    k = min(k, n - 1)
+
+    ranks = np.arange(1, depth + 1)
+    per_rank = 1.0 / (rrf_k + ranks) if method == "rrf" else (depth - ranks + 1).astype(float)
+    # Score and support of every (view, rank) slot, (V, depth)
+    slot_score = weights[:, None] * per_rank[None, :]
+    slot_support = np.broadcast_to(weights[:, None], slot_score.shape)
+
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k))
+    agreement = np.empty((n, k))
+    total = weights.sum()
+    for i0 in range(0, n, block):
+        i1 = min(i0 + block, n)
+        b = i1 - i0
+        # Candidates of each row in the block, (b, V·depth), keyed row·n + candidate
+        cand = rankings[:, i0:i1].transpose(1, 0, 2).reshape(b, -1)
+        # Padding (-1) and the row itself are not candidates
+        valid = ((cand >= 0) & (cand != np.arange(i0, i1)[:, None])).ravel()
+        keys = (np.arange(b)[:, None] * n + cand).ravel()[valid]
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        score = np.bincount(inverse, np.broadcast_to(slot_score.ravel(), (b, slot_score.size)).ravel()[valid])
+        support = np.bincount(inverse, np.broadcast_to(slot_support.ravel(), (b, slot_score.size)).ravel()[valid])
+        row, other = uniq // n, uniq % n
+
+        # Per row: highest score, then widest support, then lowest index
+        order = np.lexsort((other, -support, -score, row))
+        first = np.searchsorted(row[order], np.arange(b))
+        # Slots past a row's own candidates point at a trailing padding entry
+        filled = np.arange(k)[None, :] < np.bincount(row, minlength=b)[:, None]
+        take = np.r_[order, len(uniq)][np.where(filled, first[:, None] + np.arange(k), len(uniq))]
+        indices[i0:i1] = np.r_[other, -1][take]
+        scores[i0:i1] = np.r_[score, np.nan][take]
+        agreement[i0:i1] = np.r_[support / total, np.nan][take]
+    return indices, scores, agreement
+
+
+def consensus_entry(recipe_names: list[str], view_names: list[str], indices: np.ndarray,
+                    scores: np.ndarray, agreement: np.ndarray, method: str) -> dict:
+    """
+    embeddings.json entry: {description, method, views, neighbors, agreement}.
+    Each neighbour carries its fused score and agreement; the per-recipe
+    agreement is the mean over its consensus neighbours.
+    """
+    return {
+        "description": (f"Consensus neighbours: {method.upper()} fusion of the top-k lists of "
+                        f"{len(view_names)} strategy views. Agreement is the weighted share "
+                        "of views that rank the neighbour in their top-k."),
+        "method": method,
+        "views": view_names,
+        "neighbors": {
+            name: [
+                {"name": recipe_names[j], "score": round(float(s), 4),
+                 "agreement": round(float(a), 4)}
+                for j, s, a in zip(indices[i], scores[i], agreement[i]) if j >= 0
+            ]
+            for i, name in enumerate(recipe_names)
+        },
+        "agreement": {
+            name: round(float(np.nanmean(agreement[i])), 4) if (indices[i] >= 0).any() else 0.0
+            for i, name in enumerate(recipe_names)
+        },
+    }
@@ -0,0 +1,217 @@
+"""
+cooccurrence.py
+===============
+Ingredient embeddings learned from the recipes themselves rather than the
+hand-scored flavor table: two ingredients end up close when they are used
+alongside the same other ingredients, in the same roles (the gin of a
+Bijou and the Irish whiskey of a Tipperary, both opposite sweet vermouth
+and Chartreuse).
+
+  context_matrix      — sparse (recipes × contexts) volume- and role-weighted
+                        incidence; a context is an (ingredient, role group)
+  cooccurrence        — sparse ingredient × context co-occurrence counts
+  ppmi                — positive PMI with context-distribution smoothing
+  ingredient_embeddings — truncated SVD of the PPMI matrix (svds)
+  recipe_matrix       — sparse (recipes × ingredients) blend proportions
+  cooccurrence_vectors — recipe vectors composed from the embeddings
+  component_labels    — a readable name for each SVD component
+
+Everything stays sparse until the (ingredients × dims) factor, so the cost
+grows with the number of recipe components rather than vocabulary².
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+from loaders import Dataset, resolve
+from utils import GARNISH_WEIGHT, ROLE_GROUPS, SEASONING_WEIGHT
+
+DIMS = 16
+SMOOTHING = 0.75
+# How strongly a component's role marks it as context (garnishes count as "garnish")
+ROLE_WEIGHTS = {
+    "base": 1.0,
+    "modifier": 1.0,
+    "sweetener": 0.5,
+    "citrus": 0.75,
+    "accent": 0.75,
+    "seasoning": 0.5,
+    "garnish": 0.25,
+}
+
+
+# ---------------------------------------------------------------------------
+# Co-occurrence
+# ---------------------------------------------------------------------------
+
+def _recipe_entries(recipe: dict):
+    """(ingredient, role, volume share) for every component and garnish."""
+    components = recipe["components"]
+    total = sum(c["ml"] for c in components if c["ml"] is not None)
+    for c in components:
+        share = c["ml"] / total if c["ml"] is not None and total > 0 else SEASONING_WEIGHT
+        yield c["ingredient"], c["role"], share
+    for g in recipe.get("garnish", []):
+        yield g, "garnish", GARNISH_WEIGHT
+
+
+def context_matrix(recipe_names: list[str] | None = None,
+                   ingredient_names: list[str] | None = None,
+                   role_weights: dict | None = None,
+                   dataset: Dataset | None = None) -> tuple[sparse.csr_matrix, sparse.csr_matrix, list]:
+    """
+    (ingredient incidence (R, I), context incidence (R, C), context labels).
+    An entry's weight is role weight × √(volume share) — the square root
+    keeps a 7.5 ml accent from vanishing next to a 60 ml base. Ingredients
+    outside `ingredient_names` are skipped.
+    """
+    ds = resolve(dataset)
+    recipe_names = list(ds.recipes) if recipe_names is None else recipe_names
+    ingredient_names = list(ds.ingredients) if ingredient_names is None else ingredient_names
+    role_weights = ROLE_WEIGHTS if role_weights is None else role_weights
+    index = {name: i for i, name in enumerate(ingredient_names)}
+    contexts: dict[tuple[str, str], int] = {}
+
+    rows, ing_cols, ctx_cols, weights = [], [], [], []
+    for r, name in enumerate(recipe_names):
+        for ingredient, role, share in _recipe_entries(ds.recipes[name]):
+            i = index.get(ingredient)
+            if i is None:
+                continue
+            group = ROLE_GROUPS.get(role, role)
+            rows.append(r)
+            ing_cols.append(i)
+            ctx_cols.append(contexts.setdefault((ingredient, group), len(contexts)))
+            weights.append(role_weights.get(role, 1.0) * np.sqrt(share))
+
+    n = len(recipe_names)
+    ingredients = sparse.csr_matrix((weights, (rows, ing_cols)), shape=(n, len(ingredient_names)))
+    context = sparse.csr_matrix((weights, (rows, ctx_cols)), shape=(n, len(contexts)))
+    return ingredients, context, [f"{i}|{g}" for i, g in contexts]
+
+
+def cooccurrence(ingredients: sparse.csr_matrix, context: sparse.csr_matrix,
+                 labels: list[str], ingredient_names: list[str]) -> sparse.csr_matrix:
+    """
+    (I, C) weighted co-occurrence of each ingredient with every context in
+    the same recipe, excluding the ingredient's own contexts.
+    """
+    counts = (ingredients.T @ context).tocoo()
+    own = np.array([label.split("|", 1)[0] for label in labels])
+    keep = own[counts.col] != np.asarray(ingredient_names, dtype=object)[counts.row]
+    return sparse.csr_matrix((counts.data[keep], (counts.row[keep], counts.col[keep])),
+                             shape=counts.shape)
+
+
+def ppmi(counts: sparse.csr_matrix, smoothing: float = SMOOTHING) -> sparse.csr_matrix:
+    """
+    max(0, log P(i, c) / (P(i) P_α(c))) on the stored entries only, with
+    context counts raised to `smoothing` (Levy, Goldberg & Dagan 2015) so
+    rare contexts do not dominate.
+    """
+    counts = counts.tocoo()
+    total = counts.sum()
+    if total <= 0:
+        return sparse.csr_matrix(counts.shape)
+    row = np.asarray(counts.sum(axis=1)).ravel()
+    col = np.asarray(counts.sum(axis=0)).ravel() ** smoothing
+    col = col / col.sum()
+    pmi = np.log(counts.data / total / (row[counts.row] / total * col[counts.col]))
+    keep = pmi > 0
+    return sparse.csr_matrix((pmi[keep], (counts.row[keep], counts.col[keep])), shape=counts.shape)
+
+
+def ingredient_embeddings(recipe_names: list[str] | None = None,
+                          ingredient_names: list[str] | None = None, dims: int = DIMS,
+                          smoothing: float = SMOOTHING, role_weights: dict | None = None,
+                          dataset: Dataset | None = None) -> np.ndarray:
+    """
+    (I, dims) ingredient embeddings U·√Σ from a truncated SVD of the PPMI
+    matrix, largest component first, signs fixed so each component's
+    largest loading is positive. Ingredients that never co-occur are zero.
+    The SVD runs in float64; the result is in the dataset's precision.
+    """
+    ds = resolve(dataset)
+    ingredient_names = list(ds.ingredients) if ingredient_names is None else ingredient_names
+    ingredients, context, labels = context_matrix(recipe_names, ingredient_names, role_weights, ds)
+    matrix = ppmi(cooccurrence(ingredients, context, labels, ingredient_names), smoothing)
+    k = min(dims, min(matrix.shape) - 1)
+    if k < 1 or matrix.nnz == 0:
+        return np.zeros((len(ingredient_names), dims), dtype=ds.precision)
+    # Deterministic start vector so rebuilds give the same layout
+    v0 = np.ones(min(matrix.shape)) / np.sqrt(min(matrix.shape))
+    u, s, _ = svds(matrix, k=k, v0=v0)
+    order = np.argsort(-s)
+    u, s = u[:, order], s[order]
+    u *= np.sign(u[np.abs(u).argmax(axis=0), np.arange(k)])
+    out = np.zeros((len(ingredient_names), dims), dtype=ds.precision)
+    out[:, :k] = u * np.sqrt(s)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Recipes
+# ---------------------------------------------------------------------------
+
+def recipe_matrix(recipe_names: list[str] | None = None,
+                  ingredient_names: list[str] | None = None,
+                  dataset: Dataset | None = None) -> sparse.csr_matrix:
+    """(R, I) blend proportions as in compile_recipes["blend"], stored sparse."""
+    ds = resolve(dataset)
+    recipe_names = list(ds.recipes) if recipe_names is None else recipe_names
+    ingredient_names = list(ds.ingredients) if ingredient_names is None else ingredient_names
+    index = {name: i for i, name in enumerate(ingredient_names)}
+    rows, cols, weights = [], [], []
+    for r, name in enumerate(recipe_names):
+        for ingredient, _, share in _recipe_entries(ds.recipes[name]):
+            if ingredient in index:
+                rows.append(r)
+                cols.append(index[ingredient])
+                weights.append(share)
+    return sparse.csr_matrix((weights, (rows, cols)),
+                             shape=(len(recipe_names), len(ingredient_names)), dtype=ds.precision)
+
+
+def cooccurrence_vectors(recipe_names: list[str] | None = None, dims: int = DIMS,
+                         embeddings: np.ndarray | None = None,
+                         dataset: Dataset | None = None) -> np.ndarray:
+    """
+    (R, dims) recipe vectors: proportion-weighted blend of the ingredient
+    embeddings (learned from every recipe in the dataset unless given), in
+    the dataset's precision.
+    """
+    ds = resolve(dataset)
+    if embeddings is None:
+        embeddings = ingredient_embeddings(dims=dims, dataset=ds)
+    embeddings = np.asarray(embeddings, dtype=ds.precision)
+    return np.asarray(recipe_matrix(recipe_names, dataset=ds) @ embeddings)
+
+
+def component_labels(embeddings: np.ndarray, dataset: Dataset | None = None) -> list[str]:
+    """Each component named after its two highest-loading ingredients."""
+    names = list(resolve(dataset).ingredients)
+    top = np.argsort(-embeddings, axis=0)[:2]
+    return [f"{names[a]}/{names[b]}" for a, b in top.T]
+
+
+def most_similar(ingredient: str, embeddings: np.ndarray | None = None, k: int = 5,
+                 dataset: Dataset | None = None) -> list[tuple[str, float]]:
+    """Nearest ingredients by cosine similarity of their embeddings."""
+    ds = resolve(dataset)
+    embeddings = ingredient_embeddings(dataset=ds) if embeddings is None else embeddings
+    names = list(ds.ingredients)
+    norms = np.linalg.norm(embeddings, axis=1)
+    unit = np.divide(embeddings, norms[:, None], out=np.zeros_like(embeddings),
+                     where=norms[:, None] > 0)
+    i = names.index(ingredient)
+    sims = unit @ unit[i]
+    sims[i] = -np.inf
+    top = np.argsort(-sims, kind="stable")[:k]
+    return [(names[j], round(float(sims[j]), 4)) for j in top]
+
+
+if __name__ == "__main__":
+    emb = ingredient_embeddings()
+    for name in ["gin", "campari", "lime_juice", "sweet_vermouth", "green_chartreuse"]:
+        print(f"{name:18s} " + ", ".join(f"{n} {s:.2f}" for n, s in most_similar(name, emb)))
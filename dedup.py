@@ -0,0 +1,242 @@
+"""
+dedup.py
+========
+Near-duplicate recipes (martini / martini_olive, or thousands of scraped
+spellings of one daiquiri) found without comparing every pair.
+
+Each recipe becomes a token set — every component ingredient, every
+(ingredient, role, quantized proportion) and every garnish — summarised by
+a MinHash signature. LSH banding puts recipes whose signatures agree on a
+whole band in the same bucket; only those candidate pairs are verified with
+recipe_distance plus their signature-estimated Jaccard similarity (flavor
+distance alone cannot tell a gimlet from a southside). Verified pairs are
+joined into groups whose members all pass both checks against each other.
+
+  recipe_tokens     — the token set of one recipe
+  minhash           — (n, num_perm) signatures, computed in recipe blocks
+  lsh_candidates    — candidate pairs from banded signatures
+  find_duplicates   — verified duplicate groups with a canonical member
+  collapse          — drop every non-canonical member from a name list
+
+With the default 32 bands × 4 rows, a pair with token Jaccard similarity s
+becomes a candidate with probability 1 - (1 - s⁴)³², about 0.5 at s = 0.42
+and 0.99 at s = 0.6; MIN_JACCARD and recipe_distance then make the final
+decision.
+"""
+
+import hashlib
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from loaders import Dataset, resolve
+from utils import recipe_distance_block, recipe_distance_pairs, recipe_feature_arrays
+
+NUM_PERM = 128
+BANDS = 32
+PROPORTION_STEP = 0.05
+MAX_DISTANCE = 0.02
+MIN_JACCARD = 0.6
+MAX_BUCKET = 64
+_EMPTY = np.iinfo(np.uint64).max
+
+
+# ---------------------------------------------------------------------------
+# Signatures
+# ---------------------------------------------------------------------------
+
+def recipe_tokens(recipe: dict, step: float = PROPORTION_STEP) -> set[str]:
+    """
+    Ingredient tokens at two granularities — bare ingredient and
+    ingredient|role|proportion bin (seasonings bin as "dash") — plus
+    garnish tokens, so a changed pour or garnish costs only part of the set.
+    """
+    components = recipe["components"]
+    total = sum(c["ml"] for c in components if c["ml"] is not None)
+    tokens = set()
+    for c in components:
+        share = "dash" if c["ml"] is None or total <= 0 else str(round(c["ml"] / total / step))
+        tokens.add(c["ingredient"])
+        tokens.add(f"{c['ingredient']}|{c['role']}|{share}")
+    tokens.update(f"garnish|{g}" for g in recipe.get("garnish", []))
+    return tokens
+
+
+def _hash_tokens(tokens: list[str]) -> np.ndarray:
+    """Stable 64-bit token hashes (Python's hash() is salted per process)."""
+    return np.array([int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little")
+                     for t in tokens], dtype=np.uint64)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: every input bit flips about half the output bits."""
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def minhash(token_sets: list[set[str]], num_perm: int = NUM_PERM, seed: int = 0,
+            block: int = 4096) -> np.ndarray:
+    """
+    (n, num_perm) MinHash signatures; permutation k ranks a token hash x by
+    splitmix64(x ^ seed_k). Recipes are hashed `block` at a time, so the
+    (tokens × num_perm) work array stays bounded. Empty sets get all-ones
+    signatures.
+    """
+    seeds = np.random.default_rng(seed).integers(0, _EMPTY, num_perm, dtype=np.uint64,
+                                                 endpoint=True)
+    sig = np.full((len(token_sets), num_perm), _EMPTY, dtype=np.uint64)
+    for r0 in range(0, len(token_sets), block):
+        sets = [sorted(s) for s in token_sets[r0:r0 + block]]
+        rows = [r for r, s in enumerate(sets) if s]
+        if not rows:
+            continue
+        x = _hash_tokens([t for r in rows for t in sets[r]])
+        starts = np.cumsum([0] + [len(sets[r]) for r in rows[:-1]])
+        h = _mix64(x[:, None] ^ seeds[None, :])
+        sig[r0 + np.array(rows)] = np.minimum.reduceat(h, starts, axis=0)
+    return sig
+
+
+def lsh_candidates(sig: np.ndarray, bands: int = BANDS, max_bucket: int = MAX_BUCKET,
+                   seed: int = 1) -> np.ndarray:
+    """
+    Unique candidate pairs (m, 2), i < j, of rows sharing a bucket in any
+    band. Buckets larger than `max_bucket` (thousands of copies of one
+    drink) pair each member with the bucket's first member only, which keeps
+    the group connected without emitting every pair.
+    """
+    n, num_perm = sig.shape
+    if num_perm % bands:
+        raise ValueError(f"{num_perm} permutations do not split into {bands} bands")
+    rows = num_perm // bands
+    coef = np.random.default_rng(seed).integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+    pairs = []
+    for band in range(bands):
+        cols = slice(band * rows, (band + 1) * rows)
+        # Wrapping uint64 arithmetic is intended: the key is a hash of the band
+        with np.errstate(over="ignore"):
+            keys = (sig[:, cols] * coef[cols]).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        new = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        start = np.flatnonzero(new)
+        size = np.diff(np.r_[start, n])
+        pos = np.arange(n)
+        first = np.repeat(start, size)
+        rank = pos - first
+        # Members pair with every earlier member of the bucket (or only the first)
+        count = np.where(np.repeat(size, size) > max_bucket, np.minimum(rank, 1), rank)
+        if not count.any():
+            continue
+        left = np.repeat(pos, count)
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        right = np.repeat(first, count) + offset
+        pairs.append(np.stack([order[left], order[right]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+# ---------------------------------------------------------------------------
+# Groups
+# ---------------------------------------------------------------------------
+
+def find_duplicates(recipe_names: list[str] | None = None, max_distance: float = MAX_DISTANCE,
+                    min_jaccard: float = MIN_JACCARD, alpha: float = 0.5, beta: float = 0.5,
+                    num_perm: int = NUM_PERM, bands: int = BANDS, step: float = PROPORTION_STEP,
+                    dataset: Dataset | None = None) -> list[dict]:
+    """
+    Groups of recipes joined by candidate pairs within `max_distance`
+    (recipe_distance with alpha, beta) whose estimated token Jaccard
+    similarity is at least `min_jaccard`, largest first:
+
+        {"canonical": "martini", "members": ["martini", "martini_olive"],
+         "max_distance": 0.0004}
+
+    Every member is within max_distance and min_jaccard of every other
+    member, not just linked to one of them by a chain. The canonical member
+    is the group's medoid under recipe_distance (ties go to the earliest in
+    `recipe_names`). max_distance is the largest pairwise distance in the
+    group. Recipes without a duplicate are not listed.
+    """
+    ds = resolve(dataset)
+    names = list(ds.recipes) if recipe_names is None else list(recipe_names)
+    n = len(names)
+    sig = minhash([recipe_tokens(ds.recipes[name], step) for name in names], num_perm)
+    pairs = lsh_candidates(sig, bands)
+    if not len(pairs):
+        return []
+
+    features = recipe_feature_arrays(names, dataset=ds)
+    dist = recipe_distance_pairs(features, pairs[:, 0], pairs[:, 1], alpha, beta)
+    jaccard = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+    keep = (dist <= max_distance) & (jaccard >= min_jaccard)
+    pairs, dist = pairs[keep], dist[keep]
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    groups = []
+    for label in np.flatnonzero(np.bincount(labels) > 1):
+        members = np.flatnonzero(labels == label)
+        for canonical, group, spread in _split(members, features, sig, max_distance, min_jaccard,
+                                               alpha, beta):
+            groups.append({
+                "canonical": names[canonical],
+                "members": [names[i] for i in group],
+                "max_distance": round(float(spread), 6),
+            })
+    groups.sort(key=lambda g: (-len(g["members"]), names.index(g["canonical"])))
+    return groups
+
+
+def _split(members: np.ndarray, features: dict, sig: np.ndarray, max_distance: float,
+           min_jaccard: float, alpha: float, beta: float):
+    """
+    Yield (canonical, sorted members, largest pairwise distance) for the
+    groups inside one connected component of verified links. Links chain
+    (a ~ b ~ c does not make a ~ c), so every member must pass both checks
+    against every other member: starting from the medoid of what is left,
+    the nearest candidates join while they do, and the rest start over.
+    """
+    sub = {k: v[members] for k, v in features.items()}
+    dist = recipe_distance_block(sub, sub, alpha, beta)
+    remaining = np.arange(len(members))
+    while len(remaining) > 1:
+        d = dist[np.ix_(remaining, remaining)]
+        canonical = remaining[int(np.argmin(d.sum(axis=1)))]
+        group = [canonical]
+        for c in remaining[np.argsort(dist[canonical, remaining], kind="stable")]:
+            if c == canonical or dist[c, group].max() > max_distance:
+                continue
+            if (sig[members[c]] == sig[members[group]]).mean(axis=1).min() >= min_jaccard:
+                group.append(c)
+        remaining = np.setdiff1d(remaining, group if len(group) > 1 else [canonical])
+        if len(group) > 1:
+            group = np.sort(group)
+            within = dist[np.ix_(group, group)]
+            yield members[group[int(np.argmin(within.sum(axis=1)))]], members[group], within.max()
+
+
+def collapse(recipe_names: list[str], groups: list[dict]) -> tuple[list[str], dict[str, str]]:
+    """
+    (kept names in their original order, {dropped name: its canonical}) —
+    what a builder embeds after collapsing duplicate groups.
+    """
+    dropped = {m: g["canonical"] for g in groups for m in g["members"] if m != g["canonical"]}
+    return [name for name in recipe_names if name not in dropped], dropped
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    groups = find_duplicates()
+    print(f"{len(groups)} duplicate groups in {time.perf_counter() - start:.2f}s")
+    for g in groups:
+        others = [m for m in g["members"] if m != g["canonical"]]
+        print(f"  {g['canonical']:25s} ← {', '.join(others)}  (≤ {g['max_distance']:.4f})")
@@ -0,0 +1,233 @@
+"""
+designer.py
+===========
+Design a recipe towards a target flavor by beam search from a template in
+recipes.json.
+
+Each search step applies one edit to every recipe in the beam — swap an
+ingredient for another in the same taxonomy subtree, or pour ±ML_STEP of
+it — and keeps the `beam_width` candidates closest (cosine) to the target.
+All candidates of a step are scored together: they are written as
+compile_recipes-style weight arrays and passed to
+vectorize.strategy_vectors, so each step is a couple of matrix products.
+
+  substitutes     — ingredients a component may be swapped for
+  target_vector   — a target in strategy space from a recipe, a blend of two
+                    recipes, or per-dimension flavor values
+  design          — beam search; best recipes with their distances
+"""
+
+import numpy as np
+
+from loaders import Dataset, resolve
+from utils import GARNISH_WEIGHT, SEASONING_WEIGHT
+from vectorize import compile_recipes, strategy_vectors
+
+DESIGN_STRATEGIES = ("blend", "perceptual")
+ML_STEP = 7.5        # a quarter ounce
+MIN_ML = 7.5
+
+
+# ---------------------------------------------------------------------------
+# Targets and moves
+# ---------------------------------------------------------------------------
+
+def substitutes(ingredient: str, depth: int = 1, dataset: Dataset | None = None) -> list[str]:
+    """
+    Ingredients sharing `ingredient`'s category path minus its last `depth`
+    levels (depth 1: siblings, e.g. bourbon → rye_whiskey, scotch). The ingredient
+    itself is excluded; ingredients missing from the table have none.
+    """
+    ingredients = resolve(dataset).ingredients
+    if ingredient not in ingredients:
+        return []
+    path = ingredients[ingredient]["category_path"]
+    prefix = path[:max(1, len(path) - depth)]
+    return [
+        name for name, ing in ingredients.items()
+        if name != ingredient and ing["category_path"][:len(prefix)] == prefix
+    ]
+
+
+def target_vector(strategy: str = "blend", recipe: str | None = None,
+                  between: tuple[str, str, float] | None = None,
+                  flavor: dict[str, float] | None = None, base: str | None = None,
+                  dataset: Dataset | None = None) -> np.ndarray:
+    """
+    A target in `strategy` space, from exactly one of:
+      recipe   — that recipe's vector
+      between  — (a, b, t): (1 - t)·vec(a) + t·vec(b)
+      flavor   — {dim: value}; dims left out keep `base` recipe's values (or 0)
+    """
+    if sum(x is not None for x in (recipe, between, flavor)) != 1:
+        raise ValueError("Give exactly one of recipe, between or flavor")
+    ds = resolve(dataset)
+    names = [recipe] if recipe else list(between[:2]) if between else [base] if base else []
+    for name in names:
+        if name not in ds.recipes:
+            raise ValueError(f"Unknown recipe {name!r}")
+    flavor_dims = ds.flavor_dims
+    vectors = (strategy_vectors(compile_recipes(names, dataset=ds), ds.flavor_matrix(), strategy)
+               if names else np.zeros((0, len(flavor_dims))))
+
+    if recipe:
+        return vectors[0]
+    if between:
+        t = between[2]
+        return (1.0 - t) * vectors[0] + t * vectors[1]
+    unknown = set(flavor) - set(flavor_dims)
+    if unknown:
+        raise ValueError(f"Unknown flavor dimension(s) {sorted(unknown)}")
+    out = vectors[0].copy() if base else np.zeros(len(flavor_dims))
+    for dim, value in flavor.items():
+        out[flavor_dims.index(dim)] = value
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Batched scoring
+# ---------------------------------------------------------------------------
+
+def _score(items: np.ndarray, ml: np.ndarray, measured: np.ndarray, garnish: np.ndarray,
+           flavor: np.ndarray, strategy: str, target: np.ndarray) -> np.ndarray:
+    """
+    Cosine distance to `target` of N candidates: component ingredient
+    indices and volumes (N, C), which components are measured (C,) and the
+    template's garnish indices (G,).
+    """
+    n, n_i = len(items), flavor.shape[0] + 1
+    total = (ml * measured).sum(axis=1, keepdims=True)
+    weights = np.where(measured, ml / total, SEASONING_WEIGHT)
+    garnishes = np.broadcast_to(garnish, (n, len(garnish)))
+    all_items = np.concatenate([items, garnishes], axis=1)
+    all_weights = np.concatenate([weights, np.full(garnishes.shape, GARNISH_WEIGHT)], axis=1)
+
+    blend = np.zeros((n, n_i))
+    np.add.at(blend, (np.arange(n)[:, None], all_items), all_weights)
+    scale = np.concatenate([np.ones(items.shape), np.full(garnishes.shape, GARNISH_WEIGHT)], axis=1)
+    compiled = {"blend": blend, "items": all_items, "scale": scale}
+    vectors = strategy_vectors(compiled, flavor, strategy)
+
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(target)
+    return np.where(norms > 0, 1.0 - vectors @ target / np.where(norms > 0, norms, 1.0), 1.0)
+
+
+def _moves(items: np.ndarray, ml: np.ndarray, measured: np.ndarray,
+           swaps: list[np.ndarray], max_ml: float) -> tuple[np.ndarray, np.ndarray]:
+    """Every single-edit neighbour of a beam (B, C): swaps, then ±ML_STEP pours."""
+    out_items, out_ml = [], []
+    for c, options in enumerate(swaps):
+        if len(options):
+            new = np.repeat(items, len(options), axis=0)
+            new[:, c] = np.tile(options, len(items))
+            # A swap onto an ingredient already in the drink is a merge, not a move
+            keep = ~(new[:, c:c + 1] == np.delete(new, c, axis=1)).any(axis=1)
+            out_items.append(new[keep])
+            out_ml.append(np.repeat(ml, len(options), axis=0)[keep])
+        if measured[c]:
+            for delta in (-ML_STEP, ML_STEP):
+                new_ml = ml.copy()
+                new_ml[:, c] += delta
+                keep = (new_ml[:, c] >= MIN_ML) & (new_ml[:, c] <= max_ml)
+                out_items.append(items[keep])
+                out_ml.append(new_ml[keep])
+    return np.concatenate(out_items), np.concatenate(out_ml)
+
+
+def _unique(items: np.ndarray, ml: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Drop duplicate candidates (several edit orders reach the same recipe)."""
+    _, first = np.unique(np.concatenate([items, ml], axis=1), axis=0, return_index=True)
+    first.sort()
+    return items[first], ml[first]
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def design(template: str, target: np.ndarray, strategy: str = "blend", beam_width: int = 32,
+           steps: int = 6, top: int = 5, depth: int = 1, locked: set[str] | None = None,
+           max_ml: float = 90.0, dataset: Dataset | None = None) -> list[dict]:
+    """
+    Beam search from recipe `template` towards `target` (a vector in
+    `strategy` space, see target_vector).
+
+    Components in `locked` are never swapped (their volume may still change);
+    substitutes come from the same taxonomy subtree (`depth` levels up).
+    Stops after `steps` edits or when no candidate beats the best so far.
+    Returns the `top` distinct recipes seen, best first:
+      {"components": [...], "garnish": [...], "distance": d, "edits": n}
+    """
+    if strategy not in DESIGN_STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}; expected one of {DESIGN_STRATEGIES}")
+    ds = resolve(dataset)
+    if template not in ds.recipes:
+        raise ValueError(f"Unknown recipe {template!r}")
+    recipe = ds.recipes[template]
+    locked = locked or set()
+    names = list(ds.ingredients)
+    index = {name: i for i, name in enumerate(names)}
+    missing = len(names)
+    flavor = ds.flavor_matrix()
+    target = np.asarray(target, dtype=float)
+
+    components = recipe["components"]
+    items = np.array([[index.get(c["ingredient"], missing) for c in components]])
+    measured = np.array([c["ml"] is not None for c in components])
+    ml = np.array([[c["ml"] if c["ml"] is not None else 0.0 for c in components]], dtype=float)
+    garnish = np.array([index.get(g, missing) for g in recipe.get("garnish", [])], dtype=np.int64)
+    swaps = [
+        np.array([index[s] for s in substitutes(c["ingredient"], depth, ds)], dtype=np.int64)
+        if c["ingredient"] not in locked else np.empty(0, dtype=np.int64)
+        for c in components
+    ]
+
+    def score(i, m):
+        return _score(i, m, measured, garnish, flavor, strategy, target)
+
+    seen_items, seen_ml, seen_dist, seen_step = [items], [ml], [score(items, ml)], [np.zeros(1, int)]
+    beam_items, beam_ml, best = items, ml, seen_dist[0][0]
+    for step in range(1, steps + 1):
+        cand_items, cand_ml = _unique(*_moves(beam_items, beam_ml, measured, swaps, max_ml))
+        if len(cand_items) == 0:
+            break
+        dist = score(cand_items, cand_ml)
+        keep = np.argsort(dist, kind="stable")[:beam_width]
+        beam_items, beam_ml = cand_items[keep], cand_ml[keep]
+        seen_items.append(beam_items)
+        seen_ml.append(beam_ml)
+        seen_dist.append(dist[keep])
+        seen_step.append(np.full(len(keep), step))
+        if dist[keep[0]] >= best:
+            break
+        best = dist[keep[0]]
+
+    all_items, all_ml = np.concatenate(seen_items), np.concatenate(seen_ml)
+    all_dist, all_step = np.concatenate(seen_dist), np.concatenate(seen_step)
+    # Fewest edits first among equal recipes, then dedupe keeping that one
+    order = np.lexsort((all_step, all_dist))
+    _, first = np.unique(np.concatenate([all_items, all_ml], axis=1)[order], axis=0,
+                         return_index=True)
+    picked = order[np.sort(first)][:top]
+
+    results = []
+    for i in picked:
+        results.append({
+            "components": [
+                {**c, "ingredient": names[all_items[i, j]] if all_items[i, j] != missing
+                 else c["ingredient"], "ml": float(all_ml[i, j]) if measured[j] else None}
+                for j, c in enumerate(components)
+            ],
+            "garnish": list(recipe.get("garnish", [])),
+            "distance": round(float(all_dist[i]), 4),
+            "edits": int(all_step[i]),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    target = target_vector("blend", between=("negroni", "last_word", 0.5))
+    for r in design("negroni", target, "blend"):
+        parts = ", ".join(f"{c['ml']:g} {c['ingredient']}" if c["ml"] else c["ingredient"]
+                          for c in r["components"])
+        print(f"{r['distance']:.4f} ({r['edits']} edits)  {parts}")
@@ -0,0 +1,265 @@
+"""
+distance_store.py
+=================
+Tiled, memory-mapped storage for recipe distance matrices.
+
+A store is a single file:
+
+    b"CCDIST1\\n" | uint32 header length | JSON header | padding | float32 data
+
+The header records the strategy, its parameters, the recipe order, the layout
+("full" n×n or "condensed" upper triangle) and a fingerprint of the input
+features, so a cached matrix is only reused when it was built from the same
+data. Rows are read on demand, so nothing needs the whole matrix in RAM.
+
+  DistanceStore.compute  — fill a new store tile by tile (optionally in processes)
+  DistanceStore.open     — map an existing store read-only
+  open_or_compute        — reuse a matching cached store or build it
+"""
+
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from clustering import condensed_index
+from shared import SharedArrays, attach
+from utils import recipe_distance_block
+
+MAGIC = b"CCDIST1\n"
+ALIGN = 64
+CACHE = Path(__file__).parent / "data" / "cache"
+
+
+# ---------------------------------------------------------------------------
+# Block kernels
+# ---------------------------------------------------------------------------
+
+def cosine_features(vectors: np.ndarray) -> dict:
+    """Features for cosine-distance stores: rows scaled to unit length."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {"unit": np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)}
+
+
+def distance_block(kind: str, features: dict, params: dict,
+                   i0: int, i1: int, j0: int, j1: int) -> np.ndarray:
+    """Distances between rows i0:i1 and columns j0:j1."""
+    return feature_distances(kind, {k: v[i0:i1] for k, v in features.items()},
+                             {k: v[j0:j1] for k, v in features.items()}, params)
+
+
+def feature_distances(kind: str, rows: dict, cols: dict, params: dict) -> np.ndarray:
+    """(len(rows), len(cols)) distances between two feature subsets of one kind."""
+    if kind == "recipe_distance":
+        return recipe_distance_block(rows, cols, **params)
+    if kind == "cosine":
+        block = 1.0 - rows["unit"] @ cols["unit"].T
+        # Zero vectors have no direction: distance 1 to everything, as in cosine_distance
+        empty = (~rows["unit"].any(axis=1))[:, None] | (~cols["unit"].any(axis=1))[None, :]
+        return np.where(empty, 1.0, np.maximum(block, 0.0))
+    raise ValueError(f"Unknown distance kind {kind!r}")
+
+
+def fingerprint(features: dict) -> str:
+    h = hashlib.sha1()
+    for key in sorted(features):
+        h.update(key.encode())
+        h.update(np.ascontiguousarray(features[key]).tobytes())
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Tile workers
+# ---------------------------------------------------------------------------
+
+_worker: dict = {}
+
+
+def _init_worker(path: str, kind: str, descriptor: dict, params: dict) -> None:
+    store = DistanceStore.open(path, writable=True)
+    _worker.update(store=store, kind=kind, features=attach(descriptor), params=params)
+
+
+def _fill_tile(i0: int, i1: int) -> None:
+    w = _worker
+    w["store"].write_rows(i0, i1, w["kind"], w["features"], w["params"])
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+class DistanceStore:
+    """A float32 distance matrix backed by a memory-mapped file."""
+
+    def __init__(self, path: Path, header: dict, data: np.memmap):
+        self.path = Path(path)
+        self.header = header
+        self.names: list[str] = header["names"]
+        self.n = len(self.names)
+        self.layout: str = header["layout"]
+        self.data = data
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    # -- file format --------------------------------------------------------
+
+    @staticmethod
+    def _data_offset(header_bytes: bytes) -> int:
+        raw = len(MAGIC) + 4 + len(header_bytes)
+        return (raw + ALIGN - 1) // ALIGN * ALIGN
+
+    @classmethod
+    def create(cls, path: Path, names: list[str], strategy: str, params: dict,
+               layout: str = "condensed", source_hash: str = "") -> "DistanceStore":
+        if layout not in ("full", "condensed"):
+            raise ValueError(f"layout must be 'full' or 'condensed', got {layout!r}")
+        header = {
+            "strategy": strategy,
+            "params": params,
+            "layout": layout,
+            "dtype": "float32",
+            "source_hash": source_hash,
+            "names": list(names),
+        }
+        header_bytes = json.dumps(header).encode()
+        offset = cls._data_offset(header_bytes)
+        n = len(names)
+        shape = (n, n) if layout == "full" else (n * (n - 1) // 2,)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+            f.write(b"\0" * (offset - f.tell()))
+            f.truncate(offset + int(np.prod(shape)) * 4)
+        data = np.memmap(path, dtype=np.float32, mode="r+", offset=offset, shape=shape)
+        return cls(path, header, data)
+
+    @classmethod
+    def open(cls, path: Path, writable: bool = False) -> "DistanceStore":
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a distance store")
+            (length,) = struct.unpack("<I", f.read(4))
+            header_bytes = f.read(length)
+        header = json.loads(header_bytes)
+        n = len(header["names"])
+        shape = (n, n) if header["layout"] == "full" else (n * (n - 1) // 2,)
+        data = np.memmap(path, dtype=np.float32, mode="r+" if writable else "r",
+                         offset=cls._data_offset(header_bytes), shape=shape)
+        return cls(path, header, data)
+
+    # -- filling --------------------------------------------------------------
+
+    def write_rows(self, i0: int, i1: int, kind: str, features: dict, params: dict) -> None:
+        """Compute and store rows i0:i1 (upper triangle only for condensed stores)."""
+        if self.layout == "full":
+            block = distance_block(kind, features, params, i0, i1, 0, self.n)
+            block[np.arange(i1 - i0), np.arange(i0, i1)] = 0.0
+            self.data[i0:i1] = block
+            return
+        block = distance_block(kind, features, params, i0, i1, i0, self.n)
+        for r, i in enumerate(range(i0, i1)):
+            if i == self.n - 1:
+                break
+            start = condensed_index(self.n, i, i + 1)
+            self.data[start:start + self.n - i - 1] = block[r, r + 1:]
+
+    @classmethod
+    def compute(cls, path: Path, names: list[str], kind: str, features: dict,
+                strategy: str | None = None, params: dict | None = None,
+                layout: str = "condensed", workers: int = 1,
+                max_tile_cells: int = 4_000_000) -> "DistanceStore":
+        """
+        Build a store for `names` from per-recipe `features`, in row tiles of
+        at most `max_tile_cells` cells. With workers > 1, tiles are filled by
+        worker processes writing straight into the mapped file; the features
+        are published once in shared memory rather than pickled to each worker.
+        """
+        params = params or {}
+        store = cls.create(path, names, strategy or kind, params, layout, fingerprint(features))
+        n = len(names)
+        tile = max(1, max_tile_cells // max(n, 1))
+        tiles = [(i0, min(i0 + tile, n)) for i0 in range(0, n, tile)]
+
+        if workers > 1 and len(tiles) > 1:
+            store.data.flush()
+            with SharedArrays(features) as shared, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(str(path), kind, shared.descriptor, params),
+            ) as pool:
+                for job in [pool.submit(_fill_tile, i0, i1) for i0, i1 in tiles]:
+                    job.result()
+        else:
+            for i0, i1 in tiles:
+                store.write_rows(i0, i1, kind, features, params)
+        store.data.flush()
+        return store
+
+    # -- reading --------------------------------------------------------------
+
+    def row(self, i: int | str) -> np.ndarray:
+        """Distances from recipe i (index or name) to every recipe, as float32."""
+        i = self.index[i] if isinstance(i, str) else i
+        if self.layout == "full":
+            return np.array(self.data[i])
+        out = np.zeros(self.n, dtype=np.float32)
+        others = np.delete(np.arange(self.n), i)
+        out[others] = self.data[condensed_index(self.n, i, others)]
+        return out
+
+    def rows(self, i0: int, i1: int) -> np.ndarray:
+        if self.layout == "full":
+            return np.array(self.data[i0:i1])
+        return np.stack([self.row(i) for i in range(i0, i1)])
+
+    def distance(self, a: int | str, b: int | str) -> float:
+        a = self.index[a] if isinstance(a, str) else a
+        b = self.index[b] if isinstance(b, str) else b
+        if a == b:
+            return 0.0
+        if self.layout == "full":
+            return float(self.data[a, b])
+        return float(self.data[condensed_index(self.n, a, np.array(b))])
+
+    def nearest(self, i: int | str, k: int = 5) -> list[tuple[str, float]]:
+        """Top-k neighbours of one recipe, reading only its row."""
+        i = self.index[i] if isinstance(i, str) else i
+        r = self.row(i)
+        r[i] = np.inf
+        k = min(k, self.n - 1)
+        top = np.argpartition(r, k - 1)[:k] if k < self.n - 1 else np.arange(self.n)
+        top = top[np.argsort(r[top], kind="stable")]
+        return [(self.names[j], float(r[j])) for j in top if j != i][:k]
+
+    def condensed(self) -> np.ndarray:
+        """Condensed upper-triangle view (a copy for full stores)."""
+        if self.layout == "condensed":
+            return self.data
+        iu = np.triu_indices(self.n, k=1)
+        return np.asarray(self.data[iu])
+
+
+def open_or_compute(kind: str, names: list[str], features: dict, params: dict | None = None,
+                    strategy: str | None = None, layout: str = "condensed",
+                    workers: int = 1, cache_dir: Path = CACHE) -> DistanceStore:
+    """
+    Cached store for (strategy, params, layout): reopened if its recipe order
+    and feature fingerprint still match, otherwise recomputed.
+    """
+    params = params or {}
+    strategy = strategy or kind
+    tag = "_".join(f"{k}{v}" for k, v in sorted(params.items()))
+    path = Path(cache_dir) / f"{strategy}{'_' + tag if tag else ''}.{layout}.dist"
+    if path.exists():
+        store = DistanceStore.open(path)
+        if (store.names == list(names) and store.header["params"] == params
+                and store.header["source_hash"] == fingerprint(features)):
+            return store
+        del store
+        os.remove(path)
+    return DistanceStore.compute(path, names, kind, features, strategy, params, layout, workers)
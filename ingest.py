@@ -0,0 +1,305 @@
+"""
+ingest.py
+=========
+Stream recipes from files too large to json.load — JSON Lines, or one big
+JSON object / array read a chunk at a time — validate each against a
+Dataset's ingredients and the known roles, and hand them on as
+compile_recipes arrays in batches of at most `batch_size` recipes.
+
+    stream = RecipeStream("scraped/recipes.jsonl", batch_size=4096)
+    for batch in stream:
+        vectors = strategy_vectors(batch, flavor, "blend")
+    print(stream.report())
+
+Peak memory is one batch plus the read buffer; the only per-recipe state
+kept for the whole corpus is the set of names seen (to reject duplicates)
+and the first `max_rejects` reject records.
+
+  iter_records    — (position, name, recipe) from a JSONL or JSON file
+  validate_recipe — list of problems with one recipe (empty = valid)
+  RecipeStream    — validated batches of compiled arrays + reject report
+  stream_vectors  — (names, strategy vectors) per batch
+
+JSON Lines records are either {"name": ..., "method": ..., ...} or a
+single-key {name: recipe} object. JSON files hold the recipes.json shape
+({name: recipe, ...}) or an array of named records.
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from loaders import Dataset, resolve
+from vectorize import compile_recipes, flavor_matrix, strategy_vectors
+
+ROLES = ("base", "modifier", "sweetener", "citrus", "accent", "seasoning")
+METHODS = ("stirred", "shaken", "built")
+SERVED = ("up", "on_ice", "either")
+CHUNK_SIZE = 1 << 20
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _named(record, position: int) -> tuple[str, dict]:
+    """(name, recipe) from a {"name": ...} record or a single-key {name: recipe}."""
+    if not isinstance(record, dict):
+        raise ValueError(f"record {position} is not an object")
+    if "name" in record:
+        recipe = dict(record)
+        return str(recipe.pop("name")), recipe
+    if len(record) == 1:
+        (name, recipe), = record.items()
+        return name, recipe
+    raise ValueError(f"record {position} has no name")
+
+
+def _iter_jsonl(path: Path) -> Iterator[tuple[int, str | None, dict | None, str | None]]:
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                name, recipe = _named(json.loads(line), line_no)
+            except ValueError as e:
+                yield line_no, None, None, str(e)
+                continue
+            yield line_no, name, recipe, None
+
+
+def _iter_json(path: Path, chunk_size: int) -> Iterator[tuple[int, str | None, dict | None, str | None]]:
+    """
+    Incremental parse of a top-level object or array: only the current
+    record and the unread part of the current chunk are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buf, pos, eof = "", 0, False
+
+        def more() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            return not eof
+
+        def skip_ws() -> str:
+            """Next non-whitespace character ('' at end of file)."""
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or not more():
+                    return buf[pos:pos + 1]
+
+        def value():
+            nonlocal pos
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    # A value ending exactly at the buffer edge may be a truncated number
+                    if end < len(buf) or eof:
+                        pos = end
+                        return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"{path}: malformed JSON near offset {f.tell() - len(buf) + pos}")
+                more()
+
+        opener = skip_ws()
+        if opener not in ("{", "["):
+            raise ValueError(f"{path}: expected a JSON object or array")
+        closer = "}" if opener == "{" else "]"
+        pos += 1
+        position = 0
+        while True:
+            c = skip_ws()
+            if c == closer:
+                return
+            if position:
+                if c != ",":
+                    raise ValueError(f"{path}: expected ',' after record {position}")
+                pos += 1
+                skip_ws()
+            position += 1
+            if opener == "{":
+                name = value()
+                if skip_ws() != ":":
+                    raise ValueError(f"{path}: expected ':' after key {name!r}")
+                pos += 1
+                skip_ws()
+                yield position, name, value(), None
+            else:
+                record = value()
+                try:
+                    name, recipe = _named(record, position)
+                except ValueError as e:
+                    yield position, None, None, str(e)
+                    continue
+                yield position, name, recipe, None
+
+
+def iter_records(path: Path, fmt: str | None = None,
+                 chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[int, str | None, dict | None, str | None]]:
+    """
+    (position, name, recipe, error) for every record in `path`; position is
+    the line number (JSONL) or record number (JSON). Records that cannot be
+    read as a named recipe come back with name/recipe None and an error.
+    fmt is "jsonl" or "json"; by default it follows the file suffix.
+    """
+    path = Path(path)
+    fmt = fmt or ("jsonl" if path.suffix in (".jsonl", ".ndjson") else "json")
+    if fmt == "jsonl":
+        return _iter_jsonl(path)
+    if fmt == "json":
+        return _iter_json(path, chunk_size)
+    raise ValueError(f"Unknown format {fmt!r}; expected 'jsonl' or 'json'")
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def validate_recipe(recipe: dict, dataset: Dataset | None = None,
+                    allow_unknown: bool = False) -> list[str]:
+    """
+    Problems that would stop `recipe` from compiling faithfully. With
+    allow_unknown, ingredients missing from the table are accepted (they
+    compile to the all-zero flavor row, as get_flavor_vector treats them).
+    """
+    ingredients = resolve(dataset).ingredients
+    if not isinstance(recipe, dict):
+        return ["recipe is not an object"]
+    problems = []
+    if recipe.get("method") not in METHODS:
+        problems.append(f"unknown method {recipe.get('method')!r}")
+    if recipe.get("served") not in SERVED:
+        problems.append(f"unknown served {recipe.get('served')!r}")
+
+    components = recipe.get("components")
+    if not isinstance(components, list) or not components:
+        return problems + ["no components"]
+    for n, c in enumerate(components):
+        if not isinstance(c, dict):
+            problems.append(f"component {n} is not an object")
+            continue
+        if not isinstance(c.get("ingredient"), str) or (
+                not allow_unknown and c["ingredient"] not in ingredients):
+            problems.append(f"unknown ingredient {c.get('ingredient')!r}")
+        if c.get("role") not in ROLES:
+            problems.append(f"unknown role {c.get('role')!r}")
+        ml = c.get("ml")
+        if ml is not None and (isinstance(ml, bool) or not isinstance(ml, (int, float)) or ml <= 0):
+            problems.append(f"bad ml {ml!r} for {c.get('ingredient')!r}")
+
+    garnish = recipe.get("garnish", [])
+    if not isinstance(garnish, list):
+        problems.append("garnish is not a list")
+    else:
+        problems += [f"unknown garnish {g!r}" for g in garnish
+                     if not isinstance(g, str) or (not allow_unknown and g not in ingredients)]
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Batches
+# ---------------------------------------------------------------------------
+
+class RecipeStream:
+    """
+    Iterate validated recipes from `source` as compile_recipes dicts of at
+    most `batch_size` recipes, all over the dataset's ingredient table order
+    (so every batch has the same columns and one flavor matrix serves them
+    all). Each batch also carries "method" and "served" codes (indices into
+    METHODS / SERVED) and "positions" in the source file.
+
+    allow_unknown passes recipes with ingredients missing from the table
+    (see validate_recipe). Rejected records are counted in `rejected`; the first `max_rejects` are
+    kept in `rejects` as {"position", "name", "problems"}.
+    """
+
+    def __init__(self, source: Path, batch_size: int = 4096, fmt: str | None = None,
+                 dataset: Dataset | None = None, chunk_size: int = CHUNK_SIZE,
+                 max_rejects: int = 1000, allow_unknown: bool = False):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.source = Path(source)
+        self.batch_size = batch_size
+        self.fmt = fmt
+        self.dataset = resolve(dataset)
+        self.chunk_size = chunk_size
+        self.max_rejects = max_rejects
+        self.allow_unknown = allow_unknown
+        self.ingredient_names = list(self.dataset.ingredients)
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects: list[dict] = []
+
+    def _reject(self, position: int, name: str | None, problems: list[str]) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({"position": position, "name": name, "problems": problems})
+
+    def records(self) -> Iterator[tuple[int, str, dict]]:
+        """(position, name, recipe) for every valid, first-seen recipe."""
+        seen = set()
+        for position, name, recipe, error in iter_records(self.source, self.fmt, self.chunk_size):
+            if error:
+                self._reject(position, name, [error])
+                continue
+            problems = validate_recipe(recipe, self.dataset, self.allow_unknown)
+            if name in seen:
+                problems.append("duplicate name")
+            if problems:
+                self._reject(position, name, problems)
+                continue
+            seen.add(name)
+            self.accepted += 1
+            yield position, name, recipe
+
+    def _compile(self, batch: dict, positions: list[int]) -> dict:
+        ds = self.dataset
+        view = Dataset(ds.category_tree, ds.ingredients, batch, ds.flavor_dims,
+                       precision=ds.precision)
+        compiled = compile_recipes(list(batch), self.ingredient_names, dataset=view)
+        compiled["method"] = np.array([METHODS.index(r["method"]) for r in batch.values()], dtype=np.int8)
+        compiled["served"] = np.array([SERVED.index(r["served"]) for r in batch.values()], dtype=np.int8)
+        compiled["positions"] = np.array(positions, dtype=np.int64)
+        return compiled
+
+    def __iter__(self) -> Iterator[dict]:
+        batch, positions = {}, []
+        for position, name, recipe in self.records():
+            batch[name] = recipe
+            positions.append(position)
+            if len(batch) == self.batch_size:
+                yield self._compile(batch, positions)
+                batch, positions = {}, []
+        if batch:
+            yield self._compile(batch, positions)
+
+    def report(self) -> dict:
+        return {"source": str(self.source), "accepted": self.accepted,
+                "rejected": self.rejected, "rejects": self.rejects}
+
+
+def stream_vectors(stream: RecipeStream, strategy: str = "blend",
+                   **strategy_kw) -> Iterator[tuple[list[str], np.ndarray]]:
+    """(recipe names, strategy vectors) for each batch of `stream`."""
+    flavor = flavor_matrix(stream.ingredient_names, dataset=stream.dataset)
+    for batch in stream:
+        yield batch["recipes"], strategy_vectors(batch, flavor, strategy, **strategy_kw)
+
+
+if __name__ == "__main__":
+    source = Path(__file__).parent / "data" / "recipes.json"
+    stream = RecipeStream(source, batch_size=32, chunk_size=4096, allow_unknown=True)
+    for names, vectors in stream_vectors(stream, "perceptual"):
+        print(f"  batch of {len(names):3d}: {names[0]} … {names[-1]}  {vectors.shape}")
+    report = stream.report()
+    print(f"{report['accepted']} accepted, {report['rejected']} rejected")
+    for reject in report["rejects"][:10]:
+        print(f"  #{reject['position']} {reject['name']}: {'; '.join(reject['problems'])}")
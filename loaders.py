@@ -7,26 +7,39 @@ Load cocktail data from the data/ directory into Python dicts.
   INGREDIENTS    — dict keyed by name, value has category_path, abv, flavor
   RECIPES        — dict keyed by name from recipes.json
   FLAVOR_DIMS    — ordered list of flavor dimension names (from CSV header)
+
+  Dataset        — one catalog (any directory or in-memory dicts) with its
+                   own compiled arrays and caches; DEFAULT wraps the
+                   singletons above, and every utils / vectorize / strategy
+                   function takes an optional `dataset` (None = DEFAULT)
+  load_catalog   — all four from data/ or, when COCKTAIL_DB is set, from
+                   a store.py SQLite database
+  PRECISIONS     — float dtypes a Dataset can compute in (COCKTAIL_PRECISION
+                   sets the default; scripts/check_precision.py checks float32)
+  reload         — re-read the data files into the singletons above, in place
+  write_json     — atomically replace a JSON output file
 """
 
 import csv
 import json
+import os
 from pathlib import Path
 
 _DATA = Path(__file__).parent / "data"
+PRECISIONS = ("float64", "float32")
 
 
-def load_taxonomy() -> dict:
-    with open(_DATA / "taxonomy.json") as f:
+def load_taxonomy(data_dir: Path = _DATA) -> dict:
+    with open(Path(data_dir) / "taxonomy.json") as f:
         return json.load(f)
 
 
-def load_recipes() -> dict:
-    with open(_DATA / "recipes.json") as f:
+def load_recipes(data_dir: Path = _DATA) -> dict:
+    with open(Path(data_dir) / "recipes.json") as f:
         return json.load(f)
 
 
-def load_ingredients() -> tuple[list[str], dict]:
+def load_ingredients(data_dir: Path = _DATA) -> tuple[list[str], dict]:
     """
     Returns (flavor_dims, ingredients) where:
       flavor_dims  — ordered list of dimension names, e.g. ["sweet", "bitter", ...]
@@ -35,7 +48,7 @@ def load_ingredients() -> tuple[list[str], dict]:
     flavor_dims = None
     ingredients = {}
 
-    with open(_DATA / "ingredients.csv", newline="") as f:
+    with open(Path(data_dir) / "ingredients.csv", newline="") as f:
         reader = csv.DictReader(f)
         # Derive flavor dims from header: everything after name, category_path, abv
         fixed_cols = {"name", "category_path", "abv"}
@@ -52,7 +65,145 @@ def load_ingredients() -> tuple[list[str], dict]:
     return flavor_dims, ingredients
 
 
+def load_catalog(data_dir: Path = _DATA,
+                 database: Path | None = None) -> tuple[dict, list[str], dict, dict]:
+    """
+    (taxonomy, flavor_dims, ingredients, recipes) from `database` — default
+    the COCKTAIL_DB environment variable — or else the files in `data_dir`.
+    A database that does not exist raises FileNotFoundError; only
+    store.CatalogStore.import_files creates one.
+    """
+    database = database or os.environ.get("COCKTAIL_DB")
+    if database:
+        from store import CatalogStore
+        with CatalogStore(database, create=False) as db, db.snapshot():
+            return db.taxonomy(), db.flavor_dims(), db.ingredients(), db.recipes()
+    flavor_dims, ingredients = load_ingredients(data_dir)
+    return load_taxonomy(data_dir), flavor_dims, ingredients, load_recipes(data_dir)
+
+
+# ---------------------------------------------------------------------------
+# Datasets
+# ---------------------------------------------------------------------------
+
+class Dataset:
+    """
+    One cocktail catalog: the parsed taxonomy, ingredients, recipes and
+    flavor dims, plus lazily built arrays shared by everything that uses it
+    (compiled recipe arrays, the ingredient flavor matrix, strategy vectors).
+
+        venue = Dataset.from_dir("venues/harbour/data")
+        utils.recipe_distance("negroni", "boulevardier", dataset=venue)
+        venue.strategy_vectors("perceptual")
+
+    Several datasets can live in one process. The caches assume the dicts
+    are not edited in place; call clear_cache() after doing so.
+
+    `precision` ("float64" or "float32", default COCKTAIL_PRECISION or
+    float64) is the dtype of every float array built from the dataset —
+    flavor matrices, compiled recipes, strategy vectors, distance features —
+    and the batched distance and kNN code keeps that dtype throughout.
+    """
+
+    def __init__(self, category_tree: dict, ingredients: dict, recipes: dict,
+                 flavor_dims: list[str], path: Path | None = None,
+                 precision: str | None = None):
+        self.category_tree = category_tree
+        self.ingredients = ingredients
+        self.recipes = recipes
+        self.flavor_dims = flavor_dims
+        self.path = Path(path) if path is not None else None
+        self.precision = precision or os.environ.get("COCKTAIL_PRECISION") or "float64"
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {self.precision!r}; expected one of {PRECISIONS}")
+        self._cache: dict = {}
+
+    @classmethod
+    def from_dir(cls, data_dir: Path) -> "Dataset":
+        """Load taxonomy.json, ingredients.csv and recipes.json from `data_dir`."""
+        flavor_dims, ingredients = load_ingredients(data_dir)
+        return cls(load_taxonomy(data_dir), ingredients, load_recipes(data_dir), flavor_dims,
+                   path=data_dir)
+
+    @classmethod
+    def from_sqlite(cls, database: Path) -> "Dataset":
+        """Load one snapshot of a store.CatalogStore database."""
+        from store import CatalogStore
+        with CatalogStore(database, create=False) as db:
+            return db.dataset()
+
+    def __repr__(self) -> str:
+        where = self.path if self.path is not None else "in memory"
+        return (f"Dataset({where}: {len(self.recipes)} recipes, {len(self.ingredients)} ingredients"
+                f", {self.precision})")
+
+    def with_precision(self, precision: str) -> "Dataset":
+        """The same catalog dicts computing in `precision`, with caches of its own."""
+        if precision == self.precision:
+            return self
+        return Dataset(self.category_tree, self.ingredients, self.recipes, self.flavor_dims,
+                       path=self.path, precision=precision)
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    def cached(self, key, build):
+        """self._cache[key], computing it with build() on first use."""
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def compiled(self) -> dict:
+        """vectorize.compile_recipes for every recipe over the ingredient table."""
+        from vectorize import compile_recipes
+        return self.cached("compiled", lambda: compile_recipes(dataset=self))
+
+    def flavor_matrix(self):
+        """(ingredients, dims) flavor matrix in ingredient-table order."""
+        from vectorize import flavor_matrix
+        return self.cached("flavor_matrix", lambda: flavor_matrix(dataset=self))
+
+    def strategy_vectors(self, strategy: str, **strategy_kw):
+        """vectorize.strategy_vectors of every recipe (rows in recipe order), cached."""
+        from vectorize import strategy_vectors
+        key = ("strategy", strategy, tuple(sorted(strategy_kw.items())))
+        return self.cached(key, lambda: strategy_vectors(self.compiled(), self.flavor_matrix(),
+                                                         strategy, **strategy_kw))
+
+
 # Module-level singletons — loaded once on first import
-CATEGORY_TREE = load_taxonomy()
-FLAVOR_DIMS, INGREDIENTS = load_ingredients()
-RECIPES = load_recipes()
+CATEGORY_TREE, FLAVOR_DIMS, INGREDIENTS, RECIPES = load_catalog()
+
+# The default dataset shares the singletons' objects, so reload() updates both
+DEFAULT = Dataset(CATEGORY_TREE, INGREDIENTS, RECIPES, FLAVOR_DIMS,
+                  path=os.environ.get("COCKTAIL_DB") or _DATA)
+
+
+def resolve(dataset: Dataset | None) -> Dataset:
+    """`dataset`, or DEFAULT when None."""
+    return DEFAULT if dataset is None else dataset
+
+
+def reload() -> None:
+    """
+    Re-read every data file (or the COCKTAIL_DB database) into the existing
+    singletons. They are updated in place, so modules that did
+    `from loaders import RECIPES` see the new data without being re-imported
+    (used by long-running processes such as scripts/watch_embeddings.py).
+    """
+    taxonomy, flavor_dims, ingredients, recipes = load_catalog()
+    for current, fresh in ((CATEGORY_TREE, taxonomy), (INGREDIENTS, ingredients),
+                           (RECIPES, recipes)):
+        current.clear()
+        current.update(fresh)
+    FLAVOR_DIMS[:] = flavor_dims
+    DEFAULT.clear_cache()
+
+
+def write_json(path: Path, data) -> None:
+    """Write `data` to a temporary file beside `path`, then rename it into place."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
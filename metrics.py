@@ -0,0 +1,148 @@
+"""
+metrics.py
+==========
+How faithfully a 2D layout keeps the high-dimensional neighbour structure,
+and how much a sweep's layout moves between frames.
+
+  layout_quality      — trustworthiness, continuity and kNN recall of a
+                        layout against its strategy matrix
+  frame_steps         — per-point displacement between adjacent sweep
+                        frames, after removing rotation
+  frame_displacement  — summary of frame_steps (mean / max step, top movers)
+
+Trustworthiness penalises layout neighbours that are far apart in the
+strategy space (false neighbours); continuity penalises strategy-space
+neighbours the layout tears apart. Both are 1 for a perfect layout
+(Venna & Kaski 2001). Ranks are counted one row block at a time — only the
+ranks of the other space's k neighbours are needed, so no full n×n rank
+matrix is ever built.
+"""
+
+import numpy as np
+
+METRICS = ("cosine", "euclidean")
+
+
+# ---------------------------------------------------------------------------
+# Neighbour preservation
+# ---------------------------------------------------------------------------
+
+def _distances(x: np.ndarray, rows: slice, metric: str) -> np.ndarray:
+    """Distances from x[rows] to every row of x, self set to +inf, (b, n)."""
+    if metric == "cosine":
+        d = np.maximum(1.0 - x[rows] @ x.T, 0.0)
+        # Zero vectors have no direction: distance 1 to everything
+        empty = ~x.any(axis=1)
+        d[empty[rows]] = 1.0
+        d[:, empty] = 1.0
+    else:
+        sq = (x ** 2).sum(axis=1)
+        d = np.sqrt(np.maximum(sq[rows, None] + sq[None, :] - 2.0 * x[rows] @ x.T, 0.0))
+    local = np.arange(d.shape[0])
+    d[local, local + rows.start] = np.inf
+    return d
+
+
+def _prepare(x: np.ndarray, metric: str) -> np.ndarray:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+    x = np.asarray(x, dtype=np.float64)
+    if metric == "cosine":
+        norms = np.linalg.norm(x, axis=1, keepdims=True)
+        x = np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+    return x
+
+
+def _rank_penalty(d: np.ndarray, members: np.ndarray, exclude: np.ndarray, k: int) -> np.ndarray:
+    """
+    Σ (rank - k) in distance rows `d` (b, n) over each row's `members` (b, k)
+    that are not among its `exclude` (b, k); rank 1 is the nearest point.
+    """
+    target = np.take_along_axis(d, members, axis=1)
+    ranks = 1 + (d[:, None, :] < target[:, :, None]).sum(axis=2)
+    outside = ~(members[:, :, None] == exclude[:, None, :]).any(axis=2)
+    return (np.maximum(ranks - k, 0) * outside).sum(axis=1)
+
+
+def layout_quality(high: np.ndarray, low: np.ndarray, k: int = 10, high_metric: str = "cosine",
+                   low_metric: str = "euclidean", max_block_cells: int = 4_000_000) -> dict:
+    """
+    {"k", "trustworthiness", "continuity", "knn_recall"} of layout `low`
+    (n, 2) against strategy matrix `high` (n, d). k is clamped below n/2,
+    where the trustworthiness normalisation is defined.
+    """
+    high, low = _prepare(high, high_metric), _prepare(low, low_metric)
+    n = len(high)
+    if len(low) != n:
+        raise ValueError(f"Layout has {len(low)} points for {n} rows")
+    k = min(k, (n - 1) // 2)
+    if k < 1:
+        raise ValueError("layout_quality needs at least three points")
+
+    # Each row costs ~k·n comparison cells for the ranks
+    block = max(1, max_block_cells // (k * n))
+    trust = cont = shared = 0.0
+    for i0 in range(0, n, block):
+        rows = slice(i0, min(i0 + block, n))
+        dh, dl = _distances(high, rows, high_metric), _distances(low, rows, low_metric)
+        nh = np.argpartition(dh, k - 1, axis=1)[:, :k]
+        nl = np.argpartition(dl, k - 1, axis=1)[:, :k]
+        trust += _rank_penalty(dh, nl, nh, k).sum()
+        cont += _rank_penalty(dl, nh, nl, k).sum()
+        shared += (nh[:, :, None] == nl[:, None, :]).any(axis=2).sum()
+
+    norm = 2.0 / (n * k * (2 * n - 3 * k - 1))
+    return {
+        "k": k,
+        "trustworthiness": round(float(1.0 - norm * trust), 4),
+        "continuity": round(float(1.0 - norm * cont), 4),
+        "knn_recall": round(float(shared / (n * k)), 4),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Sweep displacement
+# ---------------------------------------------------------------------------
+
+def frame_steps(layouts: list[np.ndarray] | np.ndarray) -> np.ndarray:
+    """
+    Displacement of every point between adjacent frames (F-1, n), after
+    rotating each frame onto the previous one (orthogonal Procrustes, all
+    pairs in one batched SVD), relative to the previous frame's RMS radius.
+    """
+    frames = np.asarray(layouts, dtype=np.float64)
+    if len(frames) < 2:
+        return np.zeros((0, frames.shape[1] if frames.ndim == 3 else 0))
+    prev = frames[:-1] - frames[:-1].mean(axis=1, keepdims=True)
+    cur = frames[1:] - frames[1:].mean(axis=1, keepdims=True)
+    u, _, vt = np.linalg.svd(np.einsum("fni,fnj->fij", prev, cur))
+    # Proper rotations only (det = +1), as procrustes_align
+    flip = np.ones(u.shape[:2])
+    flip[:, -1] = np.sign(np.linalg.det(u @ vt))
+    rotation = (u * flip[:, None, :]) @ vt
+    aligned = cur @ rotation.transpose(0, 2, 1)
+    scale = np.sqrt((prev ** 2).sum(axis=2).mean(axis=1, keepdims=True))
+    return np.linalg.norm(aligned - prev, axis=2) / scale
+
+
+def frame_displacement(layouts: list[np.ndarray] | np.ndarray, names: list[str] | None = None,
+                       top: int = 10) -> dict:
+    """
+    {"mean_step", "max_step", "steps", "movers"}: per step the RMS of
+    frame_steps (0 = frozen, ~1.4 = unrelated layouts), and the `top` points
+    with the largest single-step jump as [name, step index, displacement].
+    """
+    steps = frame_steps(layouts)
+    if steps.size == 0:
+        return {"mean_step": 0.0, "max_step": 0.0, "steps": [], "movers": []}
+    rms = np.sqrt((steps ** 2).mean(axis=1))
+    names = names if names is not None else [str(i) for i in range(steps.shape[1])]
+    worst_step = steps.argmax(axis=0)
+    worst = steps.max(axis=0)
+    order = np.argsort(-worst, kind="stable")[:top]
+    return {
+        "mean_step": round(float(rms.mean()), 4),
+        "max_step": round(float(rms.max()), 4),
+        "steps": [round(float(x), 4) for x in rms],
+        "movers": [[names[i], int(worst_step[i]), round(float(worst[i]), 4)] for i in order],
+    }
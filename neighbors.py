@@ -0,0 +1,281 @@
+"""
+neighbors.py
+============
+Vectorized k-nearest-neighbour graphs over recipe feature matrices.
+
+  knn             — exact kNN (cosine or euclidean), computed in row blocks so
+                    memory stays bounded for large recipe sets.
+  refine_knn      — kNN seeded from a previous graph (e.g. the neighbouring τ
+                    frame) and improved by local joins instead of a full scan.
+  umap_knn        — kNN in the (indices, distances) form umap.UMAP accepts as
+                    precomputed_knn, cached on disk by matrix hash.
+  knn_change      — how much a kNN graph changed between two parameter values
+                    (1 - mean per-recipe Jaccard overlap of neighbour sets).
+  adaptive_grid   — choose parameter values for an animated sweep (α, τ) so
+                    that frames are dense where the neighbour structure moves
+                    and sparse where it is flat, under a fixed frame budget.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+CACHE = Path(__file__).parent / "data" / "cache" / "knn"
+
+METRICS = ("cosine", "euclidean")
+
+
+# ---------------------------------------------------------------------------
+# kNN
+# ---------------------------------------------------------------------------
+
+def _float(vectors: np.ndarray) -> np.ndarray:
+    """float32 input stays float32 (Dataset precision "float32"); anything else is float64."""
+    vectors = np.asarray(vectors)
+    return vectors if vectors.dtype == np.float32 else vectors.astype(np.float64)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = _float(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _prepare(vectors: np.ndarray, k: int, metric: str) -> tuple[np.ndarray, int]:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+    vectors = _float(vectors)
+    k = min(k, len(vectors) - 1)
+    if k < 1:
+        raise ValueError("knn needs at least two rows")
+    return vectors, k
+
+
+def knn(vectors: np.ndarray, k: int = 10, metric: str = "cosine",
+        max_block_cells: int = 4_000_000) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact k nearest neighbours of every row (excluding itself).
+
+    Returns (indices, distances), both (n, k), sorted by distance. Distances
+    are computed one row block at a time, so at most `max_block_cells` of
+    the n×n matrix exist at once; float32 vectors are searched in float32.
+    """
+    vectors, k = _prepare(vectors, k, metric)
+    n = len(vectors)
+    if metric == "cosine":
+        unit = _unit_rows(vectors)
+        empty = ~unit.any(axis=1)
+    else:
+        sq = (vectors ** 2).sum(axis=1)
+
+    indices = np.empty((n, k), dtype=np.int64)
+    distances = np.empty((n, k), dtype=vectors.dtype)
+    block = max(1, max_block_cells // n)
+    for i0 in range(0, n, block):
+        i1 = min(i0 + block, n)
+        if metric == "cosine":
+            d = np.maximum(1.0 - unit[i0:i1] @ unit.T, 0.0)
+            # Zero vectors have no direction: distance 1 to everything
+            d[empty[i0:i1]] = 1.0
+            d[:, empty] = 1.0
+        else:
+            d = np.sqrt(np.maximum(sq[i0:i1, None] + sq[None, :] - 2.0 * vectors[i0:i1] @ vectors.T, 0.0))
+        rows = np.arange(i1 - i0)
+        d[rows, np.arange(i0, i1)] = np.inf
+        top = np.argpartition(d, k - 1, axis=1)[:, :k]
+        order = np.argsort(d[rows[:, None], top], axis=1, kind="stable")
+        indices[i0:i1] = np.take_along_axis(top, order, axis=1)
+        distances[i0:i1] = d[rows[:, None], indices[i0:i1]]
+    return indices, distances
+
+
+def _pair_distances(vectors: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                    metric: str) -> np.ndarray:
+    """Distances from each row index to each of its own candidate columns, (m, c)."""
+    a = vectors[rows][:, None, :]
+    b = vectors[cols]
+    if metric == "euclidean":
+        return np.sqrt(((a - b) ** 2).sum(axis=2))
+    d = np.maximum(1.0 - (a * b).sum(axis=2), 0.0)
+    # Zero vectors have no direction: distance 1 to everything
+    empty = ~vectors.any(axis=1)
+    return np.where(empty[rows][:, None] | empty[cols], 1.0, d)
+
+
+def refine_knn(vectors: np.ndarray, seed: np.ndarray, k: int = 10, metric: str = "cosine",
+               max_rounds: int = 4, max_block_cells: int = 4_000_000) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Approximate kNN of `vectors` starting from `seed`, an (n, ≥k) neighbour
+    index array for a similar matrix (typically the previous sweep frame).
+
+    Each round, every row's candidates are its current neighbours plus their
+    neighbours ("neighbours of neighbours are likely neighbours"); only those
+    distances are computed and the best k kept. Rounds stop once no row
+    changes. When frames differ only slightly this recovers the exact graph
+    in one or two rounds at O(n·k²) cost instead of O(n²).
+    """
+    vectors, k = _prepare(vectors, k, metric)
+    n = len(vectors)
+    if seed.shape[0] != n or seed.shape[1] < k:
+        raise ValueError(f"Seed graph {seed.shape} does not cover {n} rows × {k} neighbours")
+    if metric == "cosine":
+        vectors = _unit_rows(vectors)
+
+    indices = np.asarray(seed[:, :k], dtype=np.int64)
+    distances = np.empty((n, k), dtype=vectors.dtype)
+    for _ in range(max_rounds):
+        changed = False
+        width = k + k * k
+        block = max(1, max_block_cells // (width * vectors.shape[1]))
+        for i0 in range(0, n, block):
+            i1 = min(i0 + block, n)
+            rows = np.arange(i0, i1)
+            current = indices[i0:i1]
+            candidates = np.concatenate([current, indices[current].reshape(len(rows), -1)], axis=1)
+            d = _pair_distances(vectors, rows, candidates, metric)
+            # Drop self-matches and repeated candidates before picking the best k
+            candidates = np.where(candidates == rows[:, None], -1, candidates)
+            order = np.argsort(candidates, axis=1, kind="stable")
+            sorted_c = np.take_along_axis(candidates, order, axis=1)
+            repeat = np.zeros_like(sorted_c, dtype=bool)
+            repeat[:, 1:] = sorted_c[:, 1:] == sorted_c[:, :-1]
+            invalid = np.empty_like(repeat)
+            np.put_along_axis(invalid, order, repeat | (sorted_c < 0), axis=1)
+            d[invalid] = np.inf
+
+            top = np.argpartition(d, k - 1, axis=1)[:, :k]
+            top = np.take_along_axis(top, np.argsort(np.take_along_axis(d, top, axis=1),
+                                                     axis=1, kind="stable"), axis=1)
+            best = np.take_along_axis(candidates, top, axis=1)
+            if not changed and not np.array_equal(np.sort(best, axis=1), np.sort(current, axis=1)):
+                changed = True
+            indices[i0:i1] = best
+            distances[i0:i1] = np.take_along_axis(d, top, axis=1)
+        if not changed:
+            break
+    return indices, distances
+
+
+def matrix_hash(vectors: np.ndarray) -> str:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float64)
+    h = hashlib.sha1(str(vectors.shape).encode())
+    h.update(vectors.tobytes())
+    return h.hexdigest()
+
+
+def umap_knn(vectors: np.ndarray, n_neighbors: int = 10, metric: str = "cosine",
+             seed: np.ndarray | None = None, exact_below: int = 20_000,
+             cache_dir: Path | None = CACHE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    kNN graph for umap.UMAP(precomputed_knn=...): each row starts with the
+    point itself at distance 0, followed by its n_neighbors - 1 nearest
+    neighbours, matching what UMAP's own search returns.
+
+    Graphs are cached in `cache_dir` under the hash of the matrix, so
+    rebuilding an unchanged strategy skips the search. With a `seed` graph
+    (UMAP format or plain) and at least `exact_below` rows, the search is a
+    refine_knn instead of a full scan; below that the blocked exact scan is
+    faster anyway.
+    """
+    k = min(n_neighbors, len(vectors)) - 1
+    seeded = seed is not None and len(vectors) >= exact_below
+    path = None
+    if cache_dir is not None:
+        stem = Path(cache_dir) / f"{matrix_hash(vectors)}_{metric}_k{k}"
+        # An exact graph is always acceptable; a seeded one only for seeded calls
+        for candidate in (stem.with_suffix(".npz"), stem.with_suffix(".seeded.npz"))[:1 + seeded]:
+            if candidate.exists():
+                cached = np.load(candidate)
+                return cached["indices"], cached["distances"]
+        path = stem.with_suffix(".seeded.npz" if seeded else ".npz")
+
+    if seeded:
+        seed = seed[:, 1:] if (seed[:, 0] == np.arange(len(seed))).all() else seed
+        indices, distances = refine_knn(vectors, seed, k=k, metric=metric)
+    else:
+        indices, distances = knn(vectors, k=k, metric=metric)
+    self_col = np.arange(len(vectors))[:, None]
+    indices = np.hstack([self_col, indices])
+    distances = np.hstack([np.zeros((len(vectors), 1)), distances]).astype(np.float32)
+
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, indices=indices, distances=distances)
+    return indices, distances
+
+
+def knn_change(a: np.ndarray, b: np.ndarray) -> float:
+    """1 - mean Jaccard overlap between two (n, k) neighbour index arrays."""
+    if a.shape != b.shape:
+        raise ValueError(f"Neighbour arrays differ in shape: {a.shape} vs {b.shape}")
+    n, k = a.shape
+    # Mark each row's neighbours of `a`, then count how many of `b`'s are marked
+    marked = np.zeros((n, n), dtype=bool) if n * n <= 50_000_000 else None
+    if marked is not None:
+        rows = np.repeat(np.arange(n), k)
+        marked[rows, a.ravel()] = True
+        shared = marked[rows, b.ravel()].reshape(n, k).sum(axis=1)
+    else:
+        shared = np.array([len(np.intersect1d(x, y, assume_unique=True)) for x, y in zip(a, b)])
+    return float(1.0 - (shared / (2 * k - shared)).mean())
+
+
+# ---------------------------------------------------------------------------
+# Adaptive parameter grids
+# ---------------------------------------------------------------------------
+
+def adaptive_grid(
+    vectors_at: Callable[[float], np.ndarray],
+    lo: float,
+    hi: float,
+    budget: int,
+    k: int = 10,
+    log: bool = False,
+    metric: str = "cosine",
+    resolution: int | None = None,
+    floor: float = 0.25,
+    decimals: int = 4,
+) -> tuple[list[float], list[float]]:
+    """
+    Parameter values in [lo, hi] for a `budget`-frame sweep.
+
+    The range is first scanned on a fine uniform grid of `resolution`
+    candidates (default 8 × budget; geometric when `log`), computing only the
+    feature matrix and its kNN graph at each one, which is far cheaper than a
+    UMAP fit. The kNN change between neighbouring candidates is the "change
+    mass" of that stretch; frames are then placed at equal steps of
+    cumulative mass, so they crowd into transitions and thin out where the
+    neighbour structure is flat. `floor` (a fraction of the mean change) is
+    added to every stretch so flat regions still get some frames.
+
+    Returns (values, changes): the sorted grid, always including lo and hi,
+    and the kNN change between each pair of adjacent values.
+    """
+    if budget < 2:
+        raise ValueError("budget must be at least 2")
+    if log and lo <= 0:
+        raise ValueError("log grids need lo > 0")
+    resolution = max(resolution or 8 * budget, budget)
+
+    axis = np.linspace(np.log10(lo), np.log10(hi), resolution) if log else np.linspace(lo, hi, resolution)
+    candidates = [round(float(10 ** x if log else x), decimals) for x in axis]
+    graphs = [knn(vectors_at(v), k=k, metric=metric)[0] for v in candidates]
+    steps = np.array([knn_change(a, b) for a, b in zip(graphs[:-1], graphs[1:])])
+
+    mass = steps + floor * max(steps.mean(), 1e-12)
+    cumulative = np.concatenate([[0.0], np.cumsum(mass)])
+    targets = np.linspace(0.0, cumulative[-1], budget)
+
+    # Nearest candidate to each target, kept strictly increasing (and leaving
+    # room for the frames still to come) so no candidate is used twice
+    chosen = []
+    for t, target in enumerate(targets):
+        lowest = chosen[-1] + 1 if chosen else 0
+        highest = resolution - (budget - t)
+        i = int(np.clip(np.abs(cumulative - target).argmin(), lowest, highest))
+        chosen.append(i)
+
+    changes = [round(knn_change(graphs[a], graphs[b]), 4) for a, b in zip(chosen[:-1], chosen[1:])]
+    return [candidates[i] for i in chosen], changes
@@ -0,0 +1,82 @@
+"""
+scripts/analyze_sensitivity.py
+===============================
+How much would the map change if the hand-assigned flavor profiles in
+ingredients.csv were a little different? (README: "Data Sensitivity".)
+
+Draws perturbed copies of the ingredient flavor matrix, recomputes every
+strategy's recipe vectors for all of them in one batched operation, and
+writes data/sensitivity.json:
+
+    {
+      "params": {"samples": 1000, "sigma": 0.1, "mode": "cell", "k": 5, ...},
+      "strategies": {
+        "blend": {
+          "stability": {"negroni": 0.81, ...},   # mean top-k Jaccard, 1 = never moves
+          "influence": {"campari": 0.12, ...}    # neighbour change from that ingredient alone
+        }, ...
+      }
+    }
+
+Run with:
+    .venv/bin/python scripts/analyze_sensitivity.py
+    .venv/bin/python scripts/analyze_sensitivity.py --mode ingredient --sigma 0.2 --samples 5000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loaders import write_json
+from sensitivity import PERTURBATIONS, sensitivity_report
+from vectorize import STRATEGIES, compile_recipes, flavor_matrix
+
+DATA = Path(__file__).parent.parent / "data"
+OUTPUT = DATA / "sensitivity.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES,
+                        default=["blend", "blend_struct", "role_slot", "perceptual"])
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--sigma", type=float, default=0.1, help="noise scale")
+    parser.add_argument("--mode", choices=PERTURBATIONS, default="cell")
+    parser.add_argument("--k", type=int, default=5, help="neighbour-set size")
+    parser.add_argument("--influence-samples", type=int, default=64,
+                        help="draws per ingredient for the influence ranking")
+    parser.add_argument("--alpha", type=float, default=0.5, help="α for blend_struct")
+    parser.add_argument("--tau", type=float, default=1.0, help="τ for the tau strategy")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    compiled = compile_recipes()
+    flavor = flavor_matrix(compiled["ingredients"])
+    print(f"{args.samples} × {args.mode} perturbations (σ={args.sigma}) of "
+          f"{flavor.shape[0]} ingredients, {len(compiled['recipes'])} recipes …")
+
+    start = time.perf_counter()
+    report = sensitivity_report(
+        compiled, flavor, args.strategies, n_samples=args.samples, sigma=args.sigma,
+        mode=args.mode, k=args.k, influence_samples=args.influence_samples, seed=args.seed,
+        alpha=args.alpha, tau=args.tau,
+    )
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+
+    write_json(OUTPUT, {"params": vars(args), "strategies": report})
+    print(f"Wrote {OUTPUT}")
+
+    for strategy, result in report.items():
+        fragile = sorted(result["stability"].items(), key=lambda x: x[1])[:5]
+        leveraged = list(result["influence"].items())[:5]
+        print(f"\n{strategy}")
+        print("  least stable:  " + ", ".join(f"{n} {v:.2f}" for n, v in fragile))
+        print("  most leverage: " + ", ".join(f"{n} {v:.3f}" for n, v in leveraged))
+
+
+if __name__ == "__main__":
+    main()
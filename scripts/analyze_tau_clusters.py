@@ -4,13 +4,20 @@ Find drinks that migrate between clusters as tau changes.
 """
 
 import json
+import sys
 import numpy as np
 from pathlib import Path
-from sklearn.cluster import KMeans
 from collections import defaultdict
 
+# Add project root to path so we can import clustering/loaders
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from clustering import track_clusters
+from loaders import write_json
+
 # Load data
 DATA_PATH = Path(__file__).parent.parent / "data"
+OUTPUT = DATA_PATH / "tau_clusters.json"
 with open(DATA_PATH / "embeddings.json", "r") as f:
     data = json.load(f)
 
@@ -31,15 +38,31 @@ def get_embedding_array(tau):
     coords = np.array([[points[n]["x"], points[n]["y"]] for n in names])
     return names, coords
 
-# Cluster at each tau value
+# Cluster at each tau value. Frames are seeded from their neighbour and
+# labels are matched across frames, so cluster ids are persistent along τ and
+# a changed id is a genuine migration rather than a relabelling.
 n_clusters = 8  # reasonable number for ~100 cocktails
-cluster_assignments = {}
-
-for tau in tau_values:
-    names, coords = get_embedding_array(tau)
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(coords)
-    cluster_assignments[tau] = {name: label for name, label in zip(names, labels)}
+frames = [get_embedding_array(tau) for tau in tau_values]
+names = frames[0][0]
+tracked = track_clusters([coords for _, coords in frames], n_clusters=n_clusters)
+
+cluster_assignments = {
+    tau: {name: int(label) for name, label in zip(names, tracked["labels"][t])}
+    for t, tau in enumerate(tau_values)
+}
+
+write_json(OUTPUT, {
+    "tau_values": tau_values,
+    "n_clusters": n_clusters,
+    "recipes": names,
+    "labels": tracked["labels"].tolist(),
+    "transitions": tracked["transitions"].tolist(),
+    "migrations": tracked["migrations"].tolist(),
+})
+
+print(f"Wrote persistent (τ × recipe) labels to {OUTPUT}")
+print("Migrations between adjacent τ frames: "
+      + ", ".join(str(int(m)) for m in tracked["migrations"]))
 
 # Find drinks that change clusters dramatically
 print("\n" + "="*80)
@@ -224,34 +247,87 @@ print("\n" + "="*80)
 print("STABLE PAIRS VS DRIFTING PAIRS")
 print("="*80)
 
-def euclidean_distance(name1, name2, tau):
-    _, coords = get_embedding_array(tau)
-    names = sorted(tau_strategies[str(tau)]["embedding"].keys())
-    idx1 = names.index(name1)
-    idx2 = names.index(name2)
-    return np.linalg.norm(coords[idx1] - coords[idx2])
+# All frames as one (τ × recipe × 2) tensor, each frame scaled to unit RMS
+# radius so distances are comparable even though UMAP layouts differ in scale.
+coords = np.stack([c for _, c in frames])
+centered = coords - coords.mean(axis=1, keepdims=True)
+coords = centered / np.sqrt((centered ** 2).sum(axis=2).mean(axis=1))[:, None, None]
+
+
+def pair_drift(coords, top=15, max_block_cells=8_000_000):
+    """
+    Distance trajectories for every recipe pair, computed in row blocks of the
+    (τ × block × recipe) distance tensor so memory stays bounded.
+
+    Returns (converging, diverging, mobility):
+      converging / diverging — top (i, j, d_first, d_last) pairs by net change
+      mobility               — per recipe, mean over partners of the summed
+                               |Δ distance| between adjacent τ frames
+    """
+    n_frames, n, _ = coords.shape
+    block = max(1, max_block_cells // (n_frames * n))
+    mobility = np.zeros(n)
+    candidates = []
+
+    for i0 in range(0, n, block):
+        i1 = min(i0 + block, n)
+        dx = coords[:, i0:i1, None, 0] - coords[:, None, :, 0]
+        dy = coords[:, i0:i1, None, 1] - coords[:, None, :, 1]
+        dists = np.sqrt(dx * dx + dy * dy)
+        mobility[i0:i1] = np.abs(np.diff(dists, axis=0)).sum(axis=0).sum(axis=1) / (n - 1)
+
+        # Upper triangle only: each pair is ranked once
+        rows, cols = np.nonzero(np.arange(n)[None, :] > np.arange(i0, i1)[:, None])
+        first, last = dists[0, rows, cols], dists[-1, rows, cols]
+        change = last - first
+        if len(change) > 2 * top:
+            keep = np.concatenate([
+                np.argpartition(change, top)[:top],
+                np.argpartition(change, -top)[-top:],
+            ])
+        else:
+            keep = np.arange(len(change))
+        candidates.append(np.column_stack([rows[keep] + i0, cols[keep], first[keep], last[keep]]))
+
+    candidates = np.concatenate(candidates)
+    order = np.argsort(candidates[:, 3] - candidates[:, 2])
+    converging = candidates[order[:top]]
+    diverging = candidates[order[::-1][:top]]
+    return converging, diverging, mobility
+
+
+converging, diverging, mobility = pair_drift(coords)
+index = {name: i for i, name in enumerate(names)}
+
+for title, rows in (("COME TOGETHER", converging), ("DRIFT APART", diverging)):
+    print(f"\nPairs that {title} most (τ={tau_values[0]} → τ={tau_values[-1]}):")
+    for i, j, d_first, d_last in rows:
+        print(f"  {names[int(i)]} & {names[int(j)]}: {d_first:.2f} → {d_last:.2f} "
+              f"(Δ = {d_last - d_first:+.2f})")
+
+print("\nMost mobile cocktails (mean |Δ distance| to all others, summed over τ):")
+for i in np.argsort(mobility)[::-1][:15]:
+    print(f"  {names[i]}: {mobility[i]:.2f}")
 
-# Check some interesting pairs
+# Spot-check pairs, read straight out of the tensor
 pairs_to_check = [
-    ("Negroni", "Boulevardier"),  # Both bitter, different base
-    ("Margarita", "Daiquiri"),  # Both citrus sours, different base
-    ("Manhattan", "Martini"),  # Both spirit-forward, different profiles
-    ("Penicillin", "Gold Rush"),  # Both whiskey sours, one has smoke
-    ("Paper Plane", "Last Word"),  # Both equal parts, intense ingredients
-    ("Aperol Spritz", "Americano"),  # Both have Aperol/Campari
-    ("Bee's Knees", "Gimlet"),  # Both gin sours
-    ("Old Fashioned", "Sazerac"),  # Both whiskey old fashioneds
-    ("Mai Tai", "Painkiller"),  # Both tiki rum
+    ("negroni", "boulevardier"),  # Both bitter, different base
+    ("margarita", "daiquiri"),  # Both citrus sours, different base
+    ("manhattan", "martini"),  # Both spirit-forward, different profiles
+    ("penicillin", "gold_rush"),  # Both whiskey sours, one has smoke
+    ("paper_plane", "last_word"),  # Both equal parts, intense ingredients
+    ("aperol_spritz", "americano"),  # Both have Aperol/Campari
+    ("bees_knees", "gimlet"),  # Both gin sours
+    ("old_fashioned", "sazerac"),  # Both whiskey old fashioneds
 ]
 
 print("\nHow drink pairs move together or apart:")
 for name1, name2 in pairs_to_check:
-    if name1 in names and name2 in names:
-        dist_low = euclidean_distance(name1, name2, low_tau)
-        dist_high = euclidean_distance(name1, name2, high_tau)
-        change = dist_high - dist_low
-
-        if abs(change) > 0.5:  # Significant change
-            direction = "DRIFT APART" if change > 0 else "COME TOGETHER"
-            print(f"  {name1} & {name2}: {direction} (Δ = {change:.2f})")
-            print(f"    Distance at τ=0.1: {dist_low:.2f}, at τ=31.6: {dist_high:.2f}")
\ No newline at end of file
+    if name1 not in index or name2 not in index:
+        continue
+    trajectory = np.linalg.norm(coords[:, index[name1]] - coords[:, index[name2]], axis=1)
+    change = trajectory[-1] - trajectory[0]
+    direction = "DRIFT APART" if change > 0 else "COME TOGETHER"
+    print(f"  {name1} & {name2}: {direction} (Δ = {change:+.2f})")
+    print(f"    Distance at τ={tau_values[0]}: {trajectory[0]:.2f}, "
+          f"at τ={tau_values[-1]}: {trajectory[-1]:.2f}")
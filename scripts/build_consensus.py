@@ -0,0 +1,95 @@
+"""
+scripts/build_consensus.py
+===========================
+Fuse the neighbour rankings of every strategy view — BLEND, ROLE-SLOT,
+PERCEPTUAL, CO-OCCURRENCE, each α frame and each τ in data/embeddings.json —
+into strategies.consensus.
+
+Run with:
+    .venv/bin/python scripts/build_consensus.py
+    .venv/bin/python scripts/build_consensus.py --method borda --depth 20 --weighting view
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cooccurrence import cooccurrence_vectors
+from consensus import FUSIONS, consensus_entry, family_weights, fuse, view_rankings
+from loaders import RECIPES, write_json
+from vectorize import compile_recipes, flavor_matrix, strategy_vectors
+
+DATA = Path(__file__).parent.parent / "data"
+OUTPUT = DATA / "embeddings.json"
+
+
+def strategy_views(existing: dict, compiled: dict):
+    """
+    Yield (name, family, vectors) for every view, one matrix at a time. The
+    α and τ values are the frames already present in embeddings.json.
+    """
+    flavor = flavor_matrix(compiled["ingredients"])
+    strategies = existing.get("strategies", {})
+    for name in ("blend", "role_slot", "perceptual"):
+        yield name, name, strategy_vectors(compiled, flavor, name)
+    if "cooccurrence" in strategies:
+        yield "cooccurrence", "cooccurrence", cooccurrence_vectors(compiled["recipes"])
+    for key, entry in strategies.items():
+        if key.startswith("blend_struct_") and "alpha" in entry:
+            yield key, "blend_struct", strategy_vectors(compiled, flavor, "blend_struct",
+                                                        alpha=entry["alpha"])
+    for key in strategies.get("tau", {}):
+        yield f"tau_{key}", "tau", strategy_vectors(compiled, flavor, "tau", tau=float(key))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--method", choices=FUSIONS, default="rrf")
+    parser.add_argument("--k", type=int, default=5, help="consensus neighbours per recipe")
+    parser.add_argument("--depth", type=int, default=10, help="top-k taken from each view")
+    parser.add_argument("--rrf-k", type=float, default=60.0, help="RRF rank offset")
+    parser.add_argument("--weighting", choices=("family", "view"), default="family",
+                        help="equal say per strategy family (α/τ frames share one) or per view")
+    args = parser.parse_args()
+    if not 1 <= args.k <= args.depth:
+        parser.error(f"--k must be between 1 and --depth ({args.depth})")
+
+    existing = {}
+    if OUTPUT.exists():
+        with open(OUTPUT) as f:
+            existing = json.load(f)
+
+    recipe_names = list(RECIPES.keys())
+    compiled = compile_recipes(recipe_names)
+    start = time.perf_counter()
+    families = []
+
+    def views():
+        for name, family, vectors in strategy_views(existing, compiled):
+            families.append(family)
+            yield name, vectors
+
+    view_names, rankings = view_rankings(views(), k=args.depth)
+    weights = family_weights(families) if args.weighting == "family" else None
+    indices, scores, agreement = fuse(rankings, weights, args.method, args.k, args.rrf_k)
+    print(f"Fused {len(view_names)} views × {len(recipe_names)} recipes "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    existing.setdefault("strategies", {})
+    existing["strategies"]["consensus"] = consensus_entry(
+        recipe_names, view_names, indices, scores, agreement, args.method)
+    write_json(OUTPUT, existing)
+    print(f"Wrote strategies.consensus to {OUTPUT}")
+
+    mean = agreement.mean(axis=1)
+    for label, order in (("most agreed", mean.argsort()[::-1]), ("least agreed", mean.argsort())):
+        print(f"  {label}: " + ", ".join(f"{recipe_names[i]} {mean[i]:.2f}" for i in order[:5]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
 """
 scripts/build_embeddings.py
 ============================
-Compute cocktail embeddings under 4 vectorization strategies, run UMAP to 2D,
+Compute cocktail embeddings under 5 vectorization strategies, run UMAP to 2D,
 and write data/embeddings.json.
 
 Run with:
     .venv/bin/python scripts/build_embeddings.py
+    .venv/bin/python scripts/build_embeddings.py --sweep procrustes --alpha-steps 101 --jobs 8
+    .venv/bin/python scripts/build_embeddings.py --alpha-grid adaptive
+    .venv/bin/python scripts/build_embeddings.py --dedup
+    .venv/bin/python scripts/build_embeddings.py --benchmark
 """
 
-import json
 import sys
+import warnings
 from pathlib import Path
 
 import numpy as np
@@ -17,7 +21,13 @@ import numpy as np
 # Add project root to path so we can import loaders/utils
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from loaders import FLAVOR_DIMS, INGREDIENTS, RECIPES
+from loaders import FLAVOR_DIMS, INGREDIENTS, RECIPES, Dataset, resolve, write_json
+from cooccurrence import component_labels, cooccurrence_vectors, ingredient_embeddings
+from dedup import collapse, find_duplicates
+from explain import dimension_labels, explained_neighbors, recipe_distance_neighbors
+from metrics import frame_displacement, frame_steps, layout_quality
+from neighbors import adaptive_grid, umap_knn
+from utils import GARNISH_WEIGHT, PUNCH_WEIGHT, ROLE_GROUPS, SEASONING_WEIGHT
 
 try:
     import umap
@@ -35,20 +45,12 @@ OUTPUT = DATA / "embeddings.json"
 
 FLAVOR_DIM_INDEX = {d: i for i, d in enumerate(FLAVOR_DIMS)}
 
-_ROLE_GROUPS = {
-    "modifier":  "modifying",
-    "sweetener": "modifying",
-    "accent":    "accent",
-    "base":      "base",
-    "citrus":    "citrus",
-    "seasoning": "seasoning",
-}
-
-def get_flavor_vector(ingredient_name: str) -> np.ndarray:
-    if ingredient_name not in INGREDIENTS:
-        return np.zeros(len(FLAVOR_DIMS))
-    ing = INGREDIENTS[ingredient_name]
-    return np.array([ing["flavor"][dim] for dim in FLAVOR_DIMS])
+def get_flavor_vector(ingredient_name: str, dataset: Dataset | None = None) -> np.ndarray:
+    ds = resolve(dataset)
+    if ingredient_name not in ds.ingredients:
+        return np.zeros(len(ds.flavor_dims), dtype=ds.precision)
+    ing = ds.ingredients[ingredient_name]
+    return np.array([ing["flavor"][dim] for dim in ds.flavor_dims], dtype=ds.precision)
 
 
 def recipe_total_ml(recipe: dict) -> float:
@@ -59,18 +61,19 @@ def recipe_total_ml(recipe: dict) -> float:
 # Strategy 1: BLEND — proportion-weighted flavor blend
 # ─────────────────────────────────────────────────────────────────────────────
 
-def blend_vector(recipe: dict) -> np.ndarray:
+def blend_vector(recipe: dict, dataset: Dataset | None = None) -> np.ndarray:
+    ds = resolve(dataset)
     total_ml = recipe_total_ml(recipe)
-    blended = np.zeros(len(FLAVOR_DIMS))
+    blended = np.zeros(len(ds.flavor_dims), dtype=ds.precision)
     for c in recipe["components"]:
-        fv = get_flavor_vector(c["ingredient"])
+        fv = get_flavor_vector(c["ingredient"], dataset)
         if c["ml"] is not None and total_ml > 0:
             weight = c["ml"] / total_ml
         else:
-            weight = 0.05  # seasoning
+            weight = SEASONING_WEIGHT
         blended += fv * weight
     for g in recipe.get("garnish", []):
-        blended += get_flavor_vector(g) * 0.03
+        blended += get_flavor_vector(g, dataset) * GARNISH_WEIGHT
     return blended
 
 
@@ -78,13 +81,13 @@ def blend_vector(recipe: dict) -> np.ndarray:
 # Strategy 2: BLEND+STRUCT — flavor blend concatenated with structural vector
 # ─────────────────────────────────────────────────────────────────────────────
 
-def structural_vector(recipe: dict) -> np.ndarray:
+def structural_vector(recipe: dict, dataset: Dataset | None = None) -> np.ndarray:
     total_ml = recipe_total_ml(recipe)
     role_ml = {"base": 0.0, "modifying": 0.0, "citrus": 0.0, "accent": 0.0}
     has_seasoning = 0
 
     for c in recipe["components"]:
-        role = _ROLE_GROUPS.get(c["role"], c["role"])
+        role = ROLE_GROUPS.get(c["role"], c["role"])
         if c["ml"] is not None and total_ml > 0:
             if role in role_ml:
                 role_ml[role] += c["ml"] / total_ml
@@ -102,17 +105,18 @@ def structural_vector(recipe: dict) -> np.ndarray:
         has_seasoning,
         is_up,
         is_on_ice,
-    ])
+    ], dtype=resolve(dataset).precision)
 
 
-def blend_struct_vector_pair(recipe: dict) -> tuple[np.ndarray, np.ndarray]:
+def blend_struct_vector_pair(recipe: dict,
+                             dataset: Dataset | None = None) -> tuple[np.ndarray, np.ndarray]:
     """
     Return (flavor_unit, struct_unit): each half independently normalized to
     unit length. Normalizing before concatenating ensures alpha/beta controls
     a true soft interpolation between the two, not a magnitude-dominated one.
     """
-    fv = blend_vector(recipe)
-    sv = structural_vector(recipe)
+    fv = blend_vector(recipe, dataset)
+    sv = structural_vector(recipe, dataset)
     fn = np.linalg.norm(fv)
     sn = np.linalg.norm(sv)
     fv_unit = fv / fn if fn > 0 else fv
@@ -120,14 +124,15 @@ def blend_struct_vector_pair(recipe: dict) -> tuple[np.ndarray, np.ndarray]:
     return fv_unit, sv_unit
 
 
-def blend_struct_vector(recipe: dict, alpha: float = 0.5) -> np.ndarray:
+def blend_struct_vector(recipe: dict, alpha: float = 0.5,
+                        dataset: Dataset | None = None) -> np.ndarray:
     """
     Concatenate unit-normalized flavor (×alpha) and structural (×(1-alpha)).
     alpha=1 → pure flavor; alpha=0 → pure structure.
     Because both halves are unit-normalized first, the slider is a genuine
     interpolation rather than being dominated by whichever half has larger raw magnitude.
     """
-    fv_unit, sv_unit = blend_struct_vector_pair(recipe)
+    fv_unit, sv_unit = blend_struct_vector_pair(recipe, dataset)
     return np.concatenate([fv_unit * alpha, sv_unit * (1.0 - alpha)])
 
 
@@ -137,17 +142,18 @@ def blend_struct_vector(recipe: dict, alpha: float = 0.5) -> np.ndarray:
 
 SLOTS = ["base", "modifying", "citrus", "accent"]
 
-def role_slot_vector(recipe: dict) -> np.ndarray:
+def role_slot_vector(recipe: dict, dataset: Dataset | None = None) -> np.ndarray:
     """4 × 15 = 60 dimensional vector: flavor profile per role slot."""
+    ds = resolve(dataset)
     total_ml = recipe_total_ml(recipe)
-    slot_vecs  = {s: np.zeros(len(FLAVOR_DIMS)) for s in SLOTS}
+    slot_vecs  = {s: np.zeros(len(ds.flavor_dims), dtype=ds.precision) for s in SLOTS}
     slot_total = {s: 0.0 for s in SLOTS}
 
     for c in recipe["components"]:
-        role = _ROLE_GROUPS.get(c["role"], None)
+        role = ROLE_GROUPS.get(c["role"], None)
         if role not in SLOTS:
             role = None  # seasoning — distribute later
-        fv = get_flavor_vector(c["ingredient"])
+        fv = get_flavor_vector(c["ingredient"], dataset)
 
         if c["ml"] is not None and total_ml > 0:
             if role:
@@ -156,7 +162,7 @@ def role_slot_vector(recipe: dict) -> np.ndarray:
         else:
             # Seasoning: add a small fixed contribution to all slots
             for s in SLOTS:
-                slot_vecs[s] += fv * 0.05 / len(SLOTS)
+                slot_vecs[s] += fv * SEASONING_WEIGHT / len(SLOTS)
 
     # Normalize each slot by its total volume (gives volume-weighted average)
     for s in SLOTS:
@@ -166,7 +172,7 @@ def role_slot_vector(recipe: dict) -> np.ndarray:
 
     # Garnish flavor → accent slot
     for g in recipe.get("garnish", []):
-        slot_vecs["accent"] += get_flavor_vector(g) * 0.03
+        slot_vecs["accent"] += get_flavor_vector(g, dataset) * GARNISH_WEIGHT
 
     return np.concatenate([slot_vecs[s] for s in SLOTS])
 
@@ -175,25 +181,24 @@ def role_slot_vector(recipe: dict) -> np.ndarray:
 # Strategy 4: PERCEPTUAL — max ingredient punches above its weight
 # ─────────────────────────────────────────────────────────────────────────────
 
-PUNCH_WEIGHT = 0.4
-
-def perceptual_vector(recipe: dict) -> np.ndarray:
+def perceptual_vector(recipe: dict, dataset: Dataset | None = None) -> np.ndarray:
     total_ml = recipe_total_ml(recipe)
     ingredient_vecs = []
 
     for c in recipe["components"]:
-        fv = get_flavor_vector(c["ingredient"])
+        fv = get_flavor_vector(c["ingredient"], dataset)
         ingredient_vecs.append(fv)
 
     for g in recipe.get("garnish", []):
-        ingredient_vecs.append(get_flavor_vector(g) * 0.03)
+        ingredient_vecs.append(get_flavor_vector(g, dataset) * GARNISH_WEIGHT)
 
     if not ingredient_vecs:
-        return np.zeros(len(FLAVOR_DIMS))
+        ds = resolve(dataset)
+        return np.zeros(len(ds.flavor_dims), dtype=ds.precision)
 
     stacked = np.array(ingredient_vecs)
     max_vec  = stacked.max(axis=0)
-    blend    = blend_vector(recipe)
+    blend    = blend_vector(recipe, dataset)
 
     return PUNCH_WEIGHT * max_vec + (1 - PUNCH_WEIGHT) * blend
 
@@ -264,16 +269,29 @@ def derive_family(recipe: dict) -> str:
 # UMAP
 # ─────────────────────────────────────────────────────────────────────────────
 
-def run_umap(matrix: np.ndarray, n_neighbors: int = 10) -> np.ndarray:
-    """Run UMAP on rows of matrix, return Nx2 array."""
+def run_umap(matrix: np.ndarray, n_neighbors: int = 10,
+             init: np.ndarray | str = "spectral",
+             knn: tuple[np.ndarray, np.ndarray] | None = None) -> np.ndarray:
+    """
+    Run UMAP on rows of matrix, return Nx2 array. `init` may be a warm-start
+    layout. The kNN graph comes from neighbors.umap_knn (cached on disk by
+    matrix hash) unless one is passed in, so UMAP never runs its own search.
+    """
+    n_neighbors = min(n_neighbors, len(matrix) - 1)
+    knn = knn if knn is not None else umap_knn(matrix, n_neighbors, metric="cosine")
     reducer = umap.UMAP(
         n_components=2,
         metric="cosine",
-        n_neighbors=min(n_neighbors, len(matrix) - 1),
+        n_neighbors=n_neighbors,
         min_dist=0.1,
         random_state=42,
+        init=init,
+        precomputed_knn=knn,
     )
-    return reducer.fit_transform(matrix)
+    with warnings.catch_warnings():
+        # No NNDescent search index comes with our graph; we never call transform()
+        warnings.filterwarnings("ignore", message=".*knn_search_index.*")
+        return reducer.fit_transform(matrix)
 
 
 def procrustes_align(source: np.ndarray, target: np.ndarray) -> np.ndarray:
@@ -304,46 +322,169 @@ def procrustes_align(source: np.ndarray, target: np.ndarray) -> np.ndarray:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Nearest neighbours (cosine distance) from raw high-dim vectors
+# α sweeps: joint AlignedUMAP, or per-frame warm-started UMAP + Procrustes
 # ─────────────────────────────────────────────────────────────────────────────
 
-def cosine_distance(a: np.ndarray, b: np.ndarray) -> float:
-    na, nb = np.linalg.norm(a), np.linalg.norm(b)
-    if na == 0 or nb == 0:
-        return 1.0
-    return float(1.0 - np.dot(a, b) / (na * nb))
+def aligned_sweep(datasets: list[np.ndarray]) -> list[np.ndarray]:
+    """
+    AlignedUMAP jointly optimises all embeddings simultaneously with an
+    alignment penalty between adjacent steps, guaranteeing that each frame
+    can't arbitrarily rotate or flip relative to its neighbours. Cost and
+    memory grow with the number of frames, and the fit is all-or-nothing.
+    AlignedUMAP builds its per-frame UMAPs internally, so unlike run_umap it
+    cannot take precomputed kNN graphs.
+    """
+    n = len(datasets[0])
+    # Every step has the same points: identity relation
+    identity = {i: i for i in range(n)}
+    relations = [identity] * (len(datasets) - 1)
+
+    aligned_mapper = AlignedUMAP(
+        n_neighbors=10,
+        n_components=2,
+        metric="cosine",
+        min_dist=0.1,
+        alignment_regularisation=0.01,  # strong enough to prevent flips, loose
+        alignment_window_size=3,        # look ±1 step when aligning
+        random_state=42,
+    ).fit(datasets, relations=relations)
+
+    return list(aligned_mapper.embeddings_)
+
+
+def _fit_segment(datasets: list[np.ndarray]) -> list[np.ndarray]:
+    """
+    Fit one contiguous run of frames: the middle frame cold, then outward in
+    both directions, each frame warm-started from its neighbour's layout
+    (the same scheme build_embeddings_tau uses along τ). Each frame's kNN
+    search is likewise seeded from its neighbour's graph.
+    """
+    anchor = len(datasets) // 2
+    n_neighbors = min(10, len(datasets[anchor]) - 1)
+    layouts: list[np.ndarray | None] = [None] * len(datasets)
+    graphs: list[tuple | None] = [None] * len(datasets)
+    graphs[anchor] = umap_knn(datasets[anchor], n_neighbors)
+    layouts[anchor] = run_umap(datasets[anchor], knn=graphs[anchor])
+    for order, step in ((range(anchor - 1, -1, -1), 1), (range(anchor + 1, len(datasets)), -1)):
+        for t in order:
+            graphs[t] = umap_knn(datasets[t], n_neighbors, seed=graphs[t + step][0])
+            layouts[t] = run_umap(datasets[t], init=layouts[t + step], knn=graphs[t])
+    return layouts
+
+
+def procrustes_sweep(datasets: list[np.ndarray], n_jobs: int = 1) -> list[np.ndarray]:
+    """
+    Fit every frame independently and stitch them together with
+    procrustes_align. Frames are split into `n_jobs` contiguous segments that
+    are fitted in parallel processes; within a segment frames are warm-started
+    from their neighbour, and afterwards every frame is rotated onto the
+    already-aligned frame before it, which also fixes the seams between
+    segments. Cost is linear in the number of frames and frames can be added
+    one at a time.
+    """
+    n_jobs = max(1, min(n_jobs, len(datasets)))
+    bounds = np.linspace(0, len(datasets), n_jobs + 1).round().astype(int)
+    segments = [datasets[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    if n_jobs == 1:
+        fitted = [_fit_segment(segments[0])]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            fitted = list(pool.map(_fit_segment, segments))
+
+    layouts = [layout for segment in fitted for layout in segment]
+    for t in range(1, len(layouts)):
+        layouts[t] = procrustes_align(layouts[t], layouts[t - 1])
+    return layouts
+
+
+def layout_stability(layouts: list[np.ndarray]) -> dict:
+    """
+    Frame-to-frame displacement of a sweep: RMS point movement between
+    adjacent frames after removing rotation (Procrustes), relative to the
+    RMS radius of the frame. 0 = frozen layout; ~1.4 = unrelated layouts.
+    """
+    d = frame_displacement(layouts)
+    return {key: d[key] for key in ("mean_step", "max_step", "steps")}
+
+
+def alpha_label(alpha: float) -> str:
+    """Strategy key for an α frame: blend_struct_a050, or blend_struct_a012p50 off whole percents."""
+    pct = alpha * 100
+    if abs(pct - round(pct)) < 1e-9:
+        return f"blend_struct_a{int(round(pct)):03d}"
+    return f"blend_struct_a{pct:06.2f}".replace(".", "p")
 
 
-def nearest_neighbors(names: list[str], vectors: np.ndarray, top_k: int = 5) -> dict:
-    """Return {name: [{name, distance}, ...]} for each cocktail."""
-    result = {}
-    n = len(names)
-    for i, name in enumerate(names):
-        dists = []
-        for j, other in enumerate(names):
-            if i != j:
-                d = cosine_distance(vectors[i], vectors[j])
-                dists.append({"name": other, "distance": round(d, 4)})
-        dists.sort(key=lambda x: x["distance"])
-        result[name] = dists[:top_k]
-    return result
+# ─────────────────────────────────────────────────────────────────────────────
+# Nearest neighbours (cosine distance) from raw high-dim vectors, explained
+# ─────────────────────────────────────────────────────────────────────────────
+
+def nearest_neighbors(names: list[str], vectors: np.ndarray, labels: list[str],
+                      top_k: int = 5) -> dict:
+    """
+    Return {name: [{name, distance, shared, differ}, ...]} for each cocktail:
+    the top-k by cosine distance, each with the dimensions (`labels`) the
+    pair shares most and differs on most (see explain.py).
+    """
+    return explained_neighbors(names, vectors, labels, k=top_k)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Main
 # ─────────────────────────────────────────────────────────────────────────────
 
-def main():
-    recipe_names = list(RECIPES.keys())
-    recipes      = {n: RECIPES[n] for n in recipe_names}
-    n = len(recipe_names)
+def alpha_grid(recipe_names: list[str], alpha_steps: int, mode: str = "uniform") -> list[float]:
+    """
+    α values for the BLEND+STRUCT sweep: evenly spaced, or (mode="adaptive")
+    placed where the high-dimensional kNN graph changes most.
+    """
+    if mode == "uniform":
+        return [round(a / (alpha_steps - 1), 4) for a in range(alpha_steps)]
+    values, changes = adaptive_grid(
+        lambda alpha: np.array([blend_struct_vector(RECIPES[rn], alpha) for rn in recipe_names]),
+        0.0, 1.0, alpha_steps,
+    )
+    print(f"        adaptive α grid: kNN change per step {min(changes):.3f}–{max(changes):.3f}")
+    return values
 
-    print(f"Building embeddings for {n} recipes …")
 
-    # ── Per-recipe derived metadata ──────────────────────────────────────────
+STRATEGY_VECTORS = {
+    "blend": blend_vector,
+    "role_slot": role_slot_vector,
+    "perceptual": perceptual_vector,
+}
+
+STRATEGY_DESCRIPTIONS = {
+    "blend": "Proportion-weighted flavor blend. Pure taste, no structure.",
+    "role_slot": (
+        "Role-slot vectors (4×15=60 dims). "
+        "Compares base-to-base, modifier-to-modifier. "
+        "Two drinks are close only if the same slots taste similar."
+    ),
+    "perceptual": (
+        f"Perceptual blend (punch_weight={PUNCH_WEIGHT}). "
+        "Punchy ingredients win. Small amounts of Chartreuse, Fernet, Mezcal "
+        "pull their slot's character toward theirs."
+    ),
+    "cooccurrence": (
+        "Co-occurrence embeddings. Ingredients are placed by the "
+        "company they keep across recipes (PPMI + truncated SVD), not by the flavor "
+        "table; recipes blend them by proportion."
+    ),
+}
+
+
+def recipe_metadata(recipe_names: list[str]) -> dict:
+    """
+    Per-recipe derived fields stored under "recipes" in embeddings.json,
+    including the recipe_distance neighbours with their term breakdown.
+    """
+    distance_neighbors = recipe_distance_neighbors(recipe_names)
     recipe_meta = {}
-    for name, recipe in recipes.items():
-        flavor_vec = blend_vector(recipe)
+    for name in recipe_names:
+        recipe = RECIPES[name]
         recipe_meta[name] = {
             "method":       recipe["method"],
             "served":       recipe.get("served", "either"),
@@ -351,131 +492,189 @@ def main():
             "garnish":      recipe.get("garnish", []),
             "base_spirit":  derive_base_spirit(recipe),
             "family":       derive_family(recipe),
-            "flavor_vector": flavor_vec.tolist(),
+            "flavor_vector": blend_vector(recipe).tolist(),
+            "neighbors":    distance_neighbors[name],
         }
+    return recipe_meta
 
-    # ── Strategy: BLEND ─────────────────────────────────────────────────────
-    print("  [1/4] BLEND …")
-    blend_vecs = np.array([blend_vector(recipes[n]) for n in recipe_names])
-    blend_2d   = run_umap(blend_vecs)
-    blend_nn   = nearest_neighbors(recipe_names, blend_vecs)
-
-    # ── Strategy: BLEND+STRUCT — AlignedUMAP over 21 alpha steps ────────────
-    # AlignedUMAP jointly optimises all 21 embeddings simultaneously with an
-    # alignment penalty between adjacent steps, guaranteeing that each frame
-    # can't arbitrarily rotate or flip relative to its neighbours.  Each frame
-    # is a genuine UMAP embedding (not a lerp), so clusters are preserved
-    # throughout the transition.
-    alpha_values = [round(a * 0.05, 2) for a in range(21)]  # 0.00, 0.05, …, 1.00
-
-    print(f"  [2/4] BLEND+STRUCT AlignedUMAP ({len(alpha_values)} steps) …")
-
-    # One feature matrix per alpha — interpolate in vector space
-    bs_datasets = [
-        np.array([blend_struct_vector(recipes[rn], alpha) for rn in recipe_names])
+
+def strategy_entry(description: str, recipe_names: list[str], layout: np.ndarray,
+                   vectors: np.ndarray, labels: list[str] | None = None) -> dict:
+    """
+    embeddings.json entry: 2D points, high-dim nearest neighbours and the
+    layout's neighbour-preservation quality (metrics.layout_quality).
+    `labels` names the vector dimensions (default FLAVOR_DIMS).
+    """
+    return {
+        "description": description,
+        "points": {
+            name: {"x": float(layout[i, 0]), "y": float(layout[i, 1])}
+            for i, name in enumerate(recipe_names)
+        },
+        "neighbors": nearest_neighbors(recipe_names, vectors, labels or list(FLAVOR_DIMS)),
+        "quality": layout_quality(vectors, layout),
+    }
+
+
+def blend_struct_datasets(recipe_names: list[str], alpha_values: list[float]) -> list[np.ndarray]:
+    """One feature matrix per alpha — interpolate in vector space."""
+    return [
+        np.array([blend_struct_vector(RECIPES[rn], alpha) for rn in recipe_names])
         for alpha in alpha_values
     ]
 
-    # Every step has the same 100 points: identity relation
-    identity = {i: i for i in range(n)}
-    relations = [identity] * (len(alpha_values) - 1)
 
-    aligned_mapper = AlignedUMAP(
-        n_neighbors=10,
-        n_components=2,
-        metric="cosine",
-        min_dist=0.1,
-        alignment_regularisation=0.01,  # strong enough to prevent flips, loose
-        alignment_window_size=3,        # look ±1 step when aligning
-        random_state=42,
-    ).fit(bs_datasets, relations=relations)
-
-    aligned_embeddings = aligned_mapper.embeddings_  # list of 21 (n, 2) arrays
-
-    blend_struct_strategies = {}
-    for idx, alpha in enumerate(alpha_values):
-        label = f"blend_struct_a{int(round(alpha * 100)):03d}"
-        emb_2d = aligned_embeddings[idx]
-        bs_vecs = bs_datasets[idx]
-        bs_nn   = nearest_neighbors(recipe_names, bs_vecs)
-        blend_struct_strategies[label] = {
-            "description": (
+def blend_struct_entries(recipe_names: list[str], alpha_values: list[float],
+                         datasets: list[np.ndarray], sweep: str = "aligned",
+                         n_jobs: int = 1) -> dict:
+    """
+    Embed every α frame and return {alpha_label: entry}. Each frame is a
+    genuine UMAP embedding (not a lerp), so clusters are preserved throughout
+    the transition. "aligned" fits all frames jointly with AlignedUMAP;
+    "procrustes" fits them independently (in parallel) and aligns them
+    afterwards, which scales to many more frames.
+    """
+    if sweep == "aligned":
+        sweep_embeddings = aligned_sweep(datasets)
+        how = (f"jointly optimised across all {len(alpha_values)} α steps via "
+               "AlignedUMAP, so clusters persist smoothly as the slider moves.")
+    else:
+        sweep_embeddings = procrustes_sweep(datasets, n_jobs=n_jobs)
+        how = ("warm-started from its neighbouring α step and Procrustes-aligned "
+               "to it, so clusters persist smoothly as the slider moves.")
+
+    # RMS displacement of each frame from the previous one (0 for the first)
+    steps = np.sqrt((frame_steps(sweep_embeddings) ** 2).mean(axis=1))
+    steps = np.concatenate([[0.0], steps])
+
+    entries = {}
+    for alpha, emb_2d, bs_vecs, step in zip(alpha_values, sweep_embeddings, datasets, steps):
+        entries[alpha_label(alpha)] = {
+            **strategy_entry(
                 f"Taste + structure (α={alpha:.2f}). "
-                "Each frame is a genuine UMAP embedding jointly optimised across "
-                "all 21 α steps via AlignedUMAP, so clusters persist smoothly "
-                "as the slider moves."
+                f"Each frame is a genuine UMAP embedding {how}",
+                recipe_names, emb_2d, bs_vecs, dimension_labels("blend_struct"),
             ),
             "alpha": alpha,
-            "points": {
-                recipe_names[i]: {"x": float(emb_2d[i, 0]), "y": float(emb_2d[i, 1])}
-                for i in range(n)
-            },
-            "neighbors": bs_nn,
         }
+        entries[alpha_label(alpha)]["quality"]["displacement"] = round(float(step), 4)
+    return entries
+
 
-    # Default BLEND+STRUCT is α=0.50
-    blend_struct_default = blend_struct_strategies["blend_struct_a050"]
+def default_blend_struct(entries: dict) -> dict:
+    """Default BLEND+STRUCT is the step closest to α=0.50."""
+    return min(entries.values(), key=lambda e: abs(e["alpha"] - 0.5))
+
+
+def main(sweep: str = "aligned", alpha_steps: int = 21, n_jobs: int = 1,
+         grid: str = "uniform", dedup: bool = False):
+    recipe_names = list(RECIPES.keys())
+    duplicates = {}
+    if dedup:
+        # Embed one canonical recipe per near-duplicate group
+        recipe_names, duplicates = collapse(recipe_names, find_duplicates(recipe_names))
+        print(f"Collapsed {len(duplicates)} near-duplicates")
+    n = len(recipe_names)
+
+    print(f"Building embeddings for {n} recipes …")
+
+    # ── Per-recipe derived metadata ──────────────────────────────────────────
+    recipe_meta = recipe_metadata(recipe_names)
+    for name, canonical in duplicates.items():
+        recipe_meta[canonical].setdefault("duplicates", []).append(name)
+
+    # ── Strategy: BLEND ─────────────────────────────────────────────────────
+    print("  [1/5] BLEND …")
+    blend_vecs = np.array([blend_vector(RECIPES[n]) for n in recipe_names])
+    blend = strategy_entry(STRATEGY_DESCRIPTIONS["blend"], recipe_names,
+                           run_umap(blend_vecs), blend_vecs)
+
+    # ── Strategy: BLEND+STRUCT — one embedding per alpha step ───────────────
+    print(f"  [2/5] BLEND+STRUCT {sweep} sweep ({alpha_steps} {grid} steps) …")
+    alpha_values = alpha_grid(recipe_names, alpha_steps, grid)
+    bs_datasets = blend_struct_datasets(recipe_names, alpha_values)
+    blend_struct_strategies = blend_struct_entries(
+        recipe_names, alpha_values, bs_datasets, sweep, n_jobs)
 
     # ── Strategy: ROLE-SLOT ──────────────────────────────────────────────────
-    print("  [3/4] ROLE-SLOT …")
-    rs_vecs = np.array([role_slot_vector(recipes[n]) for n in recipe_names])
-    rs_2d   = run_umap(rs_vecs)
-    rs_nn   = nearest_neighbors(recipe_names, rs_vecs)
+    print("  [3/5] ROLE-SLOT …")
+    rs_vecs = np.array([role_slot_vector(RECIPES[n]) for n in recipe_names])
+    role_slot = strategy_entry(STRATEGY_DESCRIPTIONS["role_slot"], recipe_names,
+                               run_umap(rs_vecs), rs_vecs, dimension_labels("role_slot"))
 
     # ── Strategy: PERCEPTUAL ─────────────────────────────────────────────────
-    print("  [4/4] PERCEPTUAL …")
-    perc_vecs = np.array([perceptual_vector(recipes[n]) for n in recipe_names])
-    perc_2d   = run_umap(perc_vecs)
-    perc_nn   = nearest_neighbors(recipe_names, perc_vecs)
+    print("  [4/5] PERCEPTUAL …")
+    perc_vecs = np.array([perceptual_vector(RECIPES[n]) for n in recipe_names])
+    perceptual = strategy_entry(STRATEGY_DESCRIPTIONS["perceptual"], recipe_names,
+                                run_umap(perc_vecs), perc_vecs)
+
+    # ── Strategy: CO-OCCURRENCE — learned from every recipe in the catalog ──
+    print("  [5/5] CO-OCCURRENCE …")
+    cooc_emb = ingredient_embeddings()
+    cooc_vecs = cooccurrence_vectors(recipe_names, embeddings=cooc_emb)
+    cooccurrence = strategy_entry(STRATEGY_DESCRIPTIONS["cooccurrence"], recipe_names,
+                                  run_umap(cooc_vecs), cooc_vecs, component_labels(cooc_emb))
 
     # ── Assemble output ──────────────────────────────────────────────────────
     output = {
         "strategies": {
-            "blend": {
-                "description": "Proportion-weighted flavor blend. Pure taste, no structure.",
-                "points": {
-                    recipe_names[i]: {"x": float(blend_2d[i, 0]), "y": float(blend_2d[i, 1])}
-                    for i in range(n)
-                },
-                "neighbors": blend_nn,
-            },
-            "blend_struct": blend_struct_default,
-            "role_slot": {
-                "description": (
-                    "Role-slot vectors (4×15=60 dims). "
-                    "Compares base-to-base, modifier-to-modifier. "
-                    "Two drinks are close only if the same slots taste similar."
-                ),
-                "points": {
-                    recipe_names[i]: {"x": float(rs_2d[i, 0]), "y": float(rs_2d[i, 1])}
-                    for i in range(n)
-                },
-                "neighbors": rs_nn,
-            },
-            "perceptual": {
-                "description": (
-                    f"Perceptual blend (punch_weight={PUNCH_WEIGHT}). "
-                    "Punchy ingredients win. Small amounts of Chartreuse, Fernet, Mezcal "
-                    "pull their slot's character toward theirs."
-                ),
-                "points": {
-                    recipe_names[i]: {"x": float(perc_2d[i, 0]), "y": float(perc_2d[i, 1])}
-                    for i in range(n)
-                },
-                "neighbors": perc_nn,
-            },
+            "blend": blend,
+            "blend_struct": default_blend_struct(blend_struct_strategies),
+            "role_slot": role_slot,
+            "perceptual": perceptual,
+            "cooccurrence": cooccurrence,
             # Pre-baked α/β snapshots for blend+struct slider
             **blend_struct_strategies,
         },
         "recipes": recipe_meta,
     }
 
-    with open(OUTPUT, "w") as f:
-        json.dump(output, f, indent=2)
+    write_json(OUTPUT, output)
 
     print(f"\nWrote {OUTPUT}")
-    print(f"  {n} cocktails × 4 strategies (+ 5 α/β snapshots)")
+    print(f"  {n} cocktails × 5 strategies (+ {len(alpha_values)} α snapshots)")
+
+
+def benchmark(alpha_steps: int = 21, n_jobs: int = 1, grid: str = "uniform"):
+    """Time both α sweep modes on the current data and compare layout stability."""
+    import time
+
+    recipe_names = list(RECIPES.keys())
+    alpha_values = alpha_grid(recipe_names, alpha_steps, grid)
+    datasets = blend_struct_datasets(recipe_names, alpha_values)
+
+    print(f"Benchmarking {len(alpha_values)} α steps × {len(recipe_names)} recipes …")
+    for name, fn in (("aligned", aligned_sweep),
+                     ("procrustes", lambda d: procrustes_sweep(d, n_jobs=n_jobs))):
+        start = time.perf_counter()
+        layouts = fn(datasets)
+        elapsed = time.perf_counter() - start
+        stability = layout_stability(layouts)
+        print(f"  {name:10s}  {elapsed:7.1f}s   mean step {stability['mean_step']:.4f}   "
+              f"max step {stability['max_step']:.4f}")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build data/embeddings.json")
+    parser.add_argument("--sweep", choices=("aligned", "procrustes"), default="aligned",
+                        help="α sweep mode: joint AlignedUMAP or per-frame UMAP + Procrustes")
+    parser.add_argument("--alpha-steps", type=int, default=21,
+                        help="number of α frames from 0 to 1 (default 21)")
+    parser.add_argument("--alpha-grid", choices=("uniform", "adaptive"), default="uniform",
+                        help="evenly spaced α, or denser where kNN structure changes")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="parallel processes for the procrustes sweep")
+    parser.add_argument("--dedup", action="store_true",
+                        help="collapse near-duplicate recipes (dedup.py) before UMAP")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time both sweep modes and report stability; writes nothing")
+    args = parser.parse_args()
+    if args.alpha_steps < 2:
+        parser.error("--alpha-steps must be at least 2")
+
+    if args.benchmark:
+        benchmark(args.alpha_steps, args.jobs, args.alpha_grid)
+    else:
+        main(args.sweep, args.alpha_steps, args.jobs, args.alpha_grid, args.dedup)
@@ -6,10 +6,12 @@ Generates stabilized UMAP embeddings across a range of tau values.
 
 Run with:
     .venv/bin/python scripts/build_embeddings_tau.py
+    .venv/bin/python scripts/build_embeddings_tau.py --tau-grid adaptive --tau-steps 25
 """
 
 import json
 import sys
+import warnings
 from pathlib import Path
 
 import numpy as np
@@ -17,7 +19,11 @@ import numpy as np
 # Add project root to path so we can import loaders/utils
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from loaders import FLAVOR_DIMS, INGREDIENTS, RECIPES
+from loaders import FLAVOR_DIMS, INGREDIENTS, RECIPES, Dataset, resolve, write_json
+from dedup import collapse, find_duplicates
+from metrics import frame_steps, layout_quality
+from neighbors import adaptive_grid, umap_knn
+from utils import GARNISH_WEIGHT, SEASONING_WEIGHT
 
 try:
     import umap
@@ -34,20 +40,12 @@ OUTPUT = DATA / "embeddings.json"
 
 FLAVOR_DIM_INDEX = {d: i for i, d in enumerate(FLAVOR_DIMS)}
 
-_ROLE_GROUPS = {
-    "modifier":  "modifying",
-    "sweetener": "modifying",
-    "accent":    "accent",
-    "base":      "base",
-    "citrus":    "citrus",
-    "seasoning": "seasoning",
-}
-
-def get_flavor_vector(ingredient_name: str) -> np.ndarray:
-    if ingredient_name not in INGREDIENTS:
-        return np.zeros(len(FLAVOR_DIMS))
-    ing = INGREDIENTS[ingredient_name]
-    return np.array([ing["flavor"][dim] for dim in FLAVOR_DIMS])
+def get_flavor_vector(ingredient_name: str, dataset: Dataset | None = None) -> np.ndarray:
+    ds = resolve(dataset)
+    if ingredient_name not in ds.ingredients:
+        return np.zeros(len(ds.flavor_dims), dtype=ds.precision)
+    ing = ds.ingredients[ingredient_name]
+    return np.array([ing["flavor"][dim] for dim in ds.flavor_dims], dtype=ds.precision)
 
 
 def recipe_total_ml(recipe: dict) -> float:
@@ -58,18 +56,19 @@ def recipe_total_ml(recipe: dict) -> float:
 # Original BLEND strategy (for comparison)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def blend_vector(recipe: dict) -> np.ndarray:
+def blend_vector(recipe: dict, dataset: Dataset | None = None) -> np.ndarray:
+    ds = resolve(dataset)
     total_ml = recipe_total_ml(recipe)
-    blended = np.zeros(len(FLAVOR_DIMS))
+    blended = np.zeros(len(ds.flavor_dims), dtype=ds.precision)
     for c in recipe["components"]:
-        fv = get_flavor_vector(c["ingredient"])
+        fv = get_flavor_vector(c["ingredient"], dataset)
         if c["ml"] is not None and total_ml > 0:
             weight = c["ml"] / total_ml
         else:
-            weight = 0.05  # seasoning
+            weight = SEASONING_WEIGHT
         blended += fv * weight
     for g in recipe.get("garnish", []):
-        blended += get_flavor_vector(g) * 0.03
+        blended += get_flavor_vector(g, dataset) * GARNISH_WEIGHT
     return blended
 
 
@@ -83,7 +82,8 @@ def softmax(x: np.ndarray) -> np.ndarray:
     return exp_x / exp_x.sum()
 
 
-def softmax_perceptual_vector(recipe: dict, tau: float = 1.0) -> np.ndarray:
+def softmax_perceptual_vector(recipe: dict, tau: float = 1.0,
+                              dataset: Dataset | None = None) -> np.ndarray:
     """
     Compute perceptual vector using softmax over ingredient intensities,
     modulated by volume proportions.
@@ -99,29 +99,30 @@ def softmax_perceptual_vector(recipe: dict, tau: float = 1.0) -> np.ndarray:
     means that at high tau the boost becomes uniform and volume alone
     determines the weights — exactly matching Flavor Blend.
     """
+    ds = resolve(dataset)
     total_ml = recipe_total_ml(recipe)
     ingredient_data = []
 
     # Collect ingredient vectors and volumes
     for c in recipe["components"]:
-        fv = get_flavor_vector(c["ingredient"])
+        fv = get_flavor_vector(c["ingredient"], dataset)
         if c["ml"] is not None and total_ml > 0:
             ml_weight = c["ml"] / total_ml
         else:
-            ml_weight = 0.05  # seasoning
+            ml_weight = SEASONING_WEIGHT
         ingredient_data.append((fv, ml_weight))
 
     # Add garnishes with small weight
     for g in recipe.get("garnish", []):
-        fv = get_flavor_vector(g)
-        ingredient_data.append((fv, 0.03))
+        fv = get_flavor_vector(g, dataset)
+        ingredient_data.append((fv, GARNISH_WEIGHT))
 
     if not ingredient_data:
-        return np.zeros(len(FLAVOR_DIMS))
+        return np.zeros(len(ds.flavor_dims), dtype=ds.precision)
 
     # Compute intensities (L2 norm of flavor vectors)
     flavor_vecs = np.array([d[0] for d in ingredient_data])
-    ml_weights = np.array([d[1] for d in ingredient_data])
+    ml_weights = np.array([d[1] for d in ingredient_data], dtype=ds.precision)
     intensities = np.linalg.norm(flavor_vecs, axis=1)
 
     # Step 1: softmax over intensities alone (the "boost" factor)
@@ -143,7 +144,7 @@ def softmax_perceptual_vector(recipe: dict, tau: float = 1.0) -> np.ndarray:
         weights /= weight_sum
 
     # Compute weighted average of flavor vectors
-    result = np.zeros(len(FLAVOR_DIMS))
+    result = np.zeros(len(ds.flavor_dims), dtype=ds.precision)
     for i, (fv, _) in enumerate(ingredient_data):
         result += weights[i] * fv
 
@@ -224,23 +225,70 @@ def cocktail_family(recipe: dict) -> str | None:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Main: Generate embeddings across tau range with stabilization
+# UMAP with precomputed neighbours
 # ─────────────────────────────────────────────────────────────────────────────
 
-def main():
-    # Load recipes and sort by name
-    recipe_names = sorted(RECIPES.keys())
-    recipes = {name: RECIPES[name] for name in recipe_names}
+N_NEIGHBORS = 10
 
-    print(f"Loaded {len(recipes)} recipes")
 
-    # Define tau range - we'll use log spacing for better coverage
-    # tau_values = [0.1, 0.2, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0]
-    # Actually, let's make it finer for smooth animation
-    tau_values = np.logspace(-1, 2.5, 25)  # from 0.1 to ~316, 25 steps
-    tau_values = np.round(tau_values, 3).tolist()
+def fit_umap(vectors: np.ndarray, init: np.ndarray | str = "spectral",
+             seed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    UMAP layout of `vectors` on a kNN graph from neighbors.umap_knn (cached
+    by matrix hash; seeded from the neighbouring τ frame's graph when given).
+    Returns (embedding, knn indices) so the next frame can reuse the graph.
+    """
+    knn = umap_knn(vectors, N_NEIGHBORS, metric="cosine", seed=seed)
+    reducer = umap.UMAP(
+        n_neighbors=N_NEIGHBORS,
+        n_components=2,
+        metric="cosine",
+        min_dist=0.1,
+        random_state=42,
+        init=init,
+        precomputed_knn=knn,
+    )
+    with warnings.catch_warnings():
+        # No NNDescent search index comes with our graph; we never call transform()
+        warnings.filterwarnings("ignore", message=".*knn_search_index.*")
+        return reducer.fit_transform(vectors), knn[0]
 
-    print(f"Tau values: {tau_values}")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Tau grid
+# ─────────────────────────────────────────────────────────────────────────────
+
+TAU_MIN, TAU_MAX = 0.1, 10 ** 2.5
+
+
+def tau_grid(recipes: dict, steps: int = 25, mode: str = "uniform") -> list[float]:
+    """
+    τ values from 0.1 to ~316. "uniform" is log-spaced; "adaptive" spends the
+    same number of frames where the high-dimensional kNN graph actually
+    changes (the low-τ breakpoints) instead of on the flat high-τ tail.
+    """
+    if mode == "uniform":
+        return np.round(np.logspace(np.log10(TAU_MIN), np.log10(TAU_MAX), steps), 3).tolist()
+    names = list(recipes)
+    values, changes = adaptive_grid(
+        lambda tau: np.array([softmax_perceptual_vector(recipes[n], tau=tau) for n in names]),
+        TAU_MIN, TAU_MAX, steps, log=True, decimals=3,
+    )
+    print(f"Adaptive τ grid: kNN change per step {min(changes):.3f}–{max(changes):.3f}")
+    return values
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main: Generate embeddings across tau range with stabilization
+# ─────────────────────────────────────────────────────────────────────────────
+
+def tau_strategy(recipes: dict, tau_values: list[float]) -> dict:
+    """
+    Stabilized UMAP embeddings for every τ: the central τ is fitted cold, then
+    each τ outward is warm-started from its neighbour. Returns the
+    strategies["tau"] entry, keyed by str(τ).
+    """
+    recipe_names = list(recipes)
 
     # Choose central tau for initial embedding
     central_tau_idx = len(tau_values) // 2
@@ -257,23 +305,17 @@ def main():
 
     # Compute initial UMAP embedding at central tau
     print(f"Computing initial UMAP embedding at tau = {central_tau}...")
-    reducer = umap.UMAP(
-        n_neighbors=10,
-        n_components=2,
-        metric="cosine",
-        min_dist=0.1,
-        random_state=42,
-    )
-    embedding_central = reducer.fit_transform(vectors_central)
+    embedding_central, graph_central = fit_umap(vectors_central)
 
     # Store embeddings
     embeddings_by_tau = {
         central_tau: embedding_central.tolist()
     }
+    vectors_by_tau = {central_tau: vectors_central}
 
     # Work outward from center in both directions
     # First, go downward (decreasing tau)
-    prev_embedding = embedding_central
+    prev_embedding, prev_graph = embedding_central, graph_central
     for i in range(central_tau_idx - 1, -1, -1):
         tau = tau_values[i]
         print(f"Computing embedding for tau = {tau} (using previous as init)...")
@@ -284,21 +326,14 @@ def main():
             for n in recipe_names
         ])
 
-        # Use previous embedding as initialization
-        reducer = umap.UMAP(
-            n_neighbors=10,
-            n_components=2,
-            metric="cosine",
-            min_dist=0.1,
-            random_state=42,
-            init=prev_embedding,  # Key: use previous positions
-        )
-        embedding = reducer.fit_transform(vectors)
+        # Use previous embedding as initialization and its kNN graph as search seed
+        embedding, prev_graph = fit_umap(vectors, init=prev_embedding, seed=prev_graph)
         embeddings_by_tau[tau] = embedding.tolist()
+        vectors_by_tau[tau] = vectors
         prev_embedding = embedding
 
     # Then go upward (increasing tau)
-    prev_embedding = embedding_central
+    prev_embedding, prev_graph = embedding_central, graph_central
     for i in range(central_tau_idx + 1, len(tau_values)):
         tau = tau_values[i]
         print(f"Computing embedding for tau = {tau} (using previous as init)...")
@@ -309,30 +344,56 @@ def main():
             for n in recipe_names
         ])
 
-        # Use previous embedding as initialization
-        reducer = umap.UMAP(
-            n_neighbors=10,
-            n_components=2,
-            metric="cosine",
-            min_dist=0.1,
-            random_state=42,
-            init=prev_embedding,  # Key: use previous positions
-        )
-        embedding = reducer.fit_transform(vectors)
+        # Use previous embedding as initialization and its kNN graph as search seed
+        embedding, prev_graph = fit_umap(vectors, init=prev_embedding, seed=prev_graph)
         embeddings_by_tau[tau] = embedding.tolist()
+        vectors_by_tau[tau] = vectors
         prev_embedding = embedding
 
+    # Build the tau-parameterized embeddings, with layout quality and the
+    # displacement from the previous τ frame
+    sorted_taus = sorted(embeddings_by_tau.keys())
+    steps = np.sqrt((frame_steps([embeddings_by_tau[t] for t in sorted_taus]) ** 2).mean(axis=1))
+    steps = np.concatenate([[0.0], steps])
+    tau_embeddings = {}
+    for tau, step in zip(sorted_taus, steps):
+        embedding = embeddings_by_tau[tau]
+        tau_embeddings[str(tau)] = {
+            "description": f"Softmax perceptual with τ={tau}",
+            "embedding": {
+                name: {"x": float(embedding[i][0]), "y": float(embedding[i][1])}
+                for i, name in enumerate(recipe_names)
+            },
+            "quality": {
+                **layout_quality(vectors_by_tau[tau], np.array(embedding)),
+                "displacement": round(float(step), 4),
+            },
+        }
+
+    return tau_embeddings
+
+
+def main(grid: str = "uniform", steps: int = 25, dedup: bool = False):
+    # Load recipes and sort by name
+    recipe_names = sorted(RECIPES.keys())
+    if dedup:
+        recipe_names, duplicates = collapse(recipe_names, find_duplicates(recipe_names))
+        print(f"Collapsed {len(duplicates)} near-duplicates")
+    recipes = {name: RECIPES[name] for name in recipe_names}
+
+    print(f"Loaded {len(recipes)} recipes")
+
+    # Define tau range - log spacing (or adaptive) from 0.1 to ~316
+    tau_values = tau_grid(recipes, steps, grid)
+
+    print(f"Tau values: {tau_values}")
+
+    tau_embeddings = tau_strategy(recipes, tau_values)
+
     # Also compute original BLEND strategy for comparison
     print("Computing BLEND embeddings for comparison...")
     blend_vecs = np.array([blend_vector(recipes[n]) for n in recipe_names])
-    reducer_blend = umap.UMAP(
-        n_neighbors=10,
-        n_components=2,
-        metric="cosine",
-        min_dist=0.1,
-        random_state=42,
-    )
-    blend_embedding = reducer_blend.fit_transform(blend_vecs)
+    blend_embedding, _ = fit_umap(blend_vecs)
 
     # Build output structure
     print("Building output JSON...")
@@ -348,7 +409,7 @@ def main():
             "flavor_profile": {
                 dim: sum(
                     INGREDIENTS[c["ingredient"]]["flavor"][dim] *
-                    (c["ml"] / recipe_total_ml(recipe) if c["ml"] else 0.05)
+                    (c["ml"] / recipe_total_ml(recipe) if c["ml"] else SEASONING_WEIGHT)
                     for c in recipe["components"]
                     if c["ingredient"] in INGREDIENTS
                 ) for dim in FLAVOR_DIMS
@@ -361,18 +422,6 @@ def main():
         with open(OUTPUT, "r") as f:
             existing_data = json.load(f)
 
-    # Build the tau-parameterized embeddings
-    tau_embeddings = {}
-    for tau in sorted(embeddings_by_tau.keys()):
-        embedding = embeddings_by_tau[tau]
-        tau_embeddings[str(tau)] = {
-            "description": f"Softmax perceptual with τ={tau}",
-            "embedding": {
-                name: {"x": float(embedding[i][0]), "y": float(embedding[i][1])}
-                for i, name in enumerate(recipe_names)
-            }
-        }
-
     # Preserve existing strategies and add tau variations
     output = {
         "recipes": existing_data.get("recipes", recipe_data),
@@ -384,12 +433,23 @@ def main():
 
     # Write output
     print(f"Writing to {OUTPUT}...")
-    with open(OUTPUT, "w") as f:
-        json.dump(output, f, indent=2)
+    write_json(OUTPUT, output)
 
     print(f"Successfully wrote embeddings for {len(recipes)} recipes")
     print(f"Generated {len(tau_values)} tau variations with spatial continuity")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build τ embeddings into data/embeddings.json")
+    parser.add_argument("--tau-grid", choices=("uniform", "adaptive"), default="uniform",
+                        help="log-spaced τ, or denser where kNN structure changes")
+    parser.add_argument("--tau-steps", type=int, default=25,
+                        help="number of τ frames (default 25)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="collapse near-duplicate recipes (dedup.py) before UMAP")
+    args = parser.parse_args()
+    if args.tau_steps < 2:
+        parser.error("--tau-steps must be at least 2")
+    main(args.tau_grid, args.tau_steps, args.dedup)
\ No newline at end of file
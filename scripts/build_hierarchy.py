@@ -0,0 +1,83 @@
+"""
+scripts/build_hierarchy.py
+===========================
+Hierarchical clustering of the cocktails directly on high-dimensional
+distances, written into data/embeddings.json as a dendrogram plus flat cuts.
+
+Run with:
+    .venv/bin/python scripts/build_hierarchy.py                       # recipe_distance
+    .venv/bin/python scripts/build_hierarchy.py --strategy perceptual --method ward
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from clustering import LINKAGE_METHODS, hierarchy_entry, linkage
+from distance_store import DistanceStore, cosine_features, open_or_compute
+from loaders import RECIPES, write_json
+from utils import recipe_feature_arrays
+
+DATA = Path(__file__).parent.parent / "data"
+OUTPUT = DATA / "embeddings.json"
+
+STRATEGIES = ("recipe_distance", "blend", "role_slot", "perceptual")
+
+
+def distance_store(strategy: str, recipe_names: list[str]) -> DistanceStore:
+    """Cached distance store for `strategy` (cosine for vector strategies)."""
+    if strategy == "recipe_distance":
+        return open_or_compute("recipe_distance", recipe_names,
+                               recipe_feature_arrays(recipe_names),
+                               params={"alpha": 0.5, "beta": 0.5})
+
+    import build_embeddings as be
+    vector_fn = {
+        "blend": be.blend_vector,
+        "role_slot": be.role_slot_vector,
+        "perceptual": be.perceptual_vector,
+    }[strategy]
+    vectors = np.array([vector_fn(RECIPES[n]) for n in recipe_names])
+    return open_or_compute("cosine", recipe_names, cosine_features(vectors), strategy=strategy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--strategy", choices=STRATEGIES, default="recipe_distance")
+    parser.add_argument("--method", choices=LINKAGE_METHODS, default="average")
+    parser.add_argument("--cuts", type=int, nargs="+", default=[4, 6, 8, 12])
+    args = parser.parse_args()
+
+    recipe_names = list(RECIPES.keys())
+    print(f"Clustering {len(recipe_names)} recipes on {args.strategy} ({args.method} linkage) …")
+
+    store = distance_store(args.strategy, recipe_names)
+    # condensed() is the cached memmap itself, so let linkage take its own
+    # (float32) working copy rather than overwrite it
+    Z = linkage(store.condensed(), method=args.method)
+    entry = hierarchy_entry(recipe_names, Z, args.method, tuple(args.cuts), source=args.strategy)
+
+    existing = {}
+    if OUTPUT.exists():
+        with open(OUTPUT) as f:
+            existing = json.load(f)
+    existing.setdefault("strategies", {})
+    key = "hierarchy" if args.strategy == "recipe_distance" else f"hierarchy_{args.strategy}"
+    existing["strategies"][key] = entry
+
+    write_json(OUTPUT, existing)
+
+    print(f"Wrote strategies.{key} to {OUTPUT}")
+    for k, labels in entry["cuts"].items():
+        sizes = np.bincount(list(labels.values()))
+        print(f"  {k:>3s} clusters: sizes {sorted(sizes.tolist(), reverse=True)}")
+
+
+if __name__ == "__main__":
+    main()
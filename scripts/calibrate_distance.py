@@ -0,0 +1,70 @@
+"""
+scripts/calibrate_distance.py
+==============================
+Fit recipe_distance's α/β, structural penalties and role grouping to the
+closeness constraints in data/distance_constraints.jsonl (format documented
+in calibration.py), and write data/distance_calibration.json.
+
+Run with:
+    .venv/bin/python scripts/calibrate_distance.py
+    .venv/bin/python scripts/calibrate_distance.py --grid-steps 8 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from calibration import calibrate, load_constraints, violations
+from loaders import RECIPES, write_json
+
+DATA = Path(__file__).parent.parent / "data"
+CONSTRAINTS = DATA / "distance_constraints.jsonl"
+OUTPUT = DATA / "distance_calibration.json"
+
+
+def _describe(c: dict) -> str:
+    if "anchor" in c:
+        return f"{c['anchor']}: {c['closer']} closer than {c['farther']}"
+    if "closer" in c:
+        return f"{'–'.join(c['closer'])} closer than {'–'.join(c['farther'])}"
+    bound = f"≤ {c['max']}" if "max" in c else f"≥ {c['min']}"
+    return f"{'–'.join(c['pair'])} {bound}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--constraints", type=Path, default=CONSTRAINTS)
+    parser.add_argument("--grid-steps", type=int, default=6, help="grid points per parameter")
+    parser.add_argument("--starts", type=int, default=8, help="Nelder-Mead starts per grouping")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    recipe_names = list(RECIPES.keys())
+    constraints = load_constraints(args.constraints, recipe_names)
+    print(f"Calibrating against {len(constraints['lines'])} constraints "
+          f"({len(constraints['pairs'])} recipe pairs) …")
+
+    start = time.perf_counter()
+    result = calibrate(constraints, recipe_names, args.grid_steps, args.starts, workers=args.workers)
+    print(f"  {result['grid_points']} grid points + refinement in {time.perf_counter() - start:.1f}s")
+
+    for label in ("defaults", "best"):
+        r = result[label]
+        missed = violations(constraints, recipe_names, r["grouping"], r["params"])
+        r["violations"] = missed
+        params = ", ".join(f"{k}={v:g}" for k, v in r["params"].items())
+        print(f"\n{label}: {r['satisfaction']:.1%} satisfied ({r['grouping']} roles; {params})")
+        for c in missed:
+            print(f"  ✗ {_describe(c)}  (short by {-c['slack']:.4f})")
+
+    write_json(OUTPUT, result)
+    print(f"\nWrote {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
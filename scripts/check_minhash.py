@@ -0,0 +1,75 @@
+"""
+scripts/check_minhash.py
+========================
+Check that dedup.minhash signatures estimate the true token Jaccard
+similarity of every recipe pair on the shipped data, and exit 1 if they
+do not.
+
+An agreement rate over P independent permutations has standard error
+√(s(1 - s) / P) ≤ 0.5 / √P, so at every tested P:
+
+  rms error     ≤ 0.5 / √P          over all pairs
+  max error     ≤ 5 × 0.5 / √P      for any single pair
+
+Hashes that are not close to independent permutations fail the second
+check at high P: their error stops shrinking as permutations are added.
+
+Run with:
+    .venv/bin/python scripts/check_minhash.py
+    .venv/bin/python scripts/check_minhash.py --perms 128 512 2048
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path so we can import loaders/dedup
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dedup import NUM_PERM, minhash, recipe_tokens
+from loaders import DEFAULT
+
+MAX_SIGMAS = 5.0
+
+
+def true_jaccard(token_sets: list[set[str]], i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Exact |A ∩ B| / |A ∪ B| for the pairs (i[k], j[k])."""
+    return np.array([len(token_sets[a] & token_sets[b]) / (len(token_sets[a] | token_sets[b]) or 1)
+                     for a, b in zip(i.tolist(), j.tolist())])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--perms", type=int, nargs="+", default=[NUM_PERM, 1024],
+                        help="signature lengths to test")
+    args = parser.parse_args()
+
+    token_sets = [recipe_tokens(recipe) for recipe in DEFAULT.recipes.values()]
+    i, j = np.triu_indices(len(token_sets), k=1)
+    exact = true_jaccard(token_sets, i, j)
+    print(f"MinHash vs exact token Jaccard over {len(exact)} recipe pairs\n")
+    print(f"  {'perms':>6s} {'bias':>8s} {'rms':>7s} {'max':>7s} {'bound':>7s}")
+
+    failed = []
+    for perms in args.perms:
+        sig = minhash(token_sets, perms)
+        error = (sig[i] == sig[j]).mean(axis=1) - exact
+        bound = 0.5 / np.sqrt(perms)
+        rms, worst = float(np.sqrt((error ** 2).mean())), float(np.abs(error).max())
+        ok = rms <= bound and worst <= MAX_SIGMAS * bound
+        print(f"  {perms:6d} {error.mean():+8.4f} {rms:7.4f} {worst:7.4f} {bound:7.4f}  "
+              f"{'ok' if ok else 'FAIL'}")
+        if not ok:
+            failed.append(perms)
+
+    print(f"\nBounds: rms ≤ 0.5/√P, max ≤ {MAX_SIGMAS:g} × 0.5/√P")
+    if failed:
+        print(f"FAILED at {', '.join(map(str, failed))} permutations")
+        sys.exit(1)
+    print("Estimates track the exact Jaccard.")
+
+
+if __name__ == "__main__":
+    main()
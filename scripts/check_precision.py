@@ -0,0 +1,164 @@
+"""
+scripts/check_precision.py
+==========================
+Check the float32 computation mode (Dataset precision "float32", or
+COCKTAIL_PRECISION=float32) against the float64 reference on the shipped
+data, and exit 1 if any check fails.
+
+For every strategy space — each vectorize strategy at its default
+parameters plus a few α / τ values, cooccurrence and recipe_distance — the
+float32 run must:
+
+  stay float32        vectors, distance blocks and kNN distances keep the
+                      dtype (no silent upcast halfway through)
+  vectors             max |v32 - v64| ≤ VECTOR_TOL · max |v64|
+  distances           max |d32 - d64| ≤ DISTANCE_TOL over every pair
+  neighbours          every float32 neighbour of a recipe lies within
+                      DISTANCE_TOL of its float64 k-th neighbour distance —
+                      lists may only reorder across near-ties
+
+Flavor scores are hand-set to one decimal, so 1e-5 on distances in [0, 2]
+is far below anything that changes a neighbour or a layout.
+
+Run with:
+    .venv/bin/python scripts/check_precision.py
+    .venv/bin/python scripts/check_precision.py --k 15
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cooccurrence import cooccurrence_vectors
+from distance_store import cosine_features, feature_distances
+from loaders import DEFAULT
+from neighbors import knn
+from utils import recipe_feature_arrays
+
+VECTOR_TOL = 1e-5
+DISTANCE_TOL = 1e-5
+SPACES = [
+    ("blend", {}), ("blend_struct", {"alpha": 0.5}), ("blend_struct", {"alpha": 0.9}),
+    ("role_slot", {}), ("perceptual", {}),
+    ("tau", {"tau": 0.25}), ("tau", {"tau": 1.0}), ("tau", {"tau": 4.0}), ("cooccurrence", {}),
+    ("recipe_distance", {"alpha": 0.5, "beta": 0.5}),
+]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# One space
+# ─────────────────────────────────────────────────────────────────────────────
+
+def space(dataset, strategy: str, params: dict) -> tuple[str, dict, dict, np.ndarray | None]:
+    """(kind, features, distance params, vectors or None) in the dataset's precision."""
+    if strategy == "recipe_distance":
+        return "recipe_distance", recipe_feature_arrays(list(dataset.recipes), dataset=dataset), \
+            params, None
+    if strategy == "cooccurrence":
+        vectors = cooccurrence_vectors(dataset=dataset)
+    else:
+        vectors = dataset.strategy_vectors(strategy, **params)
+    return "cosine", cosine_features(vectors), {}, vectors
+
+
+def top_k(kind: str, features: dict, params: dict, k: int, vectors: np.ndarray | None,
+          block: int) -> np.ndarray:
+    """Neighbour indices: neighbors.knn for vectors, blocked top-k for recipe_distance."""
+    if vectors is not None:
+        return knn(vectors, k=k)[0]
+    n = len(features["flavor"])
+    out = np.empty((n, k), dtype=np.int64)
+    for i0 in range(0, n, block):
+        rows = np.arange(i0, min(i0 + block, n))
+        d = feature_distances(kind, {f: v[rows] for f, v in features.items()}, features, params)
+        d[np.arange(len(rows)), rows] = np.inf
+        top = np.argpartition(d, k - 1, axis=1)[:, :k]
+        out[rows] = np.take_along_axis(top, np.argsort(np.take_along_axis(d, top, axis=1),
+                                                       axis=1, kind="stable"), axis=1)
+    return out
+
+
+def compare(strategy: str, params: dict, k: int, block: int) -> dict:
+    """Float32 vs float64 errors and neighbour agreement for one strategy space."""
+    ref = DEFAULT.with_precision("float64")
+    low = DEFAULT.with_precision("float32")
+    kind, f64, p64, v64 = space(ref, strategy, params)
+    _, f32, p32, v32 = space(low, strategy, params)
+    n = len(ref.recipes)
+    k = min(k, n - 1)
+
+    dtypes = {f"features.{f}": v.dtype for f, v in f32.items() if v.dtype.kind == "f"}
+    vector_err = None
+    if v64 is not None:
+        dtypes["vectors"] = v32.dtype
+        scale = np.abs(v64).max() or 1.0
+        vector_err = float(np.abs(v32 - v64).max() / scale)
+
+    nn64 = top_k(kind, f64, p64, k, v64, block)
+    nn32 = top_k(kind, f32, p32, k, v32, block)
+    if v32 is not None:
+        dtypes["knn"] = knn(v32, k=k)[1].dtype
+
+    distance_err, outside, exact = 0.0, 0, 0
+    for i0 in range(0, n, block):
+        rows = np.arange(i0, min(i0 + block, n))
+        d64 = feature_distances(kind, {f: v[rows] for f, v in f64.items()}, f64, p64)
+        d32 = feature_distances(kind, {f: v[rows] for f, v in f32.items()}, f32, p32)
+        dtypes["distances"] = d32.dtype
+        distance_err = max(distance_err, float(np.abs(d32.astype(np.float64) - d64).max()))
+        d64[np.arange(len(rows)), rows] = np.inf
+        kth = np.take_along_axis(d64, nn64[rows], axis=1).max(axis=1)
+        got = np.take_along_axis(d64, nn32[rows], axis=1)
+        outside += int((got > kth[:, None] + DISTANCE_TOL).sum())
+        exact += int((np.sort(nn32[rows], axis=1) == np.sort(nn64[rows], axis=1)).all(axis=1).sum())
+
+    upcast = sorted(name for name, dtype in dtypes.items() if dtype != np.float32)
+    return {
+        "space": strategy + "".join(f" {key}={value:g}" for key, value in params.items()),
+        "vector_err": vector_err,
+        "distance_err": distance_err,
+        "same_lists": exact / n,
+        "outside": outside,
+        "bytes": sum(v.nbytes for v in f32.values()),
+        "bytes64": sum(v.nbytes for v in f64.values()),
+        "upcast": upcast,
+        "ok": (not upcast and (vector_err or 0.0) <= VECTOR_TOL and distance_err <= DISTANCE_TOL
+               and outside == 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--k", type=int, default=10, help="neighbourhood size")
+    parser.add_argument("--block", type=int, default=1024, help="rows per distance block")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = [compare(strategy, params, args.k, args.block) for strategy, params in SPACES]
+    print(f"float32 vs float64 on {len(DEFAULT.recipes)} recipes, k={args.k} "
+          f"({time.perf_counter() - start:.1f}s)\n")
+    print(f"  {'space':36s} {'vector':>9s} {'distance':>9s} {'same kNN':>9s} {'outside':>8s} "
+          f"{'memory':>7s}")
+    for r in results:
+        flag = "ok" if r["ok"] else "FAIL" + (f" (upcast: {', '.join(r['upcast'])})" if r["upcast"] else "")
+        vector = "-" if r["vector_err"] is None else f"{r['vector_err']:.2e}"
+        print(f"  {r['space']:36s} {vector:>9s} {r['distance_err']:9.2e} "
+              f"{r['same_lists']:9.1%} {r['outside']:8d} {r['bytes'] / r['bytes64']:7.0%}  {flag}")
+    print(f"\nTolerances: vectors ≤ {VECTOR_TOL:g} × max |v|, distances ≤ {DISTANCE_TOL:g}, "
+          f"no neighbour beyond the float64 k-th distance + {DISTANCE_TOL:g}")
+
+    failed = [r["space"] for r in results if not r["ok"]]
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print("All spaces within tolerance.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+scripts/design_recipe.py
+=========================
+Rework a recipe from recipes.json towards a target flavor: another recipe, a
+point between two recipes, or explicit flavor-dimension values.
+
+Run with:
+    .venv/bin/python scripts/design_recipe.py negroni --between negroni last_word 0.5
+    .venv/bin/python scripts/design_recipe.py daiquiri --like jungle_bird --strategy perceptual
+    .venv/bin/python scripts/design_recipe.py manhattan --set bitter=0.7 sweet=0.3 --lock rye_whiskey
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from designer import DESIGN_STRATEGIES, design, target_vector
+
+
+def _flavor(values: list[str]) -> dict[str, float]:
+    out = {}
+    for item in values:
+        dim, sep, value = item.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"expected dim=value, got {item!r}")
+        out[dim] = float(value)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("template", help="recipe to start from")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--like", metavar="RECIPE", help="aim at another recipe")
+    target.add_argument("--between", nargs=3, metavar=("A", "B", "T"),
+                        help="aim at (1 - T)·A + T·B")
+    target.add_argument("--set", nargs="+", metavar="DIM=VALUE",
+                        help="aim at the template's profile with these dims replaced")
+    parser.add_argument("--strategy", choices=DESIGN_STRATEGIES, default="blend")
+    parser.add_argument("--beam", type=int, default=32, help="beam width")
+    parser.add_argument("--steps", type=int, default=6, help="maximum edits")
+    parser.add_argument("--depth", type=int, default=1,
+                        help="taxonomy levels to climb for substitutes")
+    parser.add_argument("--lock", nargs="+", default=[], help="ingredients never swapped")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        if args.like:
+            goal = target_vector(args.strategy, recipe=args.like)
+        elif args.between:
+            a, b, t = args.between
+            goal = target_vector(args.strategy, between=(a, b, float(t)))
+        else:
+            goal = target_vector(args.strategy, flavor=_flavor(args.set), base=args.template)
+        start = time.perf_counter()
+        results = design(args.template, goal, args.strategy, args.beam, args.steps, args.top,
+                         args.depth, set(args.lock))
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    print(f"Searched in {time.perf_counter() - start:.2f}s\n")
+    for r in results:
+        print(f"{r['distance']:.4f}  ({r['edits']} edits)")
+        for c in r["components"]:
+            amount = f"{c['ml']:g} ml" if c["ml"] is not None else "dash"
+            print(f"    {amount:>8}  {c['ingredient']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,37 +8,210 @@ Run this whenever the spreadsheet changes:
 
 Requires openpyxl (already in .venv):
     .venv/bin/python scripts/export_ingredients.py
+
+Rows are streamed from the workbook and validated against the flavor-dimension
+header and taxonomy.json. The CSV is only rewritten when its content changes,
+and every export writes data/ingredients_diff.json describing what changed:
+
+    {
+      "changed_file": true,
+      "dims_changed": false,
+      "added":   ["new_ingredient", ...],
+      "removed": ["old_ingredient", ...],
+      "changed": {"campari": {"fields": ["abv"], "dims": ["bitter", "herbal"]}},
+      "affected_recipes": ["negroni", "boulevardier", ...],
+      "warnings": ["rye_whiskey: category 'rye' not in taxonomy under spirit|whiskey"]
+    }
+
+Builders can recompute only `affected_recipes` (all recipes when
+`dims_changed` is true).
 """
 
 import csv
+import io
+import json
+import os
+import sys
 from pathlib import Path
 
 import openpyxl
 
+# Add project root to path so we can import loaders
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
 DATA = Path(__file__).parent.parent / "data"
 XLSX = DATA / "ingredients.xlsx"
 CSV  = DATA / "ingredients.csv"
+DIFF = DATA / "ingredients_diff.json"
+
+FIXED_COLS = ["name", "category_path", "abv"]
+
+
+def _validate_header(header: tuple) -> list[str]:
+    header = [h for h in header if h is not None]
+    if header[:len(FIXED_COLS)] != FIXED_COLS:
+        raise ValueError(f"Header must start with {FIXED_COLS}, got {header[:len(FIXED_COLS)]}")
+    dims = header[len(FIXED_COLS):]
+    if not dims:
+        raise ValueError("Header has no flavor dimensions")
+    if len(set(dims)) != len(dims):
+        raise ValueError(f"Duplicate flavor dimensions in header: {dims}")
+    return header
+
+
+def _check_category(path: list[str], taxonomy: dict) -> str | None:
+    """Return a warning for paths that leave the taxonomy below the top level."""
+    node = taxonomy
+    for depth, part in enumerate(path):
+        if not isinstance(node, dict) or part not in node:
+            return f"category '{part}' not in taxonomy under {'|'.join(path[:depth]) or '<root>'}"
+        node = node[part]
+    return None
+
+
+def _validate_row(row: tuple, header: list[str], taxonomy: dict,
+                  line: int, warnings: list[str]) -> dict:
+    """Parse one data row into {name, category_path, abv, flavor}; raise on bad data."""
+    values = dict(zip(header, row))
+    name = values["name"]
+    if not name:
+        raise ValueError(f"Row {line}: missing name")
+
+    path = str(values["category_path"] or "").split("|")
+    if path[0] not in taxonomy:
+        raise ValueError(f"Row {line} ({name}): unknown top-level category '{path[0]}'")
+    warning = _check_category(path, taxonomy)
+    if warning:
+        warnings.append(f"{name}: {warning}")
+
+    numbers = {}
+    for col in header[2:]:
+        try:
+            numbers[col] = float(values[col])
+        except (TypeError, ValueError):
+            raise ValueError(f"Row {line} ({name}): {col}={values[col]!r} is not a number")
+        if not 0.0 <= numbers[col] <= 1.0:
+            raise ValueError(f"Row {line} ({name}): {col}={numbers[col]} outside [0, 1]")
+
+    return {
+        "category_path": path,
+        "abv": numbers.pop("abv"),
+        "flavor": numbers,
+    }
+
+
+def _read_existing() -> tuple[str, list[str], dict]:
+    """Current CSV as (text, header, {name -> parsed row}); empty if missing."""
+    if not CSV.exists():
+        return "", [], {}
+    with open(CSV, newline="") as f:
+        text = f.read()
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    rows = {
+        r["name"]: {
+            "category_path": r["category_path"].split("|"),
+            "abv": float(r["abv"]),
+            "flavor": {d: float(r[d]) for d in reader.fieldnames[len(FIXED_COLS):]},
+        }
+        for r in reader
+    }
+    return text, reader.fieldnames or [], rows
+
+
+def _affected_recipes(ingredients: set[str]) -> list[str]:
+    with open(DATA / "recipes.json") as f:
+        recipes = json.load(f)
+    return sorted(
+        name for name, recipe in recipes.items()
+        if any(c["ingredient"] in ingredients for c in recipe["components"])
+        or any(g in ingredients for g in recipe.get("garnish", []))
+    )
+
+
+def diff_ingredients(old: dict, new: dict) -> dict:
+    """Added / removed / changed ingredients, with the changed fields and dims."""
+    changed = {}
+    for name in old.keys() & new.keys():
+        a, b = old[name], new[name]
+        fields = [f for f in ("category_path", "abv") if a[f] != b[f]]
+        dims = [d for d in b["flavor"] if a["flavor"].get(d) != b["flavor"][d]]
+        if fields or dims:
+            changed[name] = {"fields": fields, "dims": dims}
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": dict(sorted(changed.items())),
+    }
 
 
 def export():
+    with open(DATA / "taxonomy.json") as f:
+        taxonomy = json.load(f)
+
     wb = openpyxl.load_workbook(XLSX, read_only=True, data_only=True)
     ws = wb.active
+    rows = ws.iter_rows(values_only=True)
 
-    rows = list(ws.iter_rows(values_only=True))
-    if not rows:
+    header = next(rows, None)
+    if header is None:
         raise ValueError(f"No data found in {XLSX}")
+    header = _validate_header(header)
+
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf)
+    writer.writerow(header)
+
+    new, warnings = {}, []
+    for line, row in enumerate(rows, start=2):
+        row = row[:len(header)]
+        # Drop fully empty rows (common Excel artifact)
+        if all(v is None for v in row):
+            continue
+        parsed = _validate_row(row, header, taxonomy, line, warnings)
+        if row[0] in new:
+            raise ValueError(f"Row {line}: duplicate ingredient '{row[0]}'")
+        new[row[0]] = parsed
+        writer.writerow(row)
+    wb.close()
+
+    old_text, old_header, old = _read_existing()
+    text = buf.getvalue()
+    changed_file = text != old_text
+    dims_changed = bool(old_header) and old_header != header
 
-    header, data_rows = rows[0], rows[1:]
+    diff = diff_ingredients(old, new)
+    touched = set(diff["added"]) | set(diff["removed"]) | set(diff["changed"])
+    if dims_changed:
+        with open(DATA / "recipes.json") as f:
+            affected = sorted(json.load(f))
+    else:
+        affected = _affected_recipes(touched) if touched else []
 
-    # Drop fully empty rows (common Excel artifact)
-    data_rows = [r for r in data_rows if any(v is not None for v in r)]
+    if changed_file:
+        tmp = CSV.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="") as f:
+            f.write(text)
+        os.replace(tmp, CSV)
 
-    with open(CSV, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(data_rows)
+    # Imported only now: loaders reads ingredients.csv on import, and the old
+    # one may be what this export is fixing
+    from loaders import write_json
+    write_json(DIFF, {
+        "changed_file": changed_file,
+        "dims_changed": dims_changed,
+        **diff,
+        "affected_recipes": affected,
+        "warnings": warnings,
+    })
 
-    print(f"Wrote {len(data_rows)} ingredients to {CSV}")
+    for w in warnings:
+        print(f"  warning: {w}")
+    if changed_file:
+        print(f"Wrote {len(new)} ingredients to {CSV}")
+        print(f"  +{len(diff['added'])} -{len(diff['removed'])} ~{len(diff['changed'])} "
+              f"ingredients, {len(affected)} recipes affected")
+    else:
+        print(f"{CSV} is up to date ({len(new)} ingredients); nothing to rebuild")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""
+scripts/layout_metrics.py
+==========================
+Score every 2D layout in data/embeddings.json against its strategy matrix
+(trustworthiness, continuity, kNN recall) and the α/τ sweeps' frame-to-frame
+displacement, and write data/layout_metrics.json for the benchmark
+dashboards:
+
+    {
+      "params": {"k": 10},
+      "layouts": {"blend": {"trustworthiness": 0.93, "continuity": 0.95, "knn_recall": 0.41, ...}, ...},
+      "sweeps": {"blend_struct": {"mean_step": 0.04, "max_step": 0.11, "steps": [...], "movers": [...]},
+                 "tau": {...}}
+    }
+
+The builders store the same per-layout numbers under each entry's
+"quality"; this pass recomputes them for any k and for files built before.
+
+Run with:
+    .venv/bin/python scripts/layout_metrics.py
+    .venv/bin/python scripts/layout_metrics.py --k 15
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loaders import write_json
+from metrics import frame_displacement, layout_quality
+from vectorize import compile_recipes, flavor_matrix, strategy_vectors
+
+DATA = Path(__file__).parent.parent / "data"
+EMBEDDINGS = DATA / "embeddings.json"
+OUTPUT = DATA / "layout_metrics.json"
+
+
+def layouts(strategies: dict):
+    """Yield (key, sweep, strategy, params, {name: point}) for every 2D layout."""
+    for name in ("blend", "role_slot", "perceptual"):
+        if name in strategies:
+            yield name, None, name, {}, strategies[name]["points"]
+    frames = sorted((e["alpha"], k) for k, e in strategies.items()
+                    if k.startswith("blend_struct_") and "alpha" in e)
+    for alpha, key in frames:
+        yield key, "blend_struct", "blend_struct", {"alpha": alpha}, strategies[key]["points"]
+    for tau in sorted(strategies.get("tau", {}), key=float):
+        yield (f"tau_{tau}", "tau", "tau", {"tau": float(tau)},
+               strategies["tau"][tau]["embedding"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--k", type=int, default=10, help="neighbourhood size")
+    args = parser.parse_args()
+
+    if not EMBEDDINGS.exists():
+        parser.error(f"{EMBEDDINGS} not found; run scripts/build_embeddings.py first")
+    with open(EMBEDDINGS) as f:
+        strategies = json.load(f)["strategies"]
+
+    start = time.perf_counter()
+    results, sweeps = {}, {}
+    flavor, compiled = None, {}
+    for key, sweep, strategy, params, points in layouts(strategies):
+        names = list(points)
+        if compiled.get("recipes") != names:
+            compiled = compile_recipes(names)
+            flavor = flavor_matrix(compiled["ingredients"])
+        layout = np.array([[points[n]["x"], points[n]["y"]] for n in names])
+        vectors = strategy_vectors(compiled, flavor, strategy, **params)
+        results[key] = layout_quality(vectors, layout, k=args.k)
+        if sweep:
+            sweeps.setdefault(sweep, {"names": names, "frames": []})["frames"].append(layout)
+
+    sweep_results = {
+        sweep: frame_displacement(s["frames"], s["names"]) for sweep, s in sweeps.items()
+    }
+    print(f"Scored {len(results)} layouts in {time.perf_counter() - start:.1f}s\n")
+
+    print(f"  {'layout':28s} {'trust':>7s} {'contin':>7s} {'recall':>7s}")
+    for key, q in results.items():
+        print(f"  {key:28s} {q['trustworthiness']:7.3f} {q['continuity']:7.3f} {q['knn_recall']:7.3f}")
+    for sweep, d in sweep_results.items():
+        print(f"\n  {sweep} sweep: mean step {d['mean_step']:.4f}, max step {d['max_step']:.4f}")
+
+    write_json(OUTPUT, {"params": {"k": args.k}, "layouts": results, "sweeps": sweep_results})
+    print(f"\nWrote {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+scripts/watch_embeddings.py
+============================
+Rebuild data/embeddings.json in a long-running process whenever the data
+files change, so edits show up in the viz without a cold start.
+
+UMAP is imported and numba compiles its kernels once, on the first build.
+After that the process polls data/recipes.json, data/ingredients.csv and
+data/taxonomy.json, reloads them in place (loaders.reload) and re-embeds only
+the strategies whose feature matrices actually changed. Unchanged strategies
+keep their layout; changed ones are warm-started from their previous layout
+when the recipe list is the same, so the map moves rather than reshuffles.
+The output is replaced atomically and other entries (e.g. hierarchy) are kept.
+
+Run with:
+    .venv/bin/python scripts/watch_embeddings.py
+    .venv/bin/python scripts/watch_embeddings.py --no-tau --interval 0.5
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path so we can import loaders/utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import loaders
+from cooccurrence import component_labels, cooccurrence_vectors, ingredient_embeddings
+from explain import dimension_labels
+from loaders import RECIPES, write_json
+from neighbors import matrix_hash
+
+import build_embeddings as be
+import build_embeddings_tau as bt
+
+DATA = Path(__file__).parent.parent / "data"
+OUTPUT = DATA / "embeddings.json"
+WATCHED = [DATA / "recipes.json", DATA / "ingredients.csv", DATA / "taxonomy.json"]
+
+
+def snapshot(paths: list[Path]) -> dict[Path, int | None]:
+    """Modification times (ns) of `paths`; None for files that are missing."""
+    return {p: p.stat().st_mtime_ns if p.exists() else None for p in paths}
+
+
+class Rebuilder:
+    """Holds the last build's matrix hashes and layouts between rebuilds."""
+
+    def __init__(self, sweep: str = "procrustes", alpha_steps: int = 21, n_jobs: int = 1,
+                 tau: bool = True, tau_steps: int = 25):
+        self.sweep = sweep
+        self.alpha_steps = alpha_steps
+        self.n_jobs = n_jobs
+        self.tau = tau
+        self.tau_steps = tau_steps
+        self.hashes: dict[str, tuple[list[str], str]] = {}
+        self.pending: dict[str, tuple[list[str], str]] = {}
+        self.layouts: dict[str, np.ndarray] = {}
+        self.entries: dict[str, dict] = {}
+
+    def _stale(self, key: str, names: list[str], matrix: np.ndarray) -> bool:
+        """
+        True if (names, matrix) differ from the last written build. The new
+        state is only recorded by write(), so a failed rebuild is retried.
+        """
+        state = (names, matrix_hash(matrix))
+        if self.hashes.get(key) == state:
+            return False
+        self.pending[key] = state
+        return True
+
+    def _init_for(self, key: str, names: list[str]) -> np.ndarray | str:
+        previous = self.hashes.get(key)
+        if key in self.layouts and previous and previous[0] == names:
+            return self.layouts[key]
+        return "spectral"
+
+    def rebuild(self) -> list[str]:
+        """Recompute changed strategies into self.entries; returns their names."""
+        names = list(RECIPES.keys())
+        rebuilt = []
+        self.pending = {}
+
+        for key, vector_fn in be.STRATEGY_VECTORS.items():
+            vectors = np.array([vector_fn(RECIPES[n]) for n in names])
+            init = self._init_for(key, names)
+            if not self._stale(key, names, vectors):
+                continue
+            layout = be.run_umap(vectors, init=init)
+            self.layouts[key] = layout
+            self.entries[key] = be.strategy_entry(be.STRATEGY_DESCRIPTIONS[key], names, layout,
+                                                  vectors, dimension_labels(key))
+            rebuilt.append(key)
+
+        # Co-occurrence embeddings are learned from the whole catalog, not per recipe
+        cooc_emb = ingredient_embeddings()
+        vectors = cooccurrence_vectors(names, embeddings=cooc_emb)
+        init = self._init_for("cooccurrence", names)
+        if self._stale("cooccurrence", names, vectors):
+            layout = be.run_umap(vectors, init=init)
+            self.layouts["cooccurrence"] = layout
+            self.entries["cooccurrence"] = be.strategy_entry(
+                be.STRATEGY_DESCRIPTIONS["cooccurrence"], names, layout, vectors,
+                component_labels(cooc_emb))
+            rebuilt.append("cooccurrence")
+
+        alpha_values = be.alpha_grid(names, self.alpha_steps)
+        datasets = be.blend_struct_datasets(names, alpha_values)
+        if self._stale("blend_struct", names, np.stack(datasets)):
+            self.entries["blend_struct_frames"] = be.blend_struct_entries(
+                names, alpha_values, datasets, self.sweep, self.n_jobs)
+            rebuilt.append("blend_struct")
+
+        if self.tau:
+            tau_names = sorted(names)
+            recipes = {n: RECIPES[n] for n in tau_names}
+            tau_values = bt.tau_grid(recipes, self.tau_steps)
+            tau_stack = np.stack([
+                [bt.softmax_perceptual_vector(recipes[n], tau=t) for n in tau_names]
+                for t in tau_values
+            ])
+            if self._stale("tau", tau_names, tau_stack):
+                self.entries["tau"] = bt.tau_strategy(recipes, tau_values)
+                rebuilt.append("tau")
+
+        self.entries["recipes"] = be.recipe_metadata(names)
+        return rebuilt
+
+    def write(self) -> None:
+        """Merge the current entries into embeddings.json and replace it atomically."""
+        existing = {}
+        if OUTPUT.exists():
+            with open(OUTPUT) as f:
+                existing = json.load(f)
+        # Drop entries this process owns (α frames may have been renamed)
+        strategies = {
+            k: v for k, v in existing.get("strategies", {}).items()
+            if not k.startswith("blend_struct") and k not in be.STRATEGY_VECTORS
+            and k not in ("cooccurrence", "tau")
+        }
+        frames = self.entries["blend_struct_frames"]
+        strategies.update({k: self.entries[k] for k in be.STRATEGY_VECTORS})
+        strategies["cooccurrence"] = self.entries["cooccurrence"]
+        strategies["blend_struct"] = be.default_blend_struct(frames)
+        strategies.update(frames)
+        if self.tau:
+            strategies["tau"] = self.entries["tau"]
+        elif "tau" in existing.get("strategies", {}):
+            strategies["tau"] = existing["strategies"]["tau"]
+        write_json(OUTPUT, {**existing, "strategies": strategies, "recipes": self.entries["recipes"]})
+        self.hashes.update(self.pending)
+        self.pending = {}
+
+
+def watch(rebuilder: Rebuilder, interval: float = 1.0) -> None:
+    seen = snapshot(WATCHED)
+    while True:
+        time.sleep(interval)
+        current = snapshot(WATCHED)
+        if current == seen:
+            continue
+        # Let the editor finish writing: wait until the files stop changing
+        while True:
+            time.sleep(interval)
+            settled = snapshot(WATCHED)
+            if settled == current:
+                break
+            current = settled
+        changed = [p.name for p in WATCHED if current[p] != seen[p]]
+        seen = current
+
+        print(f"\nChanged: {', '.join(changed)}")
+        start = time.perf_counter()
+        try:
+            loaders.reload()
+            rebuilt = rebuilder.rebuild()
+            rebuilder.write()
+        except (ValueError, KeyError) as e:
+            # Usually a half-finished edit; keep the last good output and wait
+            print(f"  rebuild failed: {e!r}; keeping previous {OUTPUT.name}")
+            continue
+        what = ", ".join(rebuilt) if rebuilt else "no strategy matrices changed"
+        print(f"  rebuilt {what} in {time.perf_counter() - start:.1f}s → {OUTPUT}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild embeddings.json when data files change")
+    parser.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds")
+    parser.add_argument("--sweep", choices=("aligned", "procrustes"), default="procrustes",
+                        help="α sweep mode (procrustes is much faster to refresh)")
+    parser.add_argument("--alpha-steps", type=int, default=21)
+    parser.add_argument("--jobs", type=int, default=1, help="processes for the procrustes sweep")
+    parser.add_argument("--tau-steps", type=int, default=25)
+    parser.add_argument("--no-tau", action="store_true", help="leave the τ strategy untouched")
+    args = parser.parse_args()
+
+    rebuilder = Rebuilder(args.sweep, args.alpha_steps, args.jobs,
+                          tau=not args.no_tau, tau_steps=args.tau_steps)
+    print("Initial build (imports UMAP and compiles numba kernels once) …")
+    start = time.perf_counter()
+    rebuilder.rebuild()
+    rebuilder.write()
+    print(f"  done in {time.perf_counter() - start:.1f}s; watching {', '.join(p.name for p in WATCHED)}")
+    try:
+        watch(rebuilder, args.interval)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+sensitivity.py
+==============
+Monte Carlo sensitivity of the recipe neighbourhoods to the hand-assigned
+ingredient flavor profiles.
+
+Many perturbed copies of the ingredient flavor matrix are drawn, every
+strategy's recipe vectors are recomputed for all of them at once
+(vectorize.strategy_vectors), and each copy's top-k cosine neighbours are
+compared with the unperturbed ones.
+
+  perturb               — noisy copies of a flavor matrix (per cell,
+                          per ingredient or per dimension)
+  batched_knn           — top-k cosine neighbours for a stack of vector sets
+  neighbor_stability    — per-recipe mean Jaccard of perturbed vs. base top-k
+  ingredient_influence  — how much perturbing one ingredient moves everyone's
+                          neighbours
+  sensitivity_report    — all of the above for several strategies
+"""
+
+import numpy as np
+
+from neighbors import knn
+from vectorize import strategy_vectors
+
+PERTURBATIONS = ("cell", "ingredient", "dimension")
+
+
+# ---------------------------------------------------------------------------
+# Perturbation
+# ---------------------------------------------------------------------------
+
+def perturb(flavor: np.ndarray, n_samples: int, sigma: float = 0.1, mode: str = "cell",
+            rows: np.ndarray | None = None, rng: np.random.Generator | None = None) -> np.ndarray:
+    """
+    `n_samples` noisy copies of an (ingredients, dims) flavor matrix, clipped
+    to [0, 1]:
+
+      cell       — independent additive N(0, sigma) noise on every value
+      ingredient — each ingredient's whole profile scaled by 1 + N(0, sigma)
+                   (is Campari more or less intense overall?)
+      dimension  — each flavor dimension scaled by 1 + N(0, sigma) for all
+                   ingredients (a systematic bias in how one dim was rated)
+
+    With `rows`, only those ingredients are perturbed.
+    """
+    if mode not in PERTURBATIONS:
+        raise ValueError(f"Unknown perturbation {mode!r}; expected one of {PERTURBATIONS}")
+    rng = rng or np.random.default_rng()
+    n_i, n_d = flavor.shape
+    if mode == "cell":
+        noisy = flavor + rng.normal(0.0, sigma, (n_samples, n_i, n_d))
+    elif mode == "ingredient":
+        noisy = flavor * (1.0 + rng.normal(0.0, sigma, (n_samples, n_i, 1)))
+    else:
+        noisy = flavor * (1.0 + rng.normal(0.0, sigma, (n_samples, 1, n_d)))
+    if rows is not None:
+        keep = np.ones(n_i, dtype=bool)
+        keep[rows] = False
+        noisy[:, keep] = flavor[keep]
+    return np.clip(noisy, 0.0, 1.0)
+
+
+# ---------------------------------------------------------------------------
+# Neighbour stability
+# ---------------------------------------------------------------------------
+
+def batched_knn(vectors: np.ndarray, k: int = 5, max_block_cells: int = 20_000_000) -> np.ndarray:
+    """Top-k cosine neighbour indices (S, R, k) for vector sets (S, R, d)."""
+    n_s, n_r, _ = vectors.shape
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    empty = norms[..., 0] == 0
+    out = np.empty((n_s, n_r, k), dtype=np.int64)
+    block = max(1, max_block_cells // (n_r * n_r))
+    diag = np.arange(n_r)
+    for s0 in range(0, n_s, block):
+        s1 = min(s0 + block, n_s)
+        d = 1.0 - unit[s0:s1] @ unit[s0:s1].transpose(0, 2, 1)
+        # Zero vectors have no direction: distance 1 to everything
+        d = np.where(empty[s0:s1, :, None] | empty[s0:s1, None, :], 1.0, d)
+        d[:, diag, diag] = np.inf
+        top = np.argpartition(d, k - 1, axis=-1)[..., :k]
+        order = np.argsort(np.take_along_axis(d, top, axis=-1), axis=-1, kind="stable")
+        out[s0:s1] = np.take_along_axis(top, order, axis=-1)
+    return out
+
+
+def neighbor_stability(base: np.ndarray, samples: np.ndarray) -> np.ndarray:
+    """
+    Per-recipe Jaccard overlap between base top-k (R, k) and each sample's
+    top-k (S, R, k); returns (S, R).
+    """
+    k = base.shape[1]
+    shared = (samples[..., :, None] == base[None, :, None, :]).any(axis=-1).sum(axis=-1)
+    return shared / (2 * k - shared)
+
+
+def ingredient_influence(compiled: dict, flavor: np.ndarray, strategy: str, base: np.ndarray,
+                         n_samples: int = 64, sigma: float = 0.1, k: int = 5,
+                         rng: np.random.Generator | None = None, **strategy_kw) -> np.ndarray:
+    """
+    For each ingredient, the mean neighbour-set change (1 - Jaccard) across
+    all recipes when only that ingredient's profile is perturbed (per-cell
+    noise). Ingredients no recipe uses have no influence and are skipped.
+    """
+    rng = rng or np.random.default_rng()
+    used = compiled["blend"][:, :-1].any(axis=0)
+    influence = np.zeros(len(compiled["ingredients"]))
+    for i in np.flatnonzero(used):
+        noisy = perturb(flavor, n_samples, sigma, "cell", rows=np.array([i]), rng=rng)
+        samples = batched_knn(strategy_vectors(compiled, noisy, strategy, **strategy_kw), k)
+        influence[i] = 1.0 - neighbor_stability(base, samples).mean()
+    return influence
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def sensitivity_report(compiled: dict, flavor: np.ndarray, strategies: list[str],
+                       n_samples: int = 1000, sigma: float = 0.1, mode: str = "cell",
+                       k: int = 5, influence_samples: int = 64, batch: int = 250,
+                       seed: int = 42, **strategy_kw) -> dict:
+    """
+    {strategy: {"stability": {recipe: mean Jaccard}, "influence": {ingredient: change}}}
+
+    Stability is the mean top-k Jaccard between perturbed and base neighbour
+    sets over `n_samples` draws (1 = neighbours never change). Samples are
+    drawn `batch` at a time to bound memory.
+    """
+    rng = np.random.default_rng(seed)
+    report = {}
+    for strategy in strategies:
+        base = knn(strategy_vectors(compiled, flavor, strategy, **strategy_kw), k=k)[0]
+        total = np.zeros(len(compiled["recipes"]))
+        for s0 in range(0, n_samples, batch):
+            noisy = perturb(flavor, min(batch, n_samples - s0), sigma, mode, rng=rng)
+            samples = batched_knn(strategy_vectors(compiled, noisy, strategy, **strategy_kw), k)
+            total += neighbor_stability(base, samples).sum(axis=0)
+        influence = ingredient_influence(compiled, flavor, strategy, base, influence_samples,
+                                         sigma, k, rng, **strategy_kw)
+        report[strategy] = {
+            "stability": dict(zip(compiled["recipes"], (total / n_samples).round(4).tolist())),
+            "influence": {
+                name: round(float(v), 4)
+                for name, v in sorted(zip(compiled["ingredients"], influence), key=lambda x: -x[1])
+                if v > 0
+            },
+        }
+    return report
@@ -0,0 +1,589 @@
+"""
+service.py
+==========
+Local asyncio HTTP query service. The catalog, the compiled recipes and each
+strategy's feature matrix are loaded once and kept in memory, so a question
+costs one block computation instead of a script run that reloads everything.
+
+    python service.py --port 8765
+    curl 'localhost:8765/neighbors?recipe=bijou&k=5&strategy=perceptual'
+
+  GET  /recipes                              — recipe names
+  GET  /neighbors?recipe=&k=&strategy=       — top-k neighbours
+  GET  /distances?recipe=&strategy=&to=a,b   — one distance row (all recipes, or `to`)
+  GET  /search?like=&k=&strategy=&final_abv=0.15,0.25&served=up
+                                             — attribute-filtered similarity
+  POST /example  {"recipe": {...}, "k": 5, "strategy": "recipe_distance"}
+                                             — neighbours of an unsaved recipe
+  GET  /metrics                              — per-endpoint latency, cache and batch stats
+  GET  /health
+
+Every distance endpoint takes strategy (recipe_distance or a vector
+strategy), alpha and beta in [0, 1] and tau ≥ 0. Concurrent /neighbors and /distances
+requests under the same strategy parameters are coalesced by RowBatcher into
+one (rows × n) block, computed off the event loop; successful responses are
+kept in an LRU ResponseCache.
+
+  QueryEngine    — in-memory strategy spaces and the synchronous queries
+  RowBatcher     — coalesces concurrent row requests into one block
+  ResponseCache  — LRU of encoded responses
+  Metrics        — per-endpoint counters and latency percentiles
+  QueryService   — the HTTP/1.1 server (stdlib asyncio, keep-alive)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from attributes import ATTRIBUTES, CATEGORICAL, AttributeIndex, recipe_attributes
+from distance_store import cosine_features, feature_distances
+from loaders import Dataset, resolve
+from utils import recipe_feature_arrays
+from vectorize import STRATEGIES as VECTOR_STRATEGIES, compile_recipes, strategy_vectors
+
+STRATEGIES = ("recipe_distance",) + VECTOR_STRATEGIES + ("cooccurrence",)
+DECIMALS = 6
+MAX_K = 200
+MAX_SPACES = 32
+MAX_BODY = 1 << 20
+_EXAMPLE = "__example__"
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+class QueryEngine:
+    """
+    One dataset's strategy spaces, built on first use (or by warm()):
+    (kind, features, params) for distance_store.feature_distances, keyed by
+    space_key(). The `max_spaces` most recently used spaces (and search
+    indexes) are kept, so clients sweeping α or τ cannot grow memory without
+    bound. Not thread-safe; QueryService runs it on a single worker thread.
+    """
+
+    def __init__(self, dataset: Dataset | None = None, max_spaces: int = MAX_SPACES):
+        self.dataset = resolve(dataset)
+        self.names = list(self.dataset.recipes)
+        self.position = {name: i for i, name in enumerate(self.names)}
+        self.max_spaces = max(1, max_spaces)
+        self._spaces: OrderedDict = OrderedDict()
+        self._indexes: OrderedDict = OrderedDict()
+        self._attributes = None
+        # recipe_feature_arrays numbers methods in encounter order
+        self._method_codes: dict[str, int] = {}
+        for name in self.names:
+            self._method_codes.setdefault(self.dataset.recipes[name]["method"],
+                                          len(self._method_codes))
+
+    @staticmethod
+    def space_key(strategy: str = "recipe_distance", alpha: float = 0.5, beta: float = 0.5,
+                  tau: float = 1.0) -> tuple:
+        """The strategy plus only the parameters it uses."""
+        if strategy == "recipe_distance":
+            return strategy, float(alpha), float(beta)
+        if strategy == "blend_struct":
+            return strategy, float(alpha)
+        if strategy == "tau":
+            return strategy, float(tau)
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+        return (strategy,)
+
+    def vectors(self, key: tuple) -> np.ndarray:
+        """(n, dims) vectors of a vector strategy space."""
+        strategy = key[0]
+        if strategy == "cooccurrence":
+            from cooccurrence import cooccurrence_vectors
+            return self.dataset.cached(key, lambda: cooccurrence_vectors(
+                embeddings=self.embeddings(), dataset=self.dataset))
+        if strategy == "blend_struct":
+            # Parameterised spaces stay out of the dataset cache; space() bounds them
+            return strategy_vectors(self.dataset.compiled(), self.dataset.flavor_matrix(),
+                                    strategy, alpha=key[1])
+        if strategy == "tau":
+            return strategy_vectors(self.dataset.compiled(), self.dataset.flavor_matrix(),
+                                    strategy, tau=key[1])
+        return self.dataset.strategy_vectors(strategy)
+
+    def embeddings(self) -> np.ndarray:
+        """Co-occurrence ingredient embeddings learned from the whole catalog."""
+        from cooccurrence import ingredient_embeddings
+        return self.dataset.cached("cooccurrence_embeddings",
+                                   lambda: ingredient_embeddings(dataset=self.dataset))
+
+    def _remember(self, store: OrderedDict, key: tuple, build):
+        """store[key] as the most recently used entry, built on a miss; evicts past max_spaces."""
+        if key in store:
+            store.move_to_end(key)
+            return store[key]
+        store[key] = value = build()
+        while len(store) > self.max_spaces:
+            store.popitem(last=False)
+        return value
+
+    def space(self, key: tuple) -> tuple[str, dict, dict]:
+        if key[0] == "recipe_distance":
+            features = self.dataset.cached(
+                "recipe_features", lambda: recipe_feature_arrays(self.names, dataset=self.dataset))
+            return self._remember(self._spaces, key, lambda: (
+                "recipe_distance", features, {"alpha": key[1], "beta": key[2]}))
+        return self._remember(self._spaces, key,
+                              lambda: ("cosine", cosine_features(self.vectors(key)), {}))
+
+    def warm(self, keys: list[tuple] | None = None) -> None:
+        """Build the default-parameter space of every strategy (or `keys`) now."""
+        for key in keys or [self.space_key(s) for s in STRATEGIES]:
+            self.space(key)
+
+    def index_of(self, name: str) -> int:
+        if name not in self.position:
+            raise ValueError(f"Unknown recipe {name!r}")
+        return self.position[name]
+
+    def rows(self, key: tuple, ids: np.ndarray) -> np.ndarray:
+        """(len(ids), n) distances from recipes `ids` to every recipe."""
+        kind, features, params = self.space(key)
+        return feature_distances(kind, {k: v[ids] for k, v in features.items()}, features, params)
+
+    def top_k(self, row: np.ndarray, k: int, exclude: int | None = None) -> list[dict]:
+        """The k smallest entries of a distance row, nearest first (ties by recipe order)."""
+        if exclude is not None:
+            row = row.copy()
+            row[exclude] = np.inf
+        k = min(k, len(row) - (exclude is not None))
+        if k < 1:
+            return []
+        top = np.argpartition(row, k - 1)[:k]
+        top = top[np.lexsort((top, row[top]))]
+        return [{"name": self.names[j], "distance": round(float(row[j]), DECIMALS)} for j in top]
+
+    def search(self, key: tuple, like: str, k: int, **filters) -> list[dict]:
+        """AttributeIndex.query over a vector strategy space."""
+        if key[0] == "recipe_distance":
+            raise ValueError("search needs a vector strategy")
+        if self._attributes is None:
+            self._attributes = recipe_attributes(self.dataset.compiled(), self.dataset)
+        index = self._remember(self._indexes, key, lambda: AttributeIndex(
+            self.names, self.vectors(key), self._attributes))
+        self.index_of(like)
+        return [{"name": name, "distance": d} for name, d in index.query(like, k=k, **filters)]
+
+    def example(self, recipe: dict, key: tuple, k: int) -> list[dict]:
+        """Neighbours of a recipe that is not in the catalog."""
+        from ingest import validate_recipe
+
+        problems = validate_recipe(recipe, self.dataset)
+        if problems:
+            raise ValueError("; ".join(problems))
+        ds = self.dataset
+        single = Dataset(ds.category_tree, ds.ingredients, {_EXAMPLE: recipe}, ds.flavor_dims,
+                         precision=ds.precision)
+        kind, features, params = self.space(key)
+        if kind == "recipe_distance":
+            query = recipe_feature_arrays([_EXAMPLE], dataset=single)
+            # Method codes must agree with the catalog's; an unseen method matches nothing
+            query["method"][:] = self._method_codes.get(recipe["method"], len(self._method_codes))
+        elif key[0] == "cooccurrence":
+            from cooccurrence import cooccurrence_vectors
+            query = cosine_features(cooccurrence_vectors([_EXAMPLE], embeddings=self.embeddings(),
+                                                         dataset=single))
+        else:
+            kw = {"alpha": key[1]} if key[0] == "blend_struct" else \
+                {"tau": key[1]} if key[0] == "tau" else {}
+            compiled = compile_recipes([_EXAMPLE], dataset=single)
+            query = cosine_features(strategy_vectors(compiled, ds.flavor_matrix(), key[0], **kw))
+        return self.top_k(feature_distances(kind, query, features, params)[0], k)
+
+
+# ---------------------------------------------------------------------------
+# Batching, caching, metrics
+# ---------------------------------------------------------------------------
+
+class RowBatcher:
+    """
+    Collects row requests per space key for up to `window` seconds (or
+    `max_batch` rows) and answers them all from one QueryEngine.rows block
+    computed on `executor`.
+    """
+
+    def __init__(self, engine: QueryEngine, executor: ThreadPoolExecutor,
+                 window: float = 0.002, max_batch: int = 256):
+        self.engine = engine
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[tuple, list] = {}
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    async def row(self, key: tuple, i: int) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((i, future))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: tuple) -> None:
+        pending = self._pending.pop(key, None)
+        if not pending:
+            return
+        ids = np.unique([i for i, _ in pending])
+        self.batches += 1
+        self.requests += len(pending)
+        self.rows += len(ids)
+        task = asyncio.get_running_loop().run_in_executor(self.executor, self.engine.rows, key, ids)
+
+        def deliver(task):
+            error = task.exception()
+            block = None if error else task.result()
+            for i, future in pending:
+                if future.done():
+                    continue
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(block[np.searchsorted(ids, i)])
+
+        task.add_done_callback(deliver)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "requests": self.requests, "rows": self.rows,
+                "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0.0}
+
+
+class ResponseCache:
+    """LRU of encoded response bodies keyed by (method, path, query, body)."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> bytes | None:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class Metrics:
+    """Request, error and cache-hit counts plus recent latencies per endpoint."""
+
+    def __init__(self, window: int = 4096):
+        self.window = window
+        self._endpoints: dict[str, dict] = {}
+
+    def record(self, endpoint: str, seconds: float, status: int, cached: bool) -> None:
+        stats = self._endpoints.setdefault(endpoint, {
+            "requests": 0, "errors": 0, "cache_hits": 0, "total": 0.0,
+            "latencies": deque(maxlen=self.window)})
+        stats["requests"] += 1
+        stats["errors"] += status >= 400
+        stats["cache_hits"] += cached
+        stats["total"] += seconds
+        stats["latencies"].append(seconds)
+
+    def snapshot(self) -> dict:
+        """Per endpoint: counts, mean and p50/p95/p99/max latency (ms, recent window)."""
+        out = {}
+        for endpoint, stats in sorted(self._endpoints.items()):
+            ms = np.array(stats["latencies"]) * 1000.0
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[endpoint] = {
+                "requests": stats["requests"], "errors": stats["errors"],
+                "cache_hits": stats["cache_hits"],
+                "mean_ms": round(stats["total"] * 1000.0 / stats["requests"], 3),
+                "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3),
+            }
+        return out
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def _int(query: dict, name: str, default: int, lo: int = 1, hi: int = MAX_K) -> int:
+    try:
+        value = int(query.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if not lo <= value <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}")
+    return value
+
+
+def _float(query: dict, name: str, default: float, lo: float = -math.inf,
+           hi: float = math.inf) -> float:
+    try:
+        value = float(query.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    if not lo <= value <= hi:
+        raise ValueError(f"{name} must be at least {lo:g}" if hi == math.inf
+                         else f"{name} must be between {lo:g} and {hi:g}")
+    return value
+
+
+def _required(query: dict, name: str) -> str:
+    if not query.get(name):
+        raise ValueError(f"missing parameter {name!r}")
+    return query[name]
+
+
+def _filters(query: dict) -> dict:
+    """final_abv=0.15,0.25 style ranges (either end may be empty) and served/method lists."""
+    filters = {}
+    for attribute in ATTRIBUTES:
+        if attribute in query:
+            lo, _, hi = query[attribute].partition(",")
+            try:
+                filters[attribute] = (float(lo) if lo else None, float(hi) if hi else None)
+            except ValueError:
+                raise ValueError(f"{attribute} must be lo,hi") from None
+    for attribute in CATEGORICAL:
+        if attribute in query:
+            filters[attribute] = query[attribute].split(",")
+    return filters
+
+
+class QueryService:
+    """The HTTP front end: routing, batching, caching and metrics around a QueryEngine."""
+
+    def __init__(self, engine: QueryEngine | None = None, host: str = "127.0.0.1",
+                 port: int = 8765, window: float = 0.002, max_batch: int = 256,
+                 cache_size: int = 1024):
+        self.engine = engine or QueryEngine()
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query")
+        self.batcher = RowBatcher(self.engine, self.executor, window, max_batch)
+        self.cache = ResponseCache(cache_size)
+        self.metrics = Metrics()
+        self.server: asyncio.Server | None = None
+        self.routes = {
+            ("GET", "/recipes"): self.recipes,
+            ("GET", "/neighbors"): self.neighbors,
+            ("GET", "/distances"): self.distances,
+            ("GET", "/search"): self.search,
+            ("POST", "/example"): self.example,
+            ("GET", "/metrics"): self.report_metrics,
+            ("GET", "/health"): self.health,
+        }
+        self.uncached = {"/metrics", "/health"}
+
+    # --- endpoints -------------------------------------------------------
+
+    async def _compute(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    @staticmethod
+    def _key(params: dict) -> tuple:
+        return QueryEngine.space_key(params.get("strategy", "recipe_distance"),
+                                     _float(params, "alpha", 0.5, 0.0, 1.0),
+                                     _float(params, "beta", 0.5, 0.0, 1.0),
+                                     _float(params, "tau", 1.0, 0.0))
+
+    async def recipes(self, query: dict, body: bytes) -> dict:
+        return {"recipes": self.engine.names}
+
+    async def neighbors(self, query: dict, body: bytes) -> dict:
+        key = self._key(query)
+        name = _required(query, "recipe")
+        k = _int(query, "k", 5)
+        i = self.engine.index_of(name)
+        row = await self.batcher.row(key, i)
+        return {"recipe": name, "strategy": key[0], "neighbors": self.engine.top_k(row, k, exclude=i)}
+
+    async def distances(self, query: dict, body: bytes) -> dict:
+        key = self._key(query)
+        name = _required(query, "recipe")
+        targets = query["to"].split(",") if query.get("to") else self.engine.names
+        ids = [self.engine.index_of(t) for t in targets]
+        row = await self.batcher.row(key, self.engine.index_of(name))
+        return {"recipe": name, "strategy": key[0],
+                "distances": {t: round(float(row[j]), DECIMALS) for t, j in zip(targets, ids)}}
+
+    async def search(self, query: dict, body: bytes) -> dict:
+        key = self._key({"strategy": "blend", **query})
+        like = _required(query, "like")
+        results = await self._compute(self.engine.search, key, like, _int(query, "k", 5),
+                                      **_filters(query))
+        return {"like": like, "strategy": key[0], "results": results}
+
+    async def example(self, query: dict, body: bytes) -> dict:
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"body is not JSON: {e}") from None
+        if not isinstance(request, dict) or not isinstance(request.get("recipe"), dict):
+            raise ValueError('body must be {"recipe": {...}, ...}')
+        key = self._key(request)
+        neighbors = await self._compute(self.engine.example, request["recipe"], key,
+                                        _int(request, "k", 5))
+        return {"strategy": key[0], "neighbors": neighbors}
+
+    async def report_metrics(self, query: dict, body: bytes) -> dict:
+        return {"endpoints": self.metrics.snapshot(), "batching": self.batcher.stats(),
+                "cache": self.cache.stats()}
+
+    async def health(self, query: dict, body: bytes) -> dict:
+        return {"status": "ok", "recipes": len(self.engine.names)}
+
+    # --- protocol --------------------------------------------------------
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple[int, bytes, bool]:
+        """(status, JSON body, served from cache) for one request."""
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            allowed = any(path == url.path for _, path in self.routes)
+            status = 405 if allowed else 404
+            return status, json.dumps({"error": _REASONS[status]}).encode(), False
+
+        cacheable = url.path not in self.uncached
+        cache_key = (method, url.path, tuple(sorted(query.items())), body)
+        if cacheable:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return 200, cached, True
+        try:
+            payload = json.dumps(await handler(query, body)).encode()
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}).encode(), False
+        except Exception as e:
+            return 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode(), False
+        if cacheable:
+            self.cache.put(cache_key, payload)
+        return 200, payload, False
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, b'{"error": "Bad Request"}', False)
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, b'{"error": "Bad Request"}', False)
+                    break
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, b'{"error": "Payload Too Large"}', False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, cached = await self.dispatch(method, target, body)
+                path = urlsplit(target).path
+                self.metrics.record(path if (method, path) in self.routes else "unrouted",
+                                    time.perf_counter() - start, status, cached)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: bytes,
+                       keep_alive: bool) -> None:
+        head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def start(self) -> asyncio.Server:
+        """Bind and start accepting; the port is read back when 0 was asked for."""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self) -> None:
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="how long a row request waits for others to batch with")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--cache-size", type=int, default=1024, help="cached responses (0 = off)")
+    parser.add_argument("--max-spaces", type=int, default=MAX_SPACES,
+                        help="strategy spaces (strategy + α/β/τ) kept in memory")
+    parser.add_argument("--lazy", action="store_true",
+                        help="build strategy spaces on first use instead of at startup")
+    args = parser.parse_args()
+
+    engine = QueryEngine(max_spaces=args.max_spaces)
+    if not args.lazy:
+        engine.warm()
+    service = QueryService(engine, args.host, args.port, args.window_ms / 1000.0,
+                           args.max_batch, args.cache_size)
+    print(f"Serving {len(engine.names)} recipes on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
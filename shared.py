@@ -0,0 +1,176 @@
+"""
+shared.py
+=========
+Publish numeric arrays once into shared memory and let worker processes map
+them read-only, instead of each worker re-parsing data/ or receiving pickled
+copies of large matrices.
+
+All arrays go into one multiprocessing.shared_memory block; what workers
+receive is a small descriptor (block name plus each array's offset, shape
+and dtype, and any picklable metadata such as recipe names):
+
+    with publish_dataset(DEFAULT) as shared:
+        results = map_rows(my_task, shared, n_rows=len(DEFAULT.recipes), workers=8)
+
+  SharedArrays     — owner of a shared block; a context manager that unlinks it
+  attach           — read-only views of a published block (cached per process)
+  publish_dataset  — a Dataset's flavor matrix, compiled recipe arrays and
+                     strategy matrices
+  compiled_view    — the compiled-recipes dict rebuilt from attached arrays,
+                     ready for vectorize.strategy_vectors
+  map_rows         — run task(arrays, meta, i0, i1) over row ranges in a pool
+
+This module deliberately does not import loaders, so a worker that only
+imports shared.py and its task's module never parses the data files.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable
+
+import numpy as np
+
+ALIGN = 64
+
+# Block name -> (SharedMemory, arrays) for blocks this process has attached
+_attached: dict[str, tuple[shared_memory.SharedMemory, dict]] = {}
+
+
+# ---------------------------------------------------------------------------
+# Publishing and attaching
+# ---------------------------------------------------------------------------
+
+class SharedArrays:
+    """
+    Named arrays copied into one new shared-memory block. `descriptor` is
+    what other processes need to attach; `arrays` are views in this process.
+    Call close() (or use as a context manager) to release the block.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], meta: dict | None = None):
+        layout, offset = {}, 0
+        arrays = {key: np.ascontiguousarray(value) for key, value in arrays.items()}
+        for key, value in arrays.items():
+            layout[key] = (offset, value.shape, value.dtype.str)
+            offset += -(-value.nbytes // ALIGN) * ALIGN
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.descriptor = {"block": self.shm.name, "arrays": layout, "meta": meta or {}}
+        self.arrays = _views(self.shm, layout, writeable=True)
+        for key, value in arrays.items():
+            self.arrays[key][...] = value
+            self.arrays[key].flags.writeable = False
+        self._closed = False
+
+    def close(self) -> None:
+        """Unmap and destroy the block (attached workers keep their mapping)."""
+        if not self._closed:
+            self.arrays = {}
+            self.shm.close()
+            self.shm.unlink()
+            self._closed = True
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _views(shm: shared_memory.SharedMemory, layout: dict, writeable: bool = False) -> dict:
+    views = {}
+    for key, (offset, shape, dtype) in layout.items():
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        view.flags.writeable = writeable
+        views[key] = view
+    return views
+
+
+def attach(descriptor: dict) -> dict[str, np.ndarray]:
+    """
+    Read-only views of the arrays in a published block. Repeated calls in
+    the same process reuse the mapping.
+    """
+    name = descriptor["block"]
+    if name not in _attached:
+        # Pool workers share the publisher's resource tracker, which already
+        # holds the block, so the registration made here is a no-op and only
+        # the publisher's close() unlinks it
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, _views(shm, descriptor["arrays"]))
+    return _attached[name][1]
+
+
+# ---------------------------------------------------------------------------
+# Datasets
+# ---------------------------------------------------------------------------
+
+def publish_dataset(dataset, strategies: tuple[str, ...] = ("blend", "role_slot", "perceptual"),
+                    **strategy_kw) -> SharedArrays:
+    """
+    Share a loaders.Dataset's numeric state: "flavor" (ingredients × dims),
+    "compiled.<key>" for every compiled recipe array and "strategy.<name>"
+    for each of `strategies`. Names and dims travel in the descriptor meta.
+    """
+    compiled = dataset.compiled()
+    arrays = {"flavor": dataset.flavor_matrix()}
+    arrays.update({f"compiled.{k}": v for k, v in compiled.items() if isinstance(v, np.ndarray)})
+    for strategy in strategies:
+        arrays[f"strategy.{strategy}"] = dataset.strategy_vectors(strategy, **strategy_kw)
+    meta = {
+        "recipes": list(compiled["recipes"]),
+        "ingredients": list(compiled["ingredients"]),
+        "flavor_dims": list(dataset.flavor_dims),
+    }
+    return SharedArrays(arrays, meta)
+
+
+def compiled_view(arrays: dict, meta: dict) -> dict:
+    """The compile_recipes dict backed by attached arrays (no copies)."""
+    compiled = {k.split(".", 1)[1]: v for k, v in arrays.items() if k.startswith("compiled.")}
+    compiled.update(recipes=meta["recipes"], ingredients=meta["ingredients"])
+    return compiled
+
+
+# ---------------------------------------------------------------------------
+# Row-range pool
+# ---------------------------------------------------------------------------
+
+_worker: dict = {}
+
+
+def _init_worker(descriptor: dict) -> None:
+    _worker.update(arrays=attach(descriptor), meta=descriptor["meta"])
+
+
+def _run(task: Callable, i0: int, i1: int, args: tuple):
+    return task(_worker["arrays"], _worker["meta"], i0, i1, *args)
+
+
+def map_rows(task: Callable, shared: SharedArrays | dict, n_rows: int, workers: int = 1,
+             rows_per_task: int | None = None, args: tuple = (), mp_context=None) -> list:
+    """
+    [task(arrays, meta, i0, i1, *args) for each row range], in row order.
+
+    `task` must be a module-level function. With workers > 1 each worker
+    attaches to the block once and receives only (i0, i1) per task; the
+    result of each task is still pickled back, so tasks should return
+    small values or write into their own outputs.
+    """
+    descriptor = shared.descriptor if isinstance(shared, SharedArrays) else shared
+    workers = max(1, min(workers, n_rows)) if n_rows else 1
+    rows_per_task = rows_per_task or max(1, -(-n_rows // (workers * 4)))
+    ranges = [(i0, min(i0 + rows_per_task, n_rows)) for i0 in range(0, n_rows, rows_per_task)]
+
+    if workers == 1:
+        arrays = shared.arrays if isinstance(shared, SharedArrays) else attach(descriptor)
+        return [task(arrays, descriptor["meta"], i0, i1, *args) for i0, i1 in ranges]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=_init_worker, initargs=(descriptor,)) as pool:
+        jobs = [pool.submit(_run, task, i0, i1, args) for i0, i1 in ranges]
+        return [job.result() for job in jobs]
+
+
+def default_workers() -> int:
+    """CPUs available to this process."""
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
@@ -0,0 +1,374 @@
+"""
+store.py
+========
+Optional SQLite backend for the catalog: taxonomy nodes, ingredients (with
+one row per flavor dimension), recipes, components and garnishes in indexed
+tables, so tools can query and edit single recipes without reading or
+rewriting the flat files.
+
+    db = CatalogStore("data/catalog.sqlite")
+    db.import_files("data")                      # taxonomy.json, ingredients.csv, recipes.json
+    db.recipes_with_ingredient("campari", role="modifier")
+    db.put_recipe("kingston_negroni", {...})     # one transaction, no file rewrite
+    db.export_files("out")                       # the same three files back
+    dataset = db.dataset()                       # a loaders.Dataset
+
+loaders reads from a database instead of data/ when COCKTAIL_DB names one
+(see loaders.load_catalog), or explicitly via Dataset.from_sqlite.
+
+The database runs in WAL mode: readers keep a consistent snapshot while a
+writer commits, and `with db.snapshot():` holds one across several queries.
+
+  CatalogStore.import_files / export_files  — round trip with the file formats
+  CatalogStore.taxonomy / ingredients / recipes / flavor_dims — loaders-shaped dicts
+  CatalogStore.get_recipe / put_recipe / delete_recipe
+  CatalogStore.recipes_with_ingredient / recipes_with_role / recipes_in_category /
+  ingredients_in_category / ingredients_by_flavor — indexed queries
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import loaders
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS taxonomy (
+    path      TEXT PRIMARY KEY,
+    parent    TEXT REFERENCES taxonomy(path) ON DELETE CASCADE,
+    name      TEXT NOT NULL,
+    depth     INTEGER NOT NULL,
+    position  INTEGER NOT NULL,
+    leaf      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS taxonomy_parent ON taxonomy(parent, position);
+
+CREATE TABLE IF NOT EXISTS flavor_dims (
+    position  INTEGER PRIMARY KEY,
+    name      TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS ingredients (
+    name           TEXT PRIMARY KEY,
+    category_path  TEXT NOT NULL,
+    abv            REAL NOT NULL,
+    position       INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ingredients_category ON ingredients(category_path);
+
+CREATE TABLE IF NOT EXISTS ingredient_flavor (
+    ingredient  TEXT NOT NULL REFERENCES ingredients(name) ON DELETE CASCADE,
+    dim         TEXT NOT NULL,
+    value       REAL NOT NULL,
+    PRIMARY KEY (ingredient, dim)
+);
+CREATE INDEX IF NOT EXISTS ingredient_flavor_dim ON ingredient_flavor(dim, value);
+
+CREATE TABLE IF NOT EXISTS recipes (
+    name      TEXT PRIMARY KEY,
+    method    TEXT,
+    served    TEXT,
+    extra     TEXT,
+    position  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recipes_method ON recipes(method);
+CREATE INDEX IF NOT EXISTS recipes_served ON recipes(served);
+
+CREATE TABLE IF NOT EXISTS components (
+    recipe      TEXT NOT NULL REFERENCES recipes(name) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    ingredient  TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    ml          REAL,
+    PRIMARY KEY (recipe, position)
+);
+CREATE INDEX IF NOT EXISTS components_ingredient ON components(ingredient, role);
+CREATE INDEX IF NOT EXISTS components_role ON components(role);
+
+CREATE TABLE IF NOT EXISTS garnishes (
+    recipe      TEXT NOT NULL REFERENCES recipes(name) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    ingredient  TEXT NOT NULL,
+    PRIMARY KEY (recipe, position)
+);
+CREATE INDEX IF NOT EXISTS garnishes_ingredient ON garnishes(ingredient);
+"""
+
+_RECIPE_KEYS = ("method", "served", "components", "garnish")
+
+
+def _number(value: float) -> int | float:
+    """Whole floats back as ints, so exported files match the hand-written ones."""
+    return int(value) if float(value).is_integer() else value
+
+
+def _category_range(path: str | list[str]) -> tuple[str, str, str]:
+    """(path, lo, hi): `path` itself or anything below it sorts in [lo, hi)."""
+    path = "|".join(path) if isinstance(path, list) else path
+    # "}" is the character after "|", so every "path|..." sorts below it
+    return path, path + "|", path + "}"
+
+
+class CatalogStore:
+    """
+    A catalog database at `path`, created with the schema if missing — or,
+    with create=False, FileNotFoundError if there is no database to read.
+    """
+
+    def __init__(self, path: Path, create: bool = True):
+        self.path = Path(path)
+        if not create and not self.path.is_file():
+            raise FileNotFoundError(f"No catalog database at {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        n_r = self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        n_i = self.conn.execute("SELECT COUNT(*) FROM ingredients").fetchone()[0]
+        return f"CatalogStore({self.path}: {n_r} recipes, {n_i} ingredients)"
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "CatalogStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- transactions -------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """One write transaction; rolled back if the block raises."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    @contextmanager
+    def snapshot(self):
+        """Every query inside sees the same committed state."""
+        self.conn.execute("BEGIN")
+        try:
+            # A deferred transaction takes its snapshot at the first read
+            self.conn.execute("SELECT 1 FROM recipes LIMIT 1").fetchall()
+            yield self
+        finally:
+            self.conn.execute("COMMIT")
+
+    # -- import / export ----------------------------------------------------
+
+    def import_files(self, data_dir: Path) -> None:
+        """Replace the whole catalog with taxonomy.json, ingredients.csv and recipes.json."""
+        flavor_dims, ingredients = loaders.load_ingredients(data_dir)
+        self.replace(loaders.load_taxonomy(data_dir), flavor_dims, ingredients,
+                     loaders.load_recipes(data_dir))
+
+    def replace(self, taxonomy: dict, flavor_dims: list[str], ingredients: dict,
+                recipes: dict) -> None:
+        """Replace the whole catalog with loaders-shaped dicts, in one transaction."""
+        with self.transaction() as c:
+            for table in ("garnishes", "components", "recipes", "ingredient_flavor",
+                          "ingredients", "flavor_dims", "taxonomy"):
+                c.execute(f"DELETE FROM {table}")
+            c.executemany("INSERT INTO taxonomy VALUES (?, ?, ?, ?, ?, ?)", _taxonomy_rows(taxonomy))
+            c.executemany("INSERT INTO flavor_dims VALUES (?, ?)", enumerate(flavor_dims))
+            c.executemany("INSERT INTO ingredients VALUES (?, ?, ?, ?)", [
+                (name, "|".join(ing["category_path"]), ing["abv"], pos)
+                for pos, (name, ing) in enumerate(ingredients.items())
+            ])
+            c.executemany("INSERT INTO ingredient_flavor VALUES (?, ?, ?)", [
+                (name, dim, value)
+                for name, ing in ingredients.items() for dim, value in ing["flavor"].items()
+            ])
+            for pos, (name, recipe) in enumerate(recipes.items()):
+                self._insert_recipe(c, name, recipe, pos)
+
+    def export_files(self, data_dir: Path) -> None:
+        """Write taxonomy.json, ingredients.csv and recipes.json in the loaders formats."""
+        data_dir = Path(data_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        with self.snapshot():
+            taxonomy, dims = self.taxonomy(), self.flavor_dims()
+            ingredients, recipes = self.ingredients(), self.recipes()
+        loaders.write_json(data_dir / "taxonomy.json", taxonomy)
+        loaders.write_json(data_dir / "recipes.json", recipes)
+
+        buf = io.StringIO(newline="")
+        writer = csv.writer(buf)
+        writer.writerow(["name", "category_path", "abv", *dims])
+        for name, ing in ingredients.items():
+            writer.writerow([name, "|".join(ing["category_path"]), _number(ing["abv"]),
+                             *(_number(ing["flavor"][d]) for d in dims)])
+        tmp = data_dir / "ingredients.csv.tmp"
+        with open(tmp, "w", newline="") as f:
+            f.write(buf.getvalue())
+        os.replace(tmp, data_dir / "ingredients.csv")
+
+    # -- loaders-shaped reads -----------------------------------------------
+
+    def taxonomy(self) -> dict:
+        """The nested category tree, leaves as None (taxonomy.json shape)."""
+        nodes = {None: {}}
+        rows = self.conn.execute(
+            "SELECT path, parent, name, leaf FROM taxonomy ORDER BY depth, position").fetchall()
+        for path, parent, name, leaf in rows:
+            nodes[parent][name] = None if leaf else {}
+            if not leaf:
+                nodes[path] = nodes[parent][name]
+        return nodes[None]
+
+    def flavor_dims(self) -> list[str]:
+        return [r[0] for r in self.conn.execute("SELECT name FROM flavor_dims ORDER BY position")]
+
+    def ingredients(self) -> dict:
+        """dict[name -> {category_path, abv, flavor}] as loaders.load_ingredients."""
+        dims = self.flavor_dims()
+        out = {
+            name: {"category_path": path.split("|"), "abv": abv, "flavor": dict.fromkeys(dims, 0.0)}
+            for name, path, abv in self.conn.execute(
+                "SELECT name, category_path, abv FROM ingredients ORDER BY position")
+        }
+        for name, dim, value in self.conn.execute("SELECT ingredient, dim, value FROM ingredient_flavor"):
+            out[name]["flavor"][dim] = value
+        return out
+
+    def recipes(self, names: list[str] | None = None) -> dict:
+        """dict[name -> recipe] in catalog order (all recipes, or just `names`)."""
+        where, args = "", ()
+        if names is not None:
+            where, args = f"WHERE {{}} IN ({','.join('?' * len(names))})", tuple(names)
+        out = {
+            name: {"method": method, "served": served, "components": [], "garnish": [],
+                   **json.loads(extra or "{}")}
+            for name, method, served, extra in self.conn.execute(
+                f"SELECT name, method, served, extra FROM recipes {where.format('name')} "
+                f"ORDER BY position", args)
+        }
+        for recipe, ingredient, role, ml in self.conn.execute(
+                f"SELECT recipe, ingredient, role, ml FROM components "
+                f"{where.format('recipe')} ORDER BY recipe, position", args):
+            out[recipe]["components"].append(
+                {"ingredient": ingredient, "role": role, "ml": None if ml is None else _number(ml)})
+        for recipe, ingredient in self.conn.execute(
+                f"SELECT recipe, ingredient FROM garnishes "
+                f"{where.format('recipe')} ORDER BY recipe, position", args):
+            out[recipe]["garnish"].append(ingredient)
+        return out
+
+    def dataset(self) -> "loaders.Dataset":
+        """A loaders.Dataset read from one snapshot of the database."""
+        with self.snapshot():
+            return loaders.Dataset(self.taxonomy(), self.ingredients(), self.recipes(),
+                           self.flavor_dims(), path=self.path)
+
+    # -- single-recipe edits ------------------------------------------------
+
+    def get_recipe(self, name: str) -> dict | None:
+        return self.recipes([name]).get(name)
+
+    def put_recipe(self, name: str, recipe: dict) -> None:
+        """Insert or replace one recipe (keeping its catalog position if it exists)."""
+        with self.transaction() as c:
+            row = c.execute("SELECT position FROM recipes WHERE name = ?", (name,)).fetchone()
+            if row:
+                c.execute("DELETE FROM recipes WHERE name = ?", (name,))
+                pos = row[0]
+            else:
+                pos = c.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM recipes").fetchone()[0]
+            self._insert_recipe(c, name, recipe, pos)
+
+    def delete_recipe(self, name: str) -> bool:
+        with self.transaction() as c:
+            return c.execute("DELETE FROM recipes WHERE name = ?", (name,)).rowcount > 0
+
+    @staticmethod
+    def _insert_recipe(c: sqlite3.Connection, name: str, recipe: dict, pos: int) -> None:
+        extra = {k: v for k, v in recipe.items() if k not in _RECIPE_KEYS}
+        c.execute("INSERT INTO recipes VALUES (?, ?, ?, ?, ?)",
+                  (name, recipe.get("method"), recipe.get("served"),
+                   json.dumps(extra) if extra else None, pos))
+        c.executemany("INSERT INTO components VALUES (?, ?, ?, ?, ?)", [
+            (name, i, comp["ingredient"], comp["role"], comp["ml"])
+            for i, comp in enumerate(recipe["components"])
+        ])
+        c.executemany("INSERT INTO garnishes VALUES (?, ?, ?)", [
+            (name, i, g) for i, g in enumerate(recipe.get("garnish", []))
+        ])
+
+    # -- indexed queries ----------------------------------------------------
+
+    def recipes_with_ingredient(self, ingredient: str, role: str | None = None,
+                                include_garnish: bool = False) -> list[str]:
+        """Recipes using `ingredient` (optionally in `role`, or as a garnish), catalog order."""
+        sql = "SELECT recipe FROM components WHERE ingredient = ?"
+        args = [ingredient]
+        if role is not None:
+            sql += " AND role = ?"
+            args.append(role)
+        if include_garnish and role is None:
+            sql += " UNION SELECT recipe FROM garnishes WHERE ingredient = ?"
+            args.append(ingredient)
+        return self._ordered(sql, args)
+
+    def recipes_with_role(self, role: str) -> list[str]:
+        return self._ordered("SELECT recipe FROM components WHERE role = ?", [role])
+
+    def ingredients_in_category(self, path: str | list[str]) -> list[str]:
+        """Ingredients whose category_path is `path` ("amaro|amaro_bitter" or a list) or below it."""
+        exact, lo, hi = _category_range(path)
+        return [r[0] for r in self.conn.execute(
+            "SELECT name FROM ingredients WHERE category_path = ? "
+            "OR (category_path >= ? AND category_path < ?) ORDER BY position", (exact, lo, hi))]
+
+    def recipes_in_category(self, path: str | list[str], role: str | None = None) -> list[str]:
+        """Recipes with a component from category `path` (or below), optionally in `role`."""
+        exact, lo, hi = _category_range(path)
+        sql = ("SELECT c.recipe FROM ingredients i JOIN components c ON c.ingredient = i.name "
+               "WHERE (i.category_path = ? OR (i.category_path >= ? AND i.category_path < ?))")
+        args = [exact, lo, hi]
+        if role is not None:
+            sql += " AND c.role = ?"
+            args.append(role)
+        return self._ordered(sql, args)
+
+    def ingredients_by_flavor(self, dim: str, minimum: float = 0.0,
+                              maximum: float = 1.0) -> list[tuple[str, float]]:
+        """(ingredient, value) with `dim` in [minimum, maximum], strongest first."""
+        return [tuple(r) for r in self.conn.execute(
+            "SELECT ingredient, value FROM ingredient_flavor WHERE dim = ? AND value BETWEEN ? AND ? "
+            "ORDER BY value DESC, ingredient", (dim, minimum, maximum))]
+
+    def _ordered(self, sql: str, args: list) -> list[str]:
+        return [r[0] for r in self.conn.execute(
+            f"SELECT name FROM recipes WHERE name IN ({sql}) ORDER BY position", args)]
+
+
+def _taxonomy_rows(tree: dict, parent: str | None = None, depth: int = 0):
+    for pos, (name, children) in enumerate(tree.items()):
+        path = name if parent is None else f"{parent}|{name}"
+        yield path, parent, name, depth, pos, children is None
+        if children:
+            yield from _taxonomy_rows(children, path, depth + 1)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp, CatalogStore(Path(tmp) / "catalog.sqlite") as db:
+        db.import_files(Path(__file__).parent / "data")
+        print(db)
+        print("campari as modifier:", ", ".join(db.recipes_with_ingredient("campari", role="modifier")))
+        print("agave base:", ", ".join(db.recipes_in_category("spirit|agave", role="base")))
+        print("most bitter:", ", ".join(f"{n} {v:g}" for n, v in db.ingredients_by_flavor("bitter", 0.7)))
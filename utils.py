@@ -2,40 +2,43 @@
 utils.py
 ========
 Distance and vector utilities for cocktail clustering.
-All data is read from loaders.py (which reads data/).
+All data is read from loaders.py (which reads data/). Every function takes an
+optional `dataset` (loaders.Dataset); None means the default data/ catalog.
 """
 
 import numpy as np
 
-from loaders import FLAVOR_DIMS, INGREDIENTS, RECIPES
+from loaders import Dataset, resolve
 
 
 # ---------------------------------------------------------------------------
 # Ingredient utilities
 # ---------------------------------------------------------------------------
 
-def get_flavor_vector(ingredient_name: str) -> np.ndarray:
+def get_flavor_vector(ingredient_name: str, dataset: Dataset | None = None) -> np.ndarray:
     """Ordered flavor vector for a single ingredient."""
-    ing = INGREDIENTS[ingredient_name]
-    return np.array([ing["flavor"][dim] for dim in FLAVOR_DIMS])
+    ds = resolve(dataset)
+    ing = ds.ingredients[ingredient_name]
+    return np.array([ing["flavor"][dim] for dim in ds.flavor_dims], dtype=ds.precision)
 
 
-def ingredient_flavor_distance(a: str, b: str) -> float:
+def ingredient_flavor_distance(a: str, b: str, dataset: Dataset | None = None) -> float:
     """Cosine distance between two ingredient flavor profiles (0 = identical)."""
-    va, vb = get_flavor_vector(a), get_flavor_vector(b)
+    va, vb = get_flavor_vector(a, dataset), get_flavor_vector(b, dataset)
     norm_a, norm_b = np.linalg.norm(va), np.linalg.norm(vb)
     if norm_a == 0 or norm_b == 0:
         return 1.0
     return 1.0 - np.dot(va, vb) / (norm_a * norm_b)
 
 
-def category_distance(a: str, b: str) -> int:
+def category_distance(a: str, b: str, dataset: Dataset | None = None) -> int:
     """
     Tree distance between two ingredients based on category taxonomy.
     Returns (depth_a - common) + (depth_b - common), i.e. hops to LCA * 2.
     """
-    cat_a = INGREDIENTS[a]["category_path"]
-    cat_b = INGREDIENTS[b]["category_path"]
+    ingredients = resolve(dataset).ingredients
+    cat_a = ingredients[a]["category_path"]
+    cat_b = ingredients[b]["category_path"]
     common = sum(1 for x, y in zip(cat_a, cat_b) if x == y)
     return (len(cat_a) - common) + (len(cat_b) - common)
 
@@ -44,9 +47,17 @@ def category_distance(a: str, b: str) -> int:
 # Recipe utilities
 # ---------------------------------------------------------------------------
 
-def compute_recipe_proportions(recipe_name: str) -> dict:
+# Blend weights: an unmeasured seasoning counts as this share of the drink, a
+# garnish adds this much of its flavor, and the perceptual strategy mixes in
+# the element-wise max ingredient with this weight
+SEASONING_WEIGHT = 0.05
+GARNISH_WEIGHT = 0.03
+PUNCH_WEIGHT = 0.4
+
+
+def compute_recipe_proportions(recipe_name: str, dataset: Dataset | None = None) -> dict:
     """Return recipe dict with 'proportion' added to each component."""
-    recipe = RECIPES[recipe_name]
+    recipe = resolve(dataset).recipes[recipe_name]
     total_ml = sum(c["ml"] for c in recipe["components"] if c["ml"] is not None)
     components = []
     for c in recipe["components"]:
@@ -55,32 +66,33 @@ def compute_recipe_proportions(recipe_name: str) -> dict:
     return {**recipe, "components": components, "total_ml": total_ml}
 
 
-def recipe_flavor_vector(recipe_name: str) -> np.ndarray:
+def recipe_flavor_vector(recipe_name: str, dataset: Dataset | None = None) -> np.ndarray:
     """
     Proportion-weighted blend of component flavor vectors.
-    Seasonings: fixed weight 0.05. Garnishes: fixed weight 0.03.
+    Seasonings: fixed weight SEASONING_WEIGHT. Garnishes: GARNISH_WEIGHT.
     """
-    recipe = RECIPES[recipe_name]
+    ds = resolve(dataset)
+    recipe = ds.recipes[recipe_name]
     total_ml = sum(c["ml"] for c in recipe["components"] if c["ml"] is not None)
-    blended = np.zeros(len(FLAVOR_DIMS))
+    blended = np.zeros(len(ds.flavor_dims), dtype=ds.precision)
 
     for c in recipe["components"]:
-        if c["ingredient"] not in INGREDIENTS:
+        if c["ingredient"] not in ds.ingredients:
             continue
-        fv = get_flavor_vector(c["ingredient"])
-        weight = (c["ml"] / total_ml) if (c["ml"] is not None and total_ml > 0) else 0.05
+        fv = get_flavor_vector(c["ingredient"], ds)
+        weight = (c["ml"] / total_ml) if (c["ml"] is not None and total_ml > 0) else SEASONING_WEIGHT
         blended += fv * weight
 
     for g in recipe.get("garnish", []):
-        if g in INGREDIENTS:
-            blended += get_flavor_vector(g) * 0.03
+        if g in ds.ingredients:
+            blended += get_flavor_vector(g, ds) * GARNISH_WEIGHT
 
     return blended
 
 
-def recipe_structural_vector(recipe_name: str) -> dict:
+def recipe_structural_vector(recipe_name: str, dataset: Dataset | None = None) -> dict:
     """Structural features: method, served, role proportions, component counts."""
-    recipe = RECIPES[recipe_name]
+    recipe = resolve(dataset).recipes[recipe_name]
     total_ml = sum(c["ml"] for c in recipe["components"] if c["ml"] is not None)
     role_proportions = {}
     for c in recipe["components"]:
@@ -100,7 +112,7 @@ def recipe_structural_vector(recipe_name: str) -> dict:
 # Role grouping for structural comparison:
 # "modifier" and "sweetener" are merged because sweet vermouth in a Manhattan
 # plays the same structural role as sugar in an Old Fashioned.
-_ROLE_GROUPS = {
+ROLE_GROUPS = {
     "modifier":  "modifying",
     "sweetener": "modifying",
     "accent":    "accent",
@@ -109,8 +121,14 @@ _ROLE_GROUPS = {
     "seasoning": "seasoning",
 }
 
+# Structural penalties (see scripts/calibrate_distance.py for fitting them)
+METHOD_PENALTY = 0.15          # different method (stirred vs shaken vs built)
+SERVED_EITHER_PENALTY = 0.05   # one drink is served "either"
+SERVED_PENALTY = 0.15          # up vs on_ice
+
 
-def recipe_distance(a: str, b: str, alpha: float = 0.5, beta: float = 0.5) -> float:
+def recipe_distance(a: str, b: str, alpha: float = 0.5, beta: float = 0.5,
+                    dataset: Dataset | None = None) -> float:
     """
     Combined distance between two recipes:
       alpha * flavor_distance + beta * structural_distance
@@ -119,29 +137,29 @@ def recipe_distance(a: str, b: str, alpha: float = 0.5, beta: float = 0.5) -> fl
     Structural: method penalty + serving penalty + euclidean role-proportion distance.
     """
     # --- Flavor ---
-    fv_a, fv_b = recipe_flavor_vector(a), recipe_flavor_vector(b)
+    fv_a, fv_b = recipe_flavor_vector(a, dataset), recipe_flavor_vector(b, dataset)
     norm_a, norm_b = np.linalg.norm(fv_a), np.linalg.norm(fv_b)
     flavor_dist = (
         1.0 if (norm_a == 0 or norm_b == 0)
-        else 1.0 - np.dot(fv_a, fv_b) / (norm_a * norm_b)
+        else max(1.0 - np.dot(fv_a, fv_b) / (norm_a * norm_b), 0.0)
     )
 
     # --- Structural ---
-    sa, sb = recipe_structural_vector(a), recipe_structural_vector(b)
+    sa, sb = recipe_structural_vector(a, dataset), recipe_structural_vector(b, dataset)
 
-    method_dist = 0.0 if sa["method"] == sb["method"] else 0.15
+    method_dist = 0.0 if sa["method"] == sb["method"] else METHOD_PENALTY
 
     if sa["served"] == sb["served"]:
         served_dist = 0.0
     elif "either" in (sa["served"], sb["served"]):
-        served_dist = 0.05
+        served_dist = SERVED_EITHER_PENALTY
     else:
-        served_dist = 0.15
+        served_dist = SERVED_PENALTY
 
     def group_props(role_props):
         grouped = {}
         for role, prop in role_props.items():
-            g = _ROLE_GROUPS.get(role, role)
+            g = ROLE_GROUPS.get(role, role)
             grouped[g] = grouped.get(g, 0.0) + prop
         return grouped
 
@@ -152,3 +170,159 @@ def recipe_distance(a: str, b: str, alpha: float = 0.5, beta: float = 0.5) -> fl
     structural_dist = min(method_dist + served_dist + role_dist, 1.0)
 
     return alpha * flavor_dist + beta * structural_dist
+
+
+# ---------------------------------------------------------------------------
+# Vectorized recipe distances
+# ---------------------------------------------------------------------------
+
+_SERVED_CODES = {"up": 0, "on_ice": 1, "either": 2}
+
+
+def recipe_feature_arrays(recipe_names: list[str], role_groups: dict | None = None,
+                          dataset: Dataset | None = None) -> dict:
+    """
+    Per-recipe arrays for the terms of recipe_distance:
+      flavor  — (n, n_dims) proportion-weighted flavor vectors
+      method  — (n,) integer method codes
+      served  — (n,) integer served codes (2 = "either")
+      roles   — (n, n_groups) grouped role proportions
+
+    `role_groups` overrides the role merge (default ROLE_GROUPS); roles it
+    does not mention stay separate. Float arrays are in the dataset's precision.
+    """
+    dtype = resolve(dataset).precision
+    role_groups = ROLE_GROUPS if role_groups is None else role_groups
+    structs = [recipe_structural_vector(name, dataset) for name in recipe_names]
+    groups = sorted(
+        set(role_groups.values())
+        | {role_groups.get(r, r) for s in structs for r in s["role_proportions"]}
+    )
+    group_index = {g: k for k, g in enumerate(groups)}
+    methods = {}
+
+    roles = np.zeros((len(recipe_names), len(groups)), dtype=dtype)
+    method = np.empty(len(recipe_names), dtype=np.int64)
+    served = np.empty(len(recipe_names), dtype=np.int64)
+    for i, s in enumerate(structs):
+        method[i] = methods.setdefault(s["method"], len(methods))
+        served[i] = _SERVED_CODES[s["served"]]
+        for role, prop in s["role_proportions"].items():
+            roles[i, group_index[role_groups.get(role, role)]] += prop
+
+    return {
+        "flavor": np.array([recipe_flavor_vector(n, dataset) for n in recipe_names], dtype=dtype),
+        "method": method,
+        "served": served,
+        "roles": roles,
+    }
+
+
+def _penalties(dtype, *penalties: float) -> tuple:
+    """Zero and the structural penalties as `dtype` scalars, so np.where keeps float32."""
+    dtype = np.result_type(dtype, np.float32)
+    return (dtype.type(0.0),) + tuple(dtype.type(p) for p in penalties)
+
+
+def recipe_distance_terms(fa: dict, fb: dict, method_penalty: float = METHOD_PENALTY,
+                          either_penalty: float = SERVED_EITHER_PENALTY,
+                          served_penalty: float = SERVED_PENALTY) -> dict:
+    """
+    The unweighted terms of recipe_distance for every (row of fa, row of fb)
+    pair, each (len(fa), len(fb)): flavor (cosine distance), method, served,
+    roles, and structural (their sum, capped at 1). Terms are in the flavor
+    features' dtype.
+    """
+    zero, method_penalty, either_penalty, served_penalty = _penalties(
+        fa["flavor"].dtype, method_penalty, either_penalty, served_penalty)
+    na = np.linalg.norm(fa["flavor"], axis=1)
+    nb = np.linalg.norm(fb["flavor"], axis=1)
+    denom = na[:, None] * nb[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Rounding can take identical directions just below 0
+        flavor_dist = np.where(denom > 0, np.maximum(1.0 - (fa["flavor"] @ fb["flavor"].T) / denom, 0.0),
+                               1.0)
+
+    method_dist = np.where(fa["method"][:, None] == fb["method"][None, :], zero, method_penalty)
+
+    sa, sb = fa["served"][:, None], fb["served"][None, :]
+    served_dist = np.where(sa == sb, zero,
+                           np.where((sa == 2) | (sb == 2), either_penalty, served_penalty))
+
+    ra, rb = fa["roles"], fb["roles"]
+    if ra.dtype == np.float32:
+        # |a|² + |b|² - 2a·b cancels badly in float32 for near-identical role
+        # mixes; there are only a handful of role groups, so sum the squares
+        sq = np.zeros((len(ra), len(rb)), dtype=ra.dtype)
+        for g in range(ra.shape[1]):
+            diff = np.subtract.outer(ra[:, g], rb[:, g])
+            sq += diff * diff
+    else:
+        sq = (ra ** 2).sum(axis=1)[:, None] + (rb ** 2).sum(axis=1)[None, :] - 2.0 * ra @ rb.T
+    role_dist = np.sqrt(np.maximum(sq, 0.0))
+
+    return {
+        "flavor": flavor_dist,
+        "method": method_dist,
+        "served": served_dist,
+        "roles": role_dist,
+        "structural": np.minimum(method_dist + served_dist + role_dist, 1.0),
+    }
+
+
+def recipe_distance_block(fa: dict, fb: dict, alpha: float = 0.5, beta: float = 0.5,
+                          method_penalty: float = METHOD_PENALTY,
+                          either_penalty: float = SERVED_EITHER_PENALTY,
+                          served_penalty: float = SERVED_PENALTY) -> np.ndarray:
+    """
+    recipe_distance for every (row of fa, row of fb) pair at once, where fa and
+    fb are (slices of) recipe_feature_arrays output. Returns (len(fa), len(fb)).
+    The structural penalties can be overridden (e.g. with calibrated values).
+    """
+    terms = recipe_distance_terms(fa, fb, method_penalty, either_penalty, served_penalty)
+    return alpha * terms["flavor"] + beta * terms["structural"]
+
+
+def paired_flavor_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Cosine distance between rows a[p] and b[p], (len(a),): the flavor term of
+    recipe_distance_pairs. Clamped at 0; 1.0 where either row is all zero.
+    """
+    denom = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denom > 0, np.maximum(1.0 - (a * b).sum(axis=1) / denom, 0.0), 1.0)
+
+
+def recipe_distance_pairs(features: dict, i: np.ndarray, j: np.ndarray,
+                          alpha: float = 0.5, beta: float = 0.5,
+                          method_penalty: float = METHOD_PENALTY,
+                          either_penalty: float = SERVED_EITHER_PENALTY,
+                          served_penalty: float = SERVED_PENALTY) -> np.ndarray:
+    """
+    recipe_distance for the listed pairs only, (len(i),): row i[p] against
+    row j[p] of recipe_feature_arrays output. The same terms as
+    recipe_distance_terms, evaluated elementwise instead of for every pair.
+    """
+    fa = {k: v[i] for k, v in features.items()}
+    fb = {k: v[j] for k, v in features.items()}
+    zero, method_penalty, either_penalty, served_penalty = _penalties(
+        fa["flavor"].dtype, method_penalty, either_penalty, served_penalty)
+    flavor_dist = paired_flavor_distance(fa["flavor"], fb["flavor"])
+    method_dist = np.where(fa["method"] == fb["method"], zero, method_penalty)
+    sa, sb = fa["served"], fb["served"]
+    served_dist = np.where(sa == sb, zero,
+                           np.where((sa == 2) | (sb == 2), either_penalty, served_penalty))
+    role_dist = np.linalg.norm(fa["roles"] - fb["roles"], axis=1)
+    structural = np.minimum(method_dist + served_dist + role_dist, 1.0)
+    return alpha * flavor_dist + beta * structural
+
+
+def recipe_distance_matrix(recipe_names: list[str] | None = None,
+                           alpha: float = 0.5, beta: float = 0.5,
+                           dataset: Dataset | None = None) -> np.ndarray:
+    """Full (n, n) recipe_distance matrix, computed in one vectorized pass."""
+    recipe_names = list(resolve(dataset).recipes) if recipe_names is None else recipe_names
+    features = recipe_feature_arrays(recipe_names, dataset=dataset)
+    dist = recipe_distance_block(features, features, alpha, beta)
+    np.fill_diagonal(dist, 0.0)
+    return dist
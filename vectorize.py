@@ -0,0 +1,206 @@
+"""
+vectorize.py
+============
+Batched recipe vectors for the embedding strategies.
+
+compile_recipes turns the recipes into fixed index/weight arrays over the
+ingredient table once. After that every strategy is a tensor operation on an
+ingredient flavor matrix, so the same code evaluates the real profiles
+(ingredients × dims) or thousands of perturbed copies at once
+(samples × ingredients × dims). Recipes and profiles come from a
+loaders.Dataset (default: the data/ catalog):
+
+  strategy_vectors(compiled, flavor, "blend")              — (recipes, dims)
+  strategy_vectors(compiled, perturbed, "perceptual")      — (samples, recipes, dims)
+
+The results match the per-recipe functions in scripts/build_embeddings.py
+(blend_vector, blend_struct_vector, role_slot_vector, perceptual_vector) and
+softmax_perceptual_vector in scripts/build_embeddings_tau.py.
+"""
+
+import numpy as np
+
+from loaders import Dataset, resolve
+from utils import GARNISH_WEIGHT, PUNCH_WEIGHT, ROLE_GROUPS, SEASONING_WEIGHT
+
+DASH_ML = 0.8          # volume of one unmeasured seasoning (a dash of bitters)
+SLOTS = ["base", "modifying", "citrus", "accent"]
+STRATEGIES = ("blend", "blend_struct", "role_slot", "perceptual", "tau")
+
+
+def flavor_matrix(ingredient_names: list[str] | None = None,
+                  dataset: Dataset | None = None) -> np.ndarray:
+    """(ingredients, dims) flavor profiles in `ingredient_names` order."""
+    ds = resolve(dataset)
+    ingredient_names = list(ds.ingredients) if ingredient_names is None else ingredient_names
+    return np.array([[ds.ingredients[n]["flavor"][d] for d in ds.flavor_dims]
+                     for n in ingredient_names], dtype=ds.precision)
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+def compile_recipes(recipe_names: list[str] | None = None,
+                    ingredient_names: list[str] | None = None,
+                    dataset: Dataset | None = None) -> dict:
+    """
+    Index/weight arrays for `recipe_names` over `ingredient_names` (default:
+    every recipe and the ingredient table order). Ingredients missing from the
+    table point at an extra all-zero row, as get_flavor_vector treats them.
+    Float arrays are in the dataset's precision.
+
+    Keys:
+      recipes, ingredients — the orders used
+      blend      (R, I+1)    weights of the proportion-weighted blend
+      slots      (4, R, I+1) per-slot weights of the role-slot vector
+      garnish    (R, I+1)    garnish weights (accent slot)
+      items      (R, M)      every component/garnish ingredient, padded with -1
+      scale      (R, M)      1 for components, 0.03 for garnishes
+      ml_weight  (R, M)      volume weight of each item (softmax τ strategy)
+      ml         (R, M)      poured volume of each item (DASH_ML for seasonings, 0 for garnishes)
+      struct     (R, 7)      structural vector (does not depend on flavors)
+    """
+    ds = resolve(dataset)
+    recipes = ds.recipes
+    recipe_names = list(recipes) if recipe_names is None else recipe_names
+    ingredient_names = list(ds.ingredients) if ingredient_names is None else ingredient_names
+    index = {name: i for i, name in enumerate(ingredient_names)}
+    missing = len(ingredient_names)
+    n_r, n_i = len(recipe_names), len(ingredient_names) + 1
+
+    dtype = ds.precision
+    blend = np.zeros((n_r, n_i), dtype=dtype)
+    slots = np.zeros((len(SLOTS), n_r, n_i), dtype=dtype)
+    garnish = np.zeros((n_r, n_i), dtype=dtype)
+    struct = np.zeros((n_r, 7), dtype=dtype)
+    width = max(len(recipes[r]["components"]) + len(recipes[r].get("garnish", []))
+                for r in recipe_names)
+    items = np.full((n_r, width), -1, dtype=np.int64)
+    scale = np.zeros((n_r, width), dtype=dtype)
+    ml_weight = np.zeros((n_r, width), dtype=dtype)
+    ml = np.zeros((n_r, width), dtype=dtype)
+
+    for r, name in enumerate(recipe_names):
+        recipe = recipes[name]
+        components = recipe["components"]
+        total_ml = sum(c["ml"] for c in components if c["ml"] is not None)
+        slot_total = {s: 0.0 for s in SLOTS}
+        role_ml = {s: 0.0 for s in SLOTS}
+        seasoned = 0
+        m = 0
+
+        for c in components:
+            i = index.get(c["ingredient"], missing)
+            role = ROLE_GROUPS.get(c["role"], c["role"])
+            measured = c["ml"] is not None and total_ml > 0
+            weight = c["ml"] / total_ml if measured else SEASONING_WEIGHT
+            blend[r, i] += weight
+            if measured:
+                if role in SLOTS:
+                    slots[SLOTS.index(role), r, i] += c["ml"]
+                    slot_total[role] += c["ml"]
+                    role_ml[role] += c["ml"] / total_ml
+            else:
+                slots[:, r, i] += SEASONING_WEIGHT / len(SLOTS)
+                seasoned = 1
+            items[r, m], scale[r, m], ml_weight[r, m] = i, 1.0, weight
+            ml[r, m] = c["ml"] if c["ml"] is not None else DASH_ML
+            m += 1
+
+        for g in recipe.get("garnish", []):
+            i = index.get(g, missing)
+            blend[r, i] += GARNISH_WEIGHT
+            garnish[r, i] += GARNISH_WEIGHT
+            items[r, m], scale[r, m], ml_weight[r, m] = i, GARNISH_WEIGHT, GARNISH_WEIGHT
+            m += 1
+
+        # Each slot is a volume-weighted average (seasoning included in the sum)
+        for s, slot in enumerate(SLOTS):
+            if slot_total[slot] > 0:
+                slots[s, r] /= slot_total[slot]
+
+        served = recipe.get("served")
+        struct[r] = [role_ml["base"], role_ml["modifying"], role_ml["citrus"], role_ml["accent"],
+                     seasoned, served == "up", served == "on_ice"]
+
+    return {
+        "recipes": recipe_names,
+        "ingredients": ingredient_names,
+        "blend": blend,
+        "slots": slots,
+        "garnish": garnish,
+        "items": items,
+        "scale": scale,
+        "ml_weight": ml_weight,
+        "ml": ml,
+        "struct": struct,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Batched strategies
+# ---------------------------------------------------------------------------
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+
+
+def _gather(compiled: dict, flavor: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-item flavor vectors (..., R, M, D) and a mask of real (non-padding) items."""
+    # Padding (-1) lands on the appended zero row
+    return flavor[..., compiled["items"], :], compiled["items"] >= 0
+
+
+def strategy_vectors(compiled: dict, flavor: np.ndarray, strategy: str,
+                     alpha: float = 0.5, tau: float = 1.0) -> np.ndarray:
+    """
+    Recipe vectors for `strategy` from an ingredient flavor matrix of shape
+    (I, D) or a batch (S, I, D); returns (R, dims) or (S, R, dims). The
+    result is float32 when the flavors and compiled arrays both are, else
+    float64.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+    flavor = np.asarray(flavor)
+    dtype = np.result_type(flavor.dtype, compiled["blend"].dtype, np.float32)
+    flavor = flavor.astype(dtype, copy=False)
+    # Extra zero row for ingredients missing from the table
+    pad = np.zeros(flavor.shape[:-2] + (1, flavor.shape[-1]), dtype=dtype)
+    flavor = np.concatenate([flavor, pad], axis=-2)
+
+    blend = np.matmul(compiled["blend"], flavor)
+    if strategy == "blend":
+        return blend
+
+    if strategy == "blend_struct":
+        struct = np.broadcast_to(_unit(compiled["struct"]), blend.shape[:-1] + (7,))
+        return np.concatenate([_unit(blend) * alpha, struct * (1.0 - alpha)], axis=-1)
+
+    if strategy == "role_slot":
+        slots = [np.matmul(w, flavor) for w in compiled["slots"]]
+        slots[SLOTS.index("accent")] += np.matmul(compiled["garnish"], flavor)
+        return np.concatenate(slots, axis=-1)
+
+    per_item, valid = _gather(compiled, flavor)
+    if strategy == "perceptual":
+        scaled = per_item * compiled["scale"][..., None]
+        scaled = np.where(valid[..., None], scaled, -np.inf)
+        max_vec = scaled.max(axis=-2)
+        max_vec[~np.isfinite(max_vec)] = 0.0
+        return PUNCH_WEIGHT * max_vec + (1 - PUNCH_WEIGHT) * blend
+
+    # tau: softmax over item intensities, modulated by volume weights
+    intensity = np.linalg.norm(per_item, axis=-1)
+    if tau > 0:
+        logits = np.where(valid, intensity / tau, -np.inf)
+        boost = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    else:
+        boost = (intensity == np.where(valid, intensity, -np.inf).max(axis=-1, keepdims=True)) & valid
+        # Only the first most intense item, as np.argmax picks
+        boost = boost & (np.cumsum(boost, axis=-1) == 1)
+    weights = np.where(valid, boost * compiled["ml_weight"], 0.0)
+    total = weights.sum(axis=-1, keepdims=True)
+    weights = np.divide(weights, total, out=weights, where=total > 0)
+    return (weights[..., None] * per_item).sum(axis=-2)